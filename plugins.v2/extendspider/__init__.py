@@ -4,13 +4,16 @@ import traceback
 from copy import copy
 from typing import List, Dict, Any, Tuple, Optional
 
-from cachetools import TTLCache, cached
+from cachetools import cached
 
 from app.plugins import _PluginBase
+from app.core.config import settings
 from app.log import logger
 from app.schemas import SearchContext
 from app.core.event import EventManager
 from app.schemas.types import EventType
+from app.plugins.extendspider.utils.search_cache import PersistentTLRUCache, SearchKeyNormalizer, SingleFlight, \
+    single_flight
 
 spider_configs = \
     {
@@ -105,6 +108,17 @@ spider_configs = \
     }
 
 
+# 检索缓存键归一化，关键词写法不同或上下文无关字段不同的检索共用缓存
+_search_keys = SearchKeyNormalizer()
+
+
+def _search_key(self, indexer, keyword, page, search_context: Optional[SearchContext] = None):
+    """
+    检索缓存和并发合并共用的键
+    """
+    return _search_keys.key(indexer.get("id"), keyword, page, search_context)
+
+
 class ExtendSpider(_PluginBase):
     # 插件名称
     plugin_name = "ExtendSpider"
@@ -134,6 +148,11 @@ class ExtendSpider(_PluginBase):
     _spider_config = None
     _indexers = []
     _spider_helper = None
+    # 检索结果缓存，持久化到插件数据目录，各爬虫可通过 search_cache_ttl（秒）单独设置有效期
+    _search_cache = PersistentTLRUCache(settings.PLUGIN_DATA_PATH / "extendspider" / "search_cache.db",
+                                        ttl=2 * 3600, maxsize=2000)
+    # 相同检索并发时只执行一次
+    _search_flight = SingleFlight()
 
     def init_plugin(self, config: dict = None):
         """
@@ -177,12 +196,33 @@ class ExtendSpider(_PluginBase):
             else:
                 # 重新加载配置
                 self.reload_config(is_init=True)
+            self.__init_search_cache()
             EventManager().send_event(EventType.SpiderPluginsRload, data={"plugin_id": self.plugin_name})
             logger.info(f"插件初始化完成，当前状态：{'启用' if self._enabled else '禁用'}")
         except Exception as e:
             logger.error(f"插件初始化失败：{str(e)}, {traceback.format_exc()}")
             self._spider_helper = None
 
+    def __init_search_cache(self):
+        """
+        按爬虫配置设置检索缓存有效期，并载入上次保存的检索缓存和详情页缓存
+        """
+        ttls = {}
+        for spider_name, config in (self._spider_config or {}).items():
+            if isinstance(config, dict) and config.get("search_cache_ttl"):
+                try:
+                    ttls[f"{self.plugin_name}-{spider_name}"] = float(config.get("search_cache_ttl"))
+                except (TypeError, ValueError):
+                    logger.warning(f"{spider_name} 的 search_cache_ttl 配置无效：{config.get('search_cache_ttl')}")
+        self._search_cache.ttls = ttls
+        count = self._search_cache.warm_up()
+        if count:
+            logger.info(f"【{self.plugin_name}】已载入 {count} 条检索缓存")
+        from app.plugins.extendspider.plugins.base import _ExtendSpiderBase
+        count = _ExtendSpiderBase._detail_cache.warm_up()
+        if count:
+            logger.info(f"【{self.plugin_name}】已载入 {count} 条详情页缓存")
+
     def reload_config(self, is_init=False):
         """
         重新加载配置
@@ -235,6 +275,18 @@ class ExtendSpider(_PluginBase):
             if self._spider_helper:
                 self._spider_helper.remove_plugin()
                 self._spider_helper = None
+            # 关闭共享的浏览器池
+            from app.plugins.extendspider.utils.browser_pool import PlaywrightPool
+            PlaywrightPool().shutdown()
+            # 停止 clearance 后台刷新
+            from app.plugins.extendspider.utils.challenge_broker import ChallengeBroker
+            ChallengeBroker().shutdown()
+            # 销毁 FlareSolverr 会话
+            from app.plugins.extendspider.utils.flaresolverr_pool import FlareSolverrSessionPool
+            FlareSolverrSessionPool().shutdown()
+            self._search_cache.close()
+            from app.plugins.extendspider.plugins.base import _ExtendSpiderBase
+            _ExtendSpiderBase._detail_cache.close()
         except Exception as e:
             logger.error(f"【{self.plugin_name}】停止插件错误: {str(e)}, {traceback.format_exc()}")
 
@@ -258,10 +310,8 @@ class ExtendSpider(_PluginBase):
             indexers.extend(spider.get_indexers())
         return indexers
 
-    @cached(cache=TTLCache(maxsize=2000, ttl=2 * 3600),
-            key=lambda self, indexer, keyword, page, search_context=None: (indexer.get("id"), keyword, page,
-                                                                           hash(
-                                                                               f"{search_context.search_type}{search_context.search_sub_id}{search_context.media_info.title} ") if search_context else None))
+    @cached(cache=_search_cache, key=_search_key)
+    @single_flight(_search_flight, key=_search_key)
     def search(self, indexer, keyword, page, search_context: Optional[SearchContext] = None):
         """
         根据关键字多线程检索
@@ -530,6 +580,10 @@ class ExtendSpider(_PluginBase):
         try:
             if not self._spider_helper:
                 return {"success": False, "message": "爬虫助手未初始化"}
+            from app.plugins.extendspider.plugins.base import _ExtendSpiderBase
+            from app.plugins.extendspider.utils.challenge_broker import ChallengeBroker
+            from app.plugins.extendspider.utils.browser_pool import PlaywrightPool
+            from app.plugins.extendspider.utils.flaresolverr_pool import FlareSolverrSessionPool
 
             # 获取所有爬虫状态
             total = len(self._spider_config)
@@ -547,10 +601,14 @@ class ExtendSpider(_PluginBase):
                     url = self._spider_helper.get_spider_url(spider_name)
                     if url:
                         spider_urls[spider_name] = url
+            # DrissionPage 浏览器为共享单例，只从已创建浏览器的爬虫获取，避免查询状态时启动浏览器
+            tab_pool = None
             for spider in self._spider_helper.running_spiders:
                 url = spider.spider_url
                 if url:
                     spider_urls[spider.spider_name] = url
+                if tab_pool is None and spider.drission_browser:
+                    tab_pool = spider.drission_browser.tab_pool_stats()
             return {
                 "success": True,
                 "total": total,
@@ -558,6 +616,14 @@ class ExtendSpider(_PluginBase):
                 "disabled": disabled,
                 "tags": list(all_tags),
                 "spider_urls": spider_urls,
+                "search_cache": self._search_cache.stats(),
+                "single_flight": self._search_flight.stats(),
+                "search_keys": _search_keys.stats(),
+                "detail_cache": _ExtendSpiderBase._detail_cache.stats(),
+                "challenge": ChallengeBroker().stats(),
+                "playwright_pool": PlaywrightPool().stats(),
+                "tab_pool": tab_pool,
+                "flaresolverr_sessions": FlareSolverrSessionPool().stats(),
                 "status": "running" if self._enabled else "stopped"
             }
         except Exception as e:
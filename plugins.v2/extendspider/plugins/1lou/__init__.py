@@ -3,17 +3,19 @@ import threading
 import time
 import traceback
 
-from bs4 import BeautifulSoup
-
 from app.helper.search_filter import SearchFilterHelper
 from app.log import logger
 from app.schemas import SearchContext
 from app.plugins.extendspider.plugins.base import _ExtendSpiderBase
 from app.plugins.extendspider.utils.file import delete_folder, creat_folder
 from app.plugins.extendspider.utils.file_server import FileCodeBox
+from app.plugins.extendspider.utils.html_parser import ParseSpec
 from app.plugins.extendspider.utils.token_worker import TokenWorker
 from app.plugins.extendspider.utils.url import xn_url_encode
 
+# 搜索页只需要结果列表和分页
+_SEARCH_SPEC = ParseSpec("li.media.thread.tap", "ul.pagination")
+
 
 class Bt1louSpider(_ExtendSpiderBase):
 
@@ -70,25 +72,25 @@ class Bt1louSpider(_ExtendSpiderBase):
 
         except Exception as e:
             logger.error(f"搜索过程发生错误: {str(e)}, {traceback.format_exc()}")
+            self._report_failure(str(e))
             return []
 
     @staticmethod
-    def _parse_total_pages(html_content: str) -> int:
+    def _parse_total_pages(soup) -> int:
         """解析总页数"""
         try:
-            soup = BeautifulSoup(html_content, "html.parser")
-            pagination = soup.find("ul", class_="pagination")
+            pagination = soup.select_one("ul.pagination")
             if not pagination:
                 return 1
 
             # 获取所有页码链接
-            page_items = pagination.find_all("li", class_="page-item")
+            page_items = pagination.select("li.page-item")
             if not page_items or len(page_items) < 2:
                 return 1
 
             # 获取最后一个li的文本（排除▶按钮）
             last_item = page_items[-1]
-            last_text = last_item.find("a", class_="page-link").text.strip()
+            last_text = last_item.select_one("a.page-link").text.strip()
 
             # 如果最后一个不是▶，说明只有一页
             if last_text != "▶":
@@ -96,7 +98,7 @@ class Bt1louSpider(_ExtendSpiderBase):
 
             # 获取倒数第二个li的文本
             second_last_item = page_items[-2]
-            second_last_text = second_last_item.find("a", class_="page-link").text.strip()
+            second_last_text = second_last_item.select_one("a.page-link").text.strip()
 
             # 如果倒数第二个是...XX格式，说明页数大于10
             if second_last_text.startswith("..."):
@@ -127,13 +129,14 @@ class Bt1louSpider(_ExtendSpiderBase):
         _processed_urls = set()
         detail_urls = {}
 
-        # 抓取第一页
-        self._parse_search_page_detail_urls(html, _processed_titles,
+        # 抓取第一页，页面只解析一次，详情链接和总页数共用
+        soup = self.html_parser.parse(html, _SEARCH_SPEC) if html else None
+        self._parse_search_page_detail_urls(soup, _processed_titles,
                                             _processed_urls, detail_urls)
 
         if not one_page:
             # 解析总页数
-            total_pages = self._parse_total_pages(html)
+            total_pages = self._parse_total_pages(soup) if soup else 1
             # 计算需要抓取的页数
             pages_to_fetch = min(total_pages or 1, self.spider_max_load_page)
             logger.info(f"{self.spider_name}-总页数: {total_pages or 1}, 将抓取前 {pages_to_fetch} 页")
@@ -147,7 +150,8 @@ class Bt1louSpider(_ExtendSpiderBase):
                         logger.info(f"{self.spider_name}-正在抓取第 {current_page} 页: {search_url}")
                         res = self.spider_proxy_client.request("GET", search_url)
                         html = res.content
-                        self._parse_search_page_detail_urls(html, _processed_titles,
+                        self._parse_search_page_detail_urls(self.html_parser.parse(html, _SEARCH_SPEC) if html else None,
+                                                            _processed_titles,
                                                             _processed_urls, detail_urls)
                     except Exception as e:
                         logger.error(f"{self.spider_name}-抓取第 {current_page} 页时发生错误: {str(e)}")
@@ -176,25 +180,20 @@ class Bt1louSpider(_ExtendSpiderBase):
         logger.info(f"{self.spider_name}-搜索完成，共找到 {len(results)} 个结果")
         return results
 
-    def _parse_search_page_detail_urls(self, html_content: str, _processed_titles, _processed_urls, detail_urls: dict
-                                       ):
+    def _parse_search_page_detail_urls(self, soup, _processed_titles, _processed_urls, detail_urls: dict):
         """搜索结果解析，主要收集详情页信息"""
-        if not html_content:
+        if not soup:
             return _processed_titles, detail_urls
-        # 获取页面内容
-        soup = BeautifulSoup(html_content, "html.parser")
-        for result in soup.find_all("li", class_="media thread tap"):
+        for result in soup.select("li.media.thread.tap"):
+            subject = result.select_one("div.subject.break-all")
             # 不是磁力或者种子的链接
-            if not result.find("div", class_="subject break-all").find("i", class_="icon small filetype other"):
+            if not subject or not subject.select_one("i.icon.small.filetype.other"):
                 continue
-            title_link = result.find("div", class_="subject break-all").find("a")
+            title_link = subject.select_one("a")
             if not title_link or not title_link.get('href'):
                 continue
-            # 处理标题中的 text-danger 标签
-            title = ''.join(
-                c.text if getattr(c, 'name', None) == "span" and "text-danger" in c.get("class", []) else str(c)
-                for c in title_link.contents
-            ).strip()
+            # 标题中的关键词被 text-danger 标签包裹，取纯文本
+            title = title_link.get_text().strip()
             detail_url = title_link['href']
             if not detail_url.startswith("http"):
                 detail_url = f"{self.spider_url}/{detail_url}"
@@ -225,6 +224,12 @@ class Bt1louSpider(_ExtendSpiderBase):
             logger.info(f"{self.spider_name}-没有可处理的详情页")
             return results
 
+        # 已缓存的详情页不再下载种子
+        results, uncached_urls = self._split_cached_details([it["url"] for it in queue_items])
+        queue_items = [it for it in queue_items if it["url"] in uncached_urls]
+        if not queue_items:
+            return results
+
         # 临时目录
         import time as _time
         tmp_folder = os.path.join(self.tmp_folder, str(int(_time.time())))
@@ -246,8 +251,13 @@ class Bt1louSpider(_ExtendSpiderBase):
             worker.join(timeout=5)
 
             # 种子文件下载转磁力
-            results = self._torrent_to_link(tmp_folder)
-            logger.info(f"{self.spider_name}-下载/转磁力完成，共获取到 {len(results)} 个种子")
+            torrents = self._torrent_to_link(tmp_folder)
+            logger.info(f"{self.spider_name}-下载/转磁力完成，共获取到 {len(torrents)} 个种子")
+            # 种子文件按详情页标题命名，据此对应回详情页并缓存
+            file_urls = {f"{TokenWorker._sanitize_filename(it['title'])}.torrent": it["url"] for it in queue_items}
+            for torrent in torrents:
+                self._set_detail_cache(file_urls.get(torrent["title"]), [torrent])
+            results.extend(torrents)
 
         finally:
             delete_folder(tmp_folder)
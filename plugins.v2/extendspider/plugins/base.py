@@ -1,16 +1,18 @@
+import functools
 import random
 import concurrent
 import threading
 import time
 from abc import ABCMeta, abstractmethod
 from concurrent.futures import ThreadPoolExecutor
-from typing import Optional, Tuple
-from urllib.parse import urlparse
+from typing import Optional, Tuple, Dict, Callable
+from urllib.parse import urlparse, urlsplit, urlunsplit, parse_qsl, urlencode
+
+from cachetools import TTLCache
 
 from app.core.config import settings
 from app.helper.search_filter import SearchFilterHelper
 from app.log import logger
-from app.modules.indexer.utils.proxy import ProxyFactory
 from app.schemas import SearchContext
 from app.sites.site_limiter import SiteRateLimiter
 from app.utils.string import StringUtils
@@ -19,9 +21,17 @@ import asyncio
 import sys
 import os
 
+from app.plugins.extendspider.utils.circuit_breaker import CircuitBreaker
+from app.plugins.extendspider.utils.clearance_store import ClearanceStore, egress_key
 from app.plugins.extendspider.utils.drission_page import DrissonBrowser
 from app.plugins.extendspider.utils.file import clear_temp_folder
 from app.plugins.extendspider.utils.file_server import FileCodeBox
+from app.plugins.extendspider.utils.html_parser import HtmlParser
+from app.plugins.extendspider.utils.http_client import HttpClient
+from app.plugins.extendspider.utils.proxy import ProxyFactory
+from app.plugins.extendspider.utils.resource_policy import ResourceBlockPolicy
+from app.plugins.extendspider.utils.search_cache import PersistentTLRUCache
+from app.plugins.extendspider.utils.pass_verify import is_cloud_flare_verification_page, is_slider_verification_page
 
 
 class _ExtendSpiderBase(metaclass=ABCMeta):
@@ -80,6 +90,21 @@ class _ExtendSpiderBase(metaclass=ABCMeta):
     # 浏览器
     browser = None
 
+    # 各域名获取页面需要的方式 {域名: (http/browser, 记录时间)}，所有爬虫共享
+    _fetch_modes: Dict[str, Tuple[str, float]] = {}
+    # 需要浏览器的域名多久后重新尝试直接请求（秒）
+    _fetch_mode_ttl = 3600
+    # 直接请求超时时间（秒）
+    _fetch_timeout = 20
+
+    # 按搜索绑定到线程的状态：失败记录、本次搜索的资源拦截策略
+    _SEARCH_STATE = ("failures", "resource_policy")
+
+    # 详情页解析结果缓存，键为 (爬虫名称, 归一化后的详情页地址)，所有爬虫共享，
+    # 各爬虫可通过 detail_cache_ttl（秒）单独设置有效期，设置为 0 时不缓存
+    _detail_cache = PersistentTLRUCache(settings.PLUGIN_DATA_PATH / "extendspider" / "detail_cache.db",
+                                        ttl=24 * 3600, maxsize=2000)
+
     def __init__(self, config: dict = None):
         self._plugin_name = config.get("plugin_name", "ExtendSpider")
         self.spider_name = config.get("spider_name")
@@ -101,6 +126,21 @@ class _ExtendSpiderBase(metaclass=ABCMeta):
         # 跳过cloudflare
         self.pass_cloud_flare = config.get("pass_cloud_flare", False)
         self.spider_ua = config.get("spider_ua", settings.USER_AGENT)
+        # 浏览器资源拦截（图片、字体、样式、广告脚本等）
+        self._resource_policy = ResourceBlockPolicy.from_config(config)
+        # 页面解析器，html_parser 指定后端
+        self.html_parser = HtmlParser.from_config(config)
+        # 熔断：连续 circuit_failures 次搜索失败后 circuit_recovery 秒内不再访问站点
+        self.circuit_breaker = CircuitBreaker(config.get("circuit_failures", 3), config.get("circuit_recovery", 600))
+        # 站点正常但没有结果的检索词，negative_cache_ttl 秒内不再重复搜索
+        self._negative_cache = TTLCache(maxsize=256, ttl=config.get("negative_cache_ttl", 600))
+        self._state_lock = threading.Lock()
+        # 当前线程所属搜索的失败记录，每次搜索单独记录，并发搜索互不影响
+        self._search_state = threading.local()
+        # 详情页缓存有效期（秒）
+        self.detail_cache_ttl = float(config.get("detail_cache_ttl", self._detail_cache.ttl) or 0)
+        if self.detail_cache_ttl:
+            self._detail_cache.ttls[self.spider_name] = self.detail_cache_ttl
         self.spider_headers = {
             "User-Agent": settings.USER_AGENT,
         }
@@ -131,13 +171,15 @@ class _ExtendSpiderBase(metaclass=ABCMeta):
             proxy_config = {
                 'proxy_type': 'flaresolverr',
                 'flaresolverr_url': settings.FLARESOLVERR_URL,
-                'session_id': f"moviepilot_{self.spider_name}"
+                'session_id': f"moviepilot_{self.spider_name}",
+                'pool_size': config.get("flaresolverr_sessions", 2),
+                'cookies_only': config.get("flaresolverr_cookies_only", False),
             }
         else:
             proxy_config = {
                 'proxy_type': 'direct',
             }
-        self.spider_proxy_client = ProxyFactory.create_proxy(headers={},
+        self.spider_proxy_client = ProxyFactory.create_proxy(headers={}, egress=egress_key(self.spider_proxy),
                                                              **proxy_config)
         logger.info(f"{self.spider_name}-初始化代理类型: {proxy_config.get('proxy_type')}, 配置: {proxy_config}")
         # 初始化过滤
@@ -301,10 +343,139 @@ class _ExtendSpiderBase(metaclass=ABCMeta):
         state, result, search_context = self._pre_search_check(keyword, context=search_context)
         if not state:
             return result
-        logger.info(f"{self.spider_name}-开始搜索 检索词: {keyword} ")
         new_page = page if page > 1 else 1
+        # 各爬虫会按上下文过滤结果，同一检索词在不同上下文下结果可能不同
+        media_info = getattr(search_context, "media_info", None)
+        negative_key = (keyword, new_page, getattr(media_info, "title", None), getattr(media_info, "imdb_id", None))
+        with self._state_lock:
+            skip = negative_key in self._negative_cache
+        if skip:
+            logger.info(f"{self.spider_name}-检索词 {keyword} 近期无结果，跳过搜索")
+            return []
+        if not self.circuit_breaker.allow():
+            logger.warn(f"{self.spider_name}-站点连续失败已熔断，{self.circuit_breaker.retry_after():.0f} 秒后重试，"
+                        f"跳过搜索: {keyword}")
+            return []
+        logger.info(f"{self.spider_name}-开始搜索 检索词: {keyword} ")
+        policy = self._search_state.resource_policy = self._resource_policy.scope() if self._resource_policy else None
+        parser_snapshot = self.html_parser.snapshot()
+        failures = self._search_state.failures = []
+        try:
+            results = self._do_search(keyword, page=new_page, ctx=search_context)
+        except Exception as e:
+            self.circuit_breaker.record_failure(str(e))
+            raise
+        finally:
+            self._search_state.failures = None
+            self._search_state.resource_policy = None
+            parsed = self.html_parser.since(parser_snapshot)
+            if parsed["documents"]:
+                logger.info(f"{self.spider_name}-本次搜索解析 {parsed['documents']} 个页面"
+                            f"（{StringUtils.str_filesize(parsed['bytes'])}），"
+                            f"解析器 {self.html_parser.backend} CPU 耗时 {parsed['cpu_time'] * 1000:.1f}ms")
+            if policy:
+                saved = policy.stats()
+                if saved["requests"]:
+                    logger.info(f"{self.spider_name}-本次搜索拦截 {saved['requests']} 个资源请求，"
+                                f"按 Content-Length 节省 {StringUtils.str_filesize(saved['bytes'])}，"
+                                f"另有 {saved['estimated_requests']} 个未知大小的请求估算约 "
+                                f"{StringUtils.str_filesize(saved['estimated_bytes'])}，明细: {saved['types']}")
+        if not results and failures:
+            # 没有结果且过程中访问站点失败，计入熔断
+            if self.circuit_breaker.record_failure(failures[-1]):
+                logger.warn(f"{self.spider_name}-站点连续失败，暂停搜索 {self.circuit_breaker.recovery_time:.0f} 秒")
+        else:
+            self.circuit_breaker.record_success()
+            if not results:
+                with self._state_lock:
+                    self._negative_cache[negative_key] = True
+        return results
+
+    def _report_failure(self, error: str = ""):
+        """
+        记录一次站点访问失败（请求失败、验证未通过、页面结构异常等），搜索无结果时据此判断是否计入熔断
+        只记入当前线程所属的搜索，在其它线程中执行的函数需先经 _bind_search 绑定
+        """
+        failures = getattr(self._search_state, "failures", None)
+        if failures is not None:
+            failures.append(error)
+
+    @property
+    def resource_policy(self) -> Optional[ResourceBlockPolicy]:
+        """
+        资源拦截策略，搜索过程中返回本次搜索单独统计的策略
+        """
+        return getattr(self._search_state, "resource_policy", None) or self._resource_policy
 
-        return self._do_search(keyword, page=new_page, ctx=search_context)
+    def _bind_search(self, func: Callable) -> Callable:
+        """
+        将当前搜索的失败记录和资源拦截统计绑定到 func，用于提交到线程池、浏览器池中执行的函数
+        """
+        state = {name: getattr(self._search_state, name, None) for name in self._SEARCH_STATE}
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            previous = {name: getattr(self._search_state, name, None) for name in self._SEARCH_STATE}
+            for name, value in state.items():
+                setattr(self._search_state, name, value)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                for name, value in previous.items():
+                    setattr(self._search_state, name, value)
+
+        return wrapper
+
+    @staticmethod
+    def normalize_detail_url(url: str) -> str:
+        """
+        归一化详情页地址，忽略协议、域名大小写、默认端口、重复和末尾的 /、查询参数顺序和锚点
+        """
+        parts = urlsplit(url.strip())
+        netloc = (parts.hostname or "").lower()
+        if parts.port and parts.port not in (80, 443):
+            netloc = f"{netloc}:{parts.port}"
+        path = "/".join(segment for segment in parts.path.split("/") if segment)
+        query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+        return urlunsplit(("", netloc, f"/{path}", query, ""))
+
+    def _get_detail_cache(self, detail_url: str) -> Optional[list]:
+        """
+        获取详情页缓存的种子，未缓存返回 None
+        """
+        if not self.detail_cache_ttl or not detail_url:
+            return None
+        torrents = self._detail_cache.get((self.spider_name, self.normalize_detail_url(detail_url)))
+        if not torrents:
+            return None
+        # 返回副本，调用方会修改结果
+        return [dict(torrent) for torrent in torrents]
+
+    def _set_detail_cache(self, detail_url: str, torrents: Optional[list]):
+        """
+        缓存详情页解析出的种子，没有种子时不缓存，下次重新访问
+        """
+        if not self.detail_cache_ttl or not detail_url or not torrents:
+            return
+        self._detail_cache[(self.spider_name, self.normalize_detail_url(detail_url))] = \
+            [dict(torrent) for torrent in torrents]
+
+    def _split_cached_details(self, detail_urls) -> Tuple[list, list]:
+        """
+        按详情页缓存拆分详情页地址
+        :return: (缓存中的种子, 需要访问的详情页地址)
+        """
+        results, uncached = [], []
+        for detail_url in detail_urls:
+            torrents = self._get_detail_cache(detail_url)
+            if torrents is None:
+                uncached.append(detail_url)
+            else:
+                results.extend(torrents)
+        if results:
+            logger.info(f"{self.spider_name}-{len(detail_urls) - len(uncached)} 个详情页命中缓存"
+                        f"（{len(results)} 个种子），{len(uncached)} 个需要访问")
+        return results, uncached
 
     def _pre_search_check(self, keyword: str, context: SearchContext) -> Tuple[bool, list, SearchContext]:
         """
@@ -385,6 +556,14 @@ class _ExtendSpiderBase(metaclass=ABCMeta):
                     result['size'] = size
 
     def _from_pass_cloud_flare(self, url):
+        # 优先使用已保存且未过期的 clearance，重启后无需重新验证
+        stored = ClearanceStore().find(url, egress_key(self.spider_proxy))
+        if stored:
+            logger.info(f"{self.spider_name}-使用已保存的 clearance: {stored['domain']}")
+            self.spider_cookie = list(stored["cookies"])
+            self.spider_ua = stored["ua"] or self.spider_ua
+            self.spider_headers["User-Agent"] = self.spider_ua
+            return
         # 发请求获取 cookies
         response = self.spider_proxy_client.request('GET', url)
         if not response.cookies:
@@ -406,3 +585,103 @@ class _ExtendSpiderBase(metaclass=ABCMeta):
         self.spider_cookie = cookies
         self.spider_ua = response.user_agent if hasattr(response, "user_agent") else self.spider_ua
         self.spider_headers["User-Agent"] = self.spider_ua
+
+    @staticmethod
+    def _is_challenge_page(html: str) -> bool:
+        """
+        判断页面是否为 Cloudflare/滑块 验证页
+        """
+        return is_cloud_flare_verification_page(html) or is_slider_verification_page(html)
+
+    def get_fetch_mode(self, url: str) -> Optional[str]:
+        """
+        获取域名已记录的页面获取方式
+        :return: http/browser，未记录或已过期返回 None
+        """
+        record = self._fetch_modes.get(urlparse(url).hostname)
+        if not record:
+            return None
+        mode, record_time = record
+        if mode == "browser" and time.time() - record_time > self._fetch_mode_ttl:
+            return None
+        return mode
+
+    def _set_fetch_mode(self, url: str, mode: str):
+        domain = urlparse(url).hostname
+        if self._fetch_modes.get(domain, ("", 0))[0] != mode:
+            logger.info(f"{self.spider_name}-域名 {domain} 页面获取方式: {mode}")
+        self._fetch_modes[domain] = (mode, time.time())
+
+    def _fetch_html(self, url: str, wait_until: str = "domcontentloaded") -> Optional[str]:
+        """
+        获取页面 HTML，优先使用爬虫的 cookies 和 UA 直接请求，遇到验证页时回退到浏览器，
+        并记录域名需要的方式，之后同一域名直接走对应的方式。
+        浏览器回退会向浏览器池提交任务，不能在浏览器池的任务函数中调用。
+        :param url: 页面地址
+        :param wait_until: 浏览器等待的加载状态
+        :return: 页面 HTML，失败返回 None
+        """
+        if self.get_fetch_mode(url) != "browser":
+            html, need_browser = self._fetch_html_by_http(url)
+            if not need_browser:
+                self._set_fetch_mode(url, "http")
+                if not html:
+                    self._report_failure(f"页面获取失败: {url}")
+                return html
+            self._set_fetch_mode(url, "browser")
+        html = self._fetch_html_by_browser(url, wait_until=wait_until)
+        if not html:
+            self._report_failure(f"浏览器获取页面失败: {url}")
+        return html
+
+    def _fetch_html_by_http(self, url: str) -> Tuple[Optional[str], bool]:
+        """
+        直接请求页面
+        :return: (页面 HTML, 是否需要浏览器)
+        """
+        domain = urlparse(url).hostname or ""
+        ua = self.spider_ua or settings.USER_AGENT
+        stored = ClearanceStore().get_cookies(url, ua, egress_key(self.spider_proxy))
+        cookies = {
+            cookie.get("name"): cookie.get("value")
+            for cookie in stored + list(self.spider_cookie or [])
+            if not cookie.get("domain") or domain.endswith(cookie.get("domain").lstrip("."))
+        }
+        headers = {**self.spider_headers, "User-Agent": ua}
+        try:
+            response = HttpClient().get(url, headers=headers, cookies=cookies, proxy=self.spider_proxy,
+                                        timeout=self._fetch_timeout)
+        except requests.exceptions.RequestException as e:
+            logger.warn(f"{self.spider_name}-直接请求失败，改用浏览器: {url} {str(e)}")
+            return None, True
+        if response.status_code in (403, 429, 503) or self._is_challenge_page(response.text):
+            logger.info(f"{self.spider_name}-直接请求遇到验证页，改用浏览器: {url} HTTP {response.status_code}")
+            return None, True
+        if not response.ok:
+            logger.warn(f"{self.spider_name}-直接请求失败: {url} HTTP {response.status_code}")
+            return None, False
+        return response.text, False
+
+    def _fetch_html_by_browser(self, url: str, wait_until: str = "domcontentloaded") -> Optional[str]:
+        """
+        通过浏览器池获取页面，通过验证后更新爬虫 cookies
+        """
+        from app.plugins.extendspider.utils.browser import create_stealth_page
+        from app.plugins.extendspider.utils.browser_pool import PlaywrightPool
+        from app.plugins.extendspider.utils.url import pass_cloudflare
+
+        def _fetch(context) -> Optional[str]:
+            page = create_stealth_page(context)
+            if not pass_cloudflare(url, page):
+                logger.warn(f"{self.spider_name}-cloudflare challenge fail！{url}")
+                return None
+            page.wait_for_load_state(wait_until, timeout=30 * 1000)
+            self.spider_cookie = context.cookies()
+            return page.content()
+
+        try:
+            return PlaywrightPool().run(_fetch, proxy=self.spider_proxy, cookies=self.spider_cookie,
+                                        resource_policy=self.resource_policy)
+        except Exception as e:
+            logger.error(f"{self.spider_name}-浏览器获取页面失败: {url} {str(e)}")
+            return None
@@ -1,19 +1,25 @@
 import traceback
-from concurrent.futures import as_completed, ThreadPoolExecutor
+from concurrent.futures import as_completed
 from typing import Tuple, Optional, Dict
 
-from bs4 import BeautifulSoup
 from app.log import logger
 from app.plugins.extendspider.plugins.base import _ExtendSpiderBase
 from app.plugins.extendspider.utils.url import pass_cloudflare
-from app.plugins.extendspider.utils.browser import create_browser, create_stealth_page
-from playwright.sync_api import Page
+from app.plugins.extendspider.utils.browser import create_stealth_page
+from app.plugins.extendspider.utils.browser_pool import PlaywrightPool
+from app.plugins.extendspider.utils.html_parser import ParseSpec
+from playwright.sync_api import Page, BrowserContext
 from app.schemas import SearchContext, TorrentInfo
 
 from app.helper.search_filter import SearchFilterHelper
 from app.utils.common import retry
 from app.utils.string import StringUtils
 
+# 搜索页只需要结果列表，详情页只需要下载列表，下载页只需要种子信息和下载按钮
+_SEARCH_SPEC = ParseSpec("div.module-list")
+_DOWNLIST_SPEC = ParseSpec("div.module-downlist")
+_TORRENT_SPEC = ParseSpec("div.box.view-heading.tinfo", "div.video-info-footer.display")
+
 
 class BtBtlSpider(_ExtendSpiderBase):
 
@@ -36,80 +42,76 @@ class BtBtlSpider(_ExtendSpiderBase):
             logger.warning(f"{self.spider_name}-搜索关键词为空")
             return []
 
-        results = []
         try:
-            browser, context = create_browser(self.spider_proxy)
-            browser_page = create_stealth_page(context)
-
-            try:
-                # 访问主页并处理 Cloudflare
-                logger.info(f"{self.spider_name}-正在访问 {self.spider_url}...")
-                if not pass_cloudflare(self.spider_url, browser_page):
-                    logger.warn("cloudflare challenge fail！")
-                    return []
-                # 等待页面加载完成
-                browser_page.wait_for_load_state("networkidle", timeout=15 * 1000)
-                logger.info(f"{self.spider_name}-访问主页成功,开始搜索【{keyword}】...")
-                self._wait_inner()
-                self.spider_cookie = context.cookies()
-                # 执行搜索
-                browser_page.fill("#txtKeywords", keyword)
-                browser_page.click("button[type='submit'].search-go")
-                browser_page.wait_for_load_state("networkidle", timeout=30 * 1000)
-                logger.info(f"{self.spider_name}-搜索完成，开始解析结果...")
-                results = self._parse_search_result(keyword, browser_page, ctx)
-                logger.info(f"{self.spider_name}-搜索完成，共找到 {len(results)} 个结果")
-                return results
-
-            except Exception as e:
-                logger.error(f"{self.spider_name}-搜索过程发生错误: {str(e)}")
-                return []
-            finally:
-                browser_page.close()
-                context.close()
-                browser.close()
-
+            down_urls = PlaywrightPool().run(self._bind_search(self._search_down_urls), keyword,
+                                             proxy=self.spider_proxy, resource_policy=self.resource_policy)
         except Exception as e:
-            logger.error(f"Playwright 初始化失败: {str(e)}")
+            logger.error(f"{self.spider_name}-搜索过程发生错误: {str(e)}")
+            self._report_failure(str(e))
             return []
+        results = self._parse_search_result(keyword, down_urls, ctx)
+        logger.info(f"{self.spider_name}-搜索完成，共找到 {len(results)} 个结果")
+        return results
+
+    def _search_down_urls(self, context: BrowserContext, keyword: str) -> Dict[str, str]:
+        """ 在浏览器池中执行搜索并逐个访问详情页，返回 {种子名称: 下载页地址} """
+        browser_page = create_stealth_page(context)
+        # 访问主页并处理 Cloudflare
+        logger.info(f"{self.spider_name}-正在访问 {self.spider_url}...")
+        if not pass_cloudflare(self.spider_url, browser_page):
+            logger.warn("cloudflare challenge fail！")
+            self._report_failure("cloudflare 验证失败")
+            return {}
+        # 等待页面加载完成
+        browser_page.wait_for_load_state("networkidle", timeout=15 * 1000)
+        logger.info(f"{self.spider_name}-访问主页成功,开始搜索【{keyword}】...")
+        self._wait_inner()
+        self.spider_cookie = context.cookies()
+        # 执行搜索
+        browser_page.fill("#txtKeywords", keyword)
+        browser_page.click("button[type='submit'].search-go")
+        browser_page.wait_for_load_state("networkidle", timeout=30 * 1000)
+        logger.info(f"{self.spider_name}-搜索完成，开始解析结果...")
+
+        # 获取页面内容
+        content = browser_page.content()
+        soup = self.html_parser.parse(content, _SEARCH_SPEC)
+        detail_tags = soup.select_one("div.module-list  div.module-items")
+        # 判断是否有搜索结果
+        if not detail_tags:
+            return {}
+        detail_urls = set()
+        for detail_tag in detail_tags.select("div.module-item-titlebox a.module-item-title"):
+            detail_url = detail_tag['href'].strip()
+            if not detail_url.startswith("http"):
+                detail_url = f"{self.spider_url}{detail_url}"
+            detail_urls.add(detail_url)
+        down_urls = {}
+        if detail_urls:
+            logger.info(f"{self.spider_name}-解析到{len(detail_urls)}个搜索结果，开始获取链接地址...")
+            for url in detail_urls:
+                down_urls = self._get_down_urls(url, browser_page, down_urls)
+        return down_urls
 
-    def _parse_search_result(self, keyword: str, page: Page, ctx: SearchContext):
+    def _parse_search_result(self, keyword: str, down_urls: Dict[str, str], ctx: SearchContext):
         try:
-            # 获取页面内容
-            content = page.content()
-            soup = BeautifulSoup(content, "html.parser")
-            detail_tags = soup.select_one("div.module-list  div.module-items")
-            # 判断是否有搜索结果
-            if not detail_tags:
-                return []
-            detail_urls = set()
-            for detail_tag in detail_tags.select("div.module-item-titlebox a.module-item-title"):
-                detail_url = detail_tag['href'].strip()
-                if not detail_url.startswith("http"):
-                    detail_url = f"{self.spider_url}{detail_url}"
-                detail_urls.add(detail_url)
             results = []
-            if detail_urls:
-                logger.info(f"{self.spider_name}-解析到{len(detail_urls)}个搜索结果，开始获取链接地址...")
-                down_urls = {}
-                for url in detail_urls:
-                    down_urls = self._get_down_urls(url, page, down_urls)
-                if down_urls:
-                    urls = []
-                    # 过滤种子
-                    if ctx.enable_search_filter:
-                        to_filter_titles = [name for name in down_urls.keys()]
-                        filter_titles = SearchFilterHelper().do_filter(StringUtils.get_url_domain(self.spider_url),
-                                                                       keyword, to_filter_titles, ctx, True)
-                        urls = [down_urls[name] for name in down_urls.keys() if name in filter_titles]
-                    else:
-                        urls = [down_urls[name] for name in down_urls.keys()]
-                    if not urls:
-                        return []
-                    if 0 < self.spider_max_load_result < len(urls):
-                        urls = urls[:self.spider_max_load_result]
-                        logger.info(f"{self.spider_name}-已过滤，仅获取前 {self.spider_max_load_result} 个种子")
-                    results = self._get_torrent(urls)
+            if down_urls:
+                urls = []
+                # 过滤种子
+                if ctx.enable_search_filter:
+                    to_filter_titles = [name for name in down_urls.keys()]
+                    filter_titles = SearchFilterHelper().do_filter(StringUtils.get_url_domain(self.spider_url),
+                                                                   keyword, to_filter_titles, ctx, True)
+                    urls = [down_urls[name] for name in down_urls.keys() if name in filter_titles]
+                else:
+                    urls = [down_urls[name] for name in down_urls.keys()]
+                if not urls:
+                    return []
+                if 0 < self.spider_max_load_result < len(urls):
+                    urls = urls[:self.spider_max_load_result]
+                    logger.info(f"{self.spider_name}-已过滤，仅获取前 {self.spider_max_load_result} 个种子")
+                results = self._get_torrent(urls)
             logger.info(f"{self.spider_name}-搜索结果解析完成，共找到 {len(results)} 个种子")
             return results
         except Exception as e:
@@ -125,7 +127,7 @@ class BtBtlSpider(_ExtendSpiderBase):
         detail_page.wait_for_load_state("networkidle", timeout=30 * 1000)
 
         content = detail_page.content()
-        soup = BeautifulSoup(content, "html.parser")
+        soup = self.html_parser.parse(content, _DOWNLIST_SPEC)
         a_tags = soup.select("div.module-downlist div.module-row-info a[title].module-row-text.copy")
 
         seen_titles = set()
@@ -148,62 +150,50 @@ class BtBtlSpider(_ExtendSpiderBase):
         return down_urls
 
     def _get_torrent(self, down_urls) -> Optional[list]:
-        results = []
-
-        # 将URL列表分成多个批次
-        def chunk_list(lst, chunk_size):
-            return [lst[i:i + chunk_size] for i in range(0, len(lst), chunk_size)]
+        # 已缓存的下载页不再访问
+        results, down_urls = self._split_cached_details(down_urls)
+        if not down_urls:
+            return results
 
-        def process_url_batch(url_batch, index):
-            try:
-                browser, context = create_browser(self.spider_proxy)
-                if self.spider_cookie:
-                    context.add_cookies(self.spider_cookie)
-                detail_page = create_stealth_page(context)
-
-                current_batch_results = []
-                try:
-                    for url_idx, down_url in enumerate(url_batch):
-                        self._wait_inner()  # 每个URL处理前等待
-                        logger.info(
-                            f"{self.spider_name}-线程 {index} 正在处理第 {url_idx + 1}/{len(url_batch)} 个下载页: {down_url}")
-
-                        state, data = self._parse_torrent(down_url, detail_page)
-                        if state and data:
-                            current_batch_results.append(data)
-                            logger.info(
-                                f"{self.spider_name}-线程 {index} 成功获取第 {url_idx + 1}/{len(url_batch)} 个下载页的种子信息")
-                finally:
-                    detail_page.close()
-                    context.close()
-                    browser.close()
-                return current_batch_results
-            except Exception as ex:
-                logger.error(f"{self.spider_name}-线程 {index} 处理批次失败: {str(ex)}")
-                return []
+        def process_url_batch(context: BrowserContext, url_batch, index):
+            detail_page = create_stealth_page(context)
+            current_batch_results = []
+            for url_idx, down_url in enumerate(url_batch):
+                self._wait_inner()  # 每个URL处理前等待
+                logger.info(
+                    f"{self.spider_name}-线程 {index} 正在处理第 {url_idx + 1}/{len(url_batch)} 个下载页: {down_url}")
+
+                state, data = self._parse_torrent(down_url, detail_page)
+                if state and data:
+                    self._set_detail_cache(down_url, [data])
+                    current_batch_results.append(data)
+                    logger.info(
+                        f"{self.spider_name}-线程 {index} 成功获取第 {url_idx + 1}/{len(url_batch)} 个下载页的种子信息")
+            return current_batch_results
 
         # 计算每个线程处理的URL数量
         batch_size = max(1, len(down_urls) // self.spider_batch_size)  # 确保每个批次至少有一个URL
-        url_batches = chunk_list(list(down_urls), batch_size)
+        url_batches = self.chunk_list(list(down_urls), batch_size)
 
         logger.info(f"{self.spider_name}-将 {len(down_urls)} 个下载页分成 {len(url_batches)} 个批次处理")
 
-        # 使用线程池并发处理批次
-        with ThreadPoolExecutor(max_workers=min(2, len(url_batches))) as executor:
-            future_to_batch = {
-                executor.submit(process_url_batch, batch, idx + 1): (idx, batch)
-                for idx, batch in enumerate(url_batches)
-            }
-
-            for future in as_completed(future_to_batch):
-                idx, batch = future_to_batch[future]
-                try:
-                    batch_results = future.result()
-                    results.extend(batch_results)
-                    logger.info(
-                        f"{self.spider_name}-第 {idx + 1}/{len(url_batches)} 个批次处理完成，获取到 {len(batch_results)} 个种子")
-                except Exception as e:
-                    logger.error(f"{self.spider_name}-第 {idx + 1}/{len(url_batches)} 个批次处理失败: {str(e)}")
+        # 提交到浏览器池并发处理批次
+        pool = PlaywrightPool()
+        future_to_batch = {
+            pool.submit(self._bind_search(process_url_batch), batch, idx + 1, proxy=self.spider_proxy,
+                        cookies=self.spider_cookie, resource_policy=self.resource_policy): (idx, batch)
+            for idx, batch in enumerate(url_batches)
+        }
+
+        for future in as_completed(future_to_batch):
+            idx, batch = future_to_batch[future]
+            try:
+                batch_results = future.result()
+                results.extend(batch_results)
+                logger.info(
+                    f"{self.spider_name}-第 {idx + 1}/{len(url_batches)} 个批次处理完成，获取到 {len(batch_results)} 个种子")
+            except Exception as e:
+                logger.error(f"{self.spider_name}-第 {idx + 1}/{len(url_batches)} 个批次处理失败: {str(e)}")
 
         logger.info(f"{self.spider_name}-所有批次处理完成，共获取到 {len(results)} 个种子")
         return results
@@ -211,18 +201,10 @@ class BtBtlSpider(_ExtendSpiderBase):
     def _parse_torrent(self, down_url: str, detail_page: Page = None) -> Tuple[bool, Optional[dict]]:
         try:
             if not detail_page:
-                browser, context = create_browser(self.spider_proxy)
-                if self.spider_cookie:
-                    context.add_cookies(self.spider_cookie)
-                detail_page = create_stealth_page(context)
-                try:
-                    return self._parse_torrent_content(down_url, detail_page)
-                finally:
-                    detail_page.close()
-                    context.close()
-                    browser.close()
-            else:
-                return self._parse_torrent_content(down_url, detail_page)
+                return PlaywrightPool().run(
+                    lambda context: self._parse_torrent_content(down_url, create_stealth_page(context)),
+                    proxy=self.spider_proxy, cookies=self.spider_cookie, resource_policy=self.resource_policy)
+            return self._parse_torrent_content(down_url, detail_page)
         except Exception as e:
             logger.error(f"{self.spider_name}-解析下载链接失败: {str(e)}", exc_info=True)
             return False, None
@@ -235,7 +217,7 @@ class BtBtlSpider(_ExtendSpiderBase):
         self._wait_inner()
 
         content = detail_page.content()
-        soup = BeautifulSoup(content, "html.parser")
+        soup = self.html_parser.parse(content, _TORRENT_SPEC)
         info_main = soup.select_one("div.box.view-heading.tinfo div.video-info-main")
         if not info_main:
             logger.warning(f"{self.spider_name}-找不到视频信息块")
@@ -1,16 +1,18 @@
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import threading
 
-from bs4 import BeautifulSoup
 from app.log import logger
 from app.plugins.extendspider.plugins.base import _ExtendSpiderBase
-from app.plugins.extendspider.utils.url import pass_cloudflare, get_dn, format_episode_title
-from app.plugins.extendspider.utils.browser import create_browser, create_stealth_page
-from playwright.sync_api import Page
+from app.plugins.extendspider.utils.url import get_dn, format_episode_title
+from app.plugins.extendspider.utils.html_parser import ParseSpec
 from app.schemas import SearchContext
 from app.helper.search_filter import SearchFilterHelper
 from app.utils.common import retry
 
+# 搜索页只需要“查看详情”链接所在段落，详情页只需要下载列表
+_SEARCH_SPEC = ParseSpec("p")
+_DETAIL_SPEC = ParseSpec("ul")
+
 
 class BtBuLuoSpider(_ExtendSpiderBase):
 
@@ -33,117 +35,70 @@ class BtBuLuoSpider(_ExtendSpiderBase):
             logger.warning(f"{self.spider_name}-搜索关键词为空")
             return []
 
-        try:
-            browser, context = create_browser(self.spider_proxy)
-            browser_page = create_stealth_page(context)
-
-            try:
-                # 访问主页并处理 Cloudflare
-                logger.info(f"{self.spider_name}-正在访问 {self.spider_url}...")
-                if not pass_cloudflare(self.spider_url, browser_page):
-                    logger.warn("cloudflare challenge fail！")
-                    return []
-
-                # 等待页面加载完成
-                browser_page.wait_for_load_state("networkidle", timeout=30 * 1000)
-                logger.info(f"{self.spider_name}-访问主页成功,开始搜索【{keyword}】...")
-                self._wait_inner()
-                self.spider_cookie = context.cookies()
-
-                # 执行搜索
-                search_url = self.get_search_url(keyword, page)
-                browser_page.goto(search_url)
-                browser_page.wait_for_load_state("networkidle", timeout=30 * 1000)
-                results = self._parse_search_result(browser_page, ctx)
-                logger.info(f"{self.spider_name}-搜索完成，共找到 {len(results)} 个结果")
-                return results
-
-            except Exception as e:
-                logger.error(f"{self.spider_name}-搜索过程发生错误: {str(e)}")
-                return []
-            finally:
-                browser_page.close()
-                context.close()
-                browser.close()
-
-        except Exception as e:
-            logger.error(f"Playwright 初始化失败: {str(e)}")
+        # 搜索页优先直接请求，遇到验证时才使用浏览器池
+        logger.info(f"{self.spider_name}-开始搜索【{keyword}】...")
+        content = self._fetch_html(self.get_search_url(keyword, page), wait_until="networkidle")
+        if not content:
             return []
+        detail_urls = self._parse_search_result(content)
+        if not detail_urls:
+            return []
+        # 获取种子信息
+        logger.info(f"{self.spider_name}-开始获取 {len(detail_urls)} 个详情页的种子信息")
+        results = self._parse_detail_results(detail_urls)
+        logger.info(f"{self.spider_name}-搜索完成，共找到 {len(results)} 个结果")
+        return results
 
-    def _parse_search_result(self, page: Page, ctx: SearchContext):
+    def _parse_search_result(self, content: str) -> set:
         try:
-            # 获取页面内容
-            content = page.content()
-            soup = BeautifulSoup(content, "html.parser")
-            detail_tags = soup.select("div p a:-soup-contains('查看详情')")
+            soup = self.html_parser.parse(content, _SEARCH_SPEC)
+            detail_tags = soup.select("p a:-soup-contains('查看详情')")
             if not detail_tags:
-                return []
-            
+                return set()
+
             detail_urls = set()
             for detail_tag in detail_tags:
                 detail_url = detail_tag['href']
                 if not detail_url.startswith("http"):
                     detail_url = f"{self.spider_url}/{detail_url}"
                 detail_urls.add(detail_url)
-            
-            if not detail_urls:
-                return []
-            
-            # 获取种子信息
-            logger.info(f"{self.spider_name}-开始获取 {len(detail_urls)} 个详情页的种子信息")
-            return self._parse_detail_results(detail_urls)
+            return detail_urls
 
         except Exception as e:
             logger.error(f"{self.spider_name}-解析搜索结果失败: {str(e)}")
-            return []
+            return set()
 
     def _parse_detail_results(self, detail_urls) -> list:
-        """ 处理详情页 """
-        results = []
-        _processed_titles = set()
-
-        # 将URL列表分成多个批次
-        def chunk_list(lst, chunk_size):
-            return [lst[i:i + chunk_size] for i in range(0, len(lst), chunk_size)]
+        """ 处理详情页，已缓存的详情页直接使用缓存的种子 """
+        results, detail_urls = self._split_cached_details(detail_urls)
+        if not detail_urls:
+            return results
 
         def process_url_batch(url_batch, index):
-            try:
-                browser, context = create_browser(self.spider_proxy)
-                if self.spider_cookie:
-                    context.add_cookies(self.spider_cookie)
-                detail_page = create_stealth_page(context)
-
-                current_batch_results = []
-                try:
-                    for url_idx, detail_url in enumerate(url_batch):
-                        self._wait_inner()  # 每个URL处理前等待
-                        logger.info(
-                            f"{self.spider_name}-线程 {index} 正在处理第 {url_idx + 1}/{len(url_batch)} 个详情页: {detail_url}")
-
-                        torrents = self._get_torrent_info(detail_page, detail_url, None)
-                        if torrents:
-                            current_batch_results.extend(torrents)
-                            logger.info(
-                                f"{self.spider_name}-线程 {index} 成功获取第 {url_idx + 1}/{len(url_batch)} 个详情页的种子信息: {len(torrents)} 个")
-                finally:
-                    detail_page.close()
-                    context.close()
-                    browser.close()
-                return current_batch_results
-            except Exception as ex:
-                logger.error(f"{self.spider_name}-线程 {index} 处理批次失败: {str(ex)}")
-                return []
+            current_batch_results = []
+            for url_idx, detail_url in enumerate(url_batch):
+                self._wait_inner()  # 每个URL处理前等待
+                logger.info(
+                    f"{self.spider_name}-线程 {index} 正在处理第 {url_idx + 1}/{len(url_batch)} 个详情页: {detail_url}")
+
+                torrents = self._get_torrent_info(detail_url, None)
+                if torrents:
+                    self._set_detail_cache(detail_url, torrents)
+                    current_batch_results.extend(torrents)
+                    logger.info(
+                        f"{self.spider_name}-线程 {index} 成功获取第 {url_idx + 1}/{len(url_batch)} 个详情页的种子信息: {len(torrents)} 个")
+            return current_batch_results
 
         # 计算每个线程处理的URL数量
         batch_size = max(1, len(detail_urls) // self.spider_batch_size)  # 确保每个批次至少有一个URL
-        url_batches = chunk_list(list(detail_urls), batch_size)
+        url_batches = self.chunk_list(list(detail_urls), batch_size)
 
         logger.info(f"{self.spider_name}-将 {len(detail_urls)} 个详情页分成 {len(url_batches)} 个批次处理")
 
-        # 使用线程池并发处理批次
+        # 详情页优先直接请求，遇到验证时才使用浏览器池
         with ThreadPoolExecutor(max_workers=min(4, len(url_batches))) as executor:
             future_to_batch = {
-                executor.submit(process_url_batch, batch, idx + 1): (idx, batch)
+                executor.submit(self._bind_search(process_url_batch), batch, idx + 1): (idx, batch)
                 for idx, batch in enumerate(url_batches)
             }
 
@@ -162,16 +117,15 @@ class BtBuLuoSpider(_ExtendSpiderBase):
         return results
 
     @retry(Exception, 5, 3, 2, logger=logger)
-    def _get_torrent_info(self, page: Page, detail_url: str, ctx: SearchContext = None) -> list:
+    def _get_torrent_info(self, detail_url: str, ctx: SearchContext = None) -> list:
         try:
             self._wait_inner()
             # 访问详情页
-            page.goto(detail_url)
-            page.wait_for_load_state("networkidle", timeout=30 * 1000)
+            content = self._fetch_html(detail_url, wait_until="networkidle")
+            if not content:
+                return []
             logger.info(f"{self.spider_name}-访问详情页成功,开始获取种子信息...")
-            # 获取页面内容
-            content = page.content()
-            soup = BeautifulSoup(content, "html.parser")
+            soup = self.html_parser.parse(content, _DETAIL_SPEC)
 
             results = []
             a_tags = soup.select("ul > li > a[title]")
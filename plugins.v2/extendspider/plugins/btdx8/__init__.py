@@ -1,16 +1,22 @@
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import as_completed
 import threading
+from typing import Tuple
 
-from bs4 import BeautifulSoup
 from app.log import logger
 from app.plugins.extendspider.plugins.base import _ExtendSpiderBase
 from app.plugins.extendspider.utils.url import pass_cloudflare, get_dn, format_episode_title
-from app.plugins.extendspider.utils.browser import create_browser, create_stealth_page
-from playwright.sync_api import Page
+from app.plugins.extendspider.utils.browser import create_stealth_page
+from app.plugins.extendspider.utils.browser_pool import PlaywrightPool
+from app.plugins.extendspider.utils.html_parser import ParseSpec
+from playwright.sync_api import Page, BrowserContext
 from app.schemas import SearchContext
 from app.helper.search_filter import SearchFilterHelper
 from app.utils.common import retry
 
+# 搜索页只需要结果网格；没有结果时返回的是详情页，同时保留下载链接
+_SEARCH_SPEC = ParseSpec("div.post-grid", "a.download-link")
+_DETAIL_SPEC = ParseSpec("a.download-link")
+
 
 class BtdxSpider(_ExtendSpiderBase):
 
@@ -34,130 +40,114 @@ class BtdxSpider(_ExtendSpiderBase):
             return []
 
         try:
-            browser, context = create_browser(self.spider_proxy)
-            browser_page = create_stealth_page(context)
-
-            try:
-                # 访问主页并处理 Cloudflare
-                logger.info(f"{self.spider_name}-正在访问 {self.spider_url}...")
-                if not pass_cloudflare(self.spider_url, browser_page):
-                    logger.warn("cloudflare challenge fail！")
-                    return []
-
-                # 等待页面加载完成
-                browser_page.wait_for_load_state("networkidle", timeout=30 * 1000)
-                logger.info(f"{self.spider_name}-访问主页成功,开始搜索【{keyword}】...")
-                self._wait_inner()
-                self.spider_cookie = context.cookies()
-
-                # 执行搜索
-                search_url = self.get_search_url(keyword, page)
-                browser_page.goto(search_url)
-                browser_page.wait_for_load_state("networkidle", timeout=30 * 1000)
-                results = self._parse_search_result(browser_page, ctx)
-                logger.info(f"{self.spider_name}-搜索完成，共找到 {len(results)} 个结果")
-                return results
-
-            except Exception as e:
-                logger.error(f"{self.spider_name}-搜索过程发生错误: {str(e)}")
-                return []
-            finally:
-                browser_page.close()
-                context.close()
-                browser.close()
-
+            detail_urls, results = PlaywrightPool().run(self._bind_search(self._search_detail_urls),
+                                                        keyword, page,
+                                                        proxy=self.spider_proxy,
+                                                        resource_policy=self.resource_policy)
         except Exception as e:
-            logger.error(f"Playwright 初始化失败: {str(e)}")
+            logger.error(f"{self.spider_name}-搜索过程发生错误: {str(e)}")
+            self._report_failure(str(e))
             return []
+        if detail_urls:
+            # 获取种子信息
+            logger.info(f"{self.spider_name}-开始获取 {len(detail_urls)} 个详情页的种子信息")
+            results = self._parse_detail_results(detail_urls)
+        logger.info(f"{self.spider_name}-搜索完成，共找到 {len(results)} 个结果")
+        return results
 
-    def _parse_search_result(self, page: Page, ctx: SearchContext):
+    def _search_detail_urls(self, context: BrowserContext, keyword: str, page: int) -> Tuple[set, list]:
+        """
+        在浏览器池中执行搜索
+        :return: (详情页地址, 搜索结果直接跳转到详情页时解析出的种子)
+        """
+        browser_page = create_stealth_page(context)
+        # 访问主页并处理 Cloudflare
+        logger.info(f"{self.spider_name}-正在访问 {self.spider_url}...")
+        if not pass_cloudflare(self.spider_url, browser_page):
+            logger.warn("cloudflare challenge fail！")
+            self._report_failure("cloudflare 验证失败")
+            return set(), []
+
+        # 等待页面加载完成
+        browser_page.wait_for_load_state("networkidle", timeout=30 * 1000)
+        logger.info(f"{self.spider_name}-访问主页成功,开始搜索【{keyword}】...")
+        self._wait_inner()
+        self.spider_cookie = context.cookies()
+
+        # 执行搜索
+        search_url = self.get_search_url(keyword, page)
+        browser_page.goto(search_url)
+        browser_page.wait_for_load_state("networkidle", timeout=30 * 1000)
+        return self._parse_search_result(browser_page)
+
+    def _parse_search_result(self, page: Page) -> Tuple[set, list]:
         try:
             # 获取页面内容
             content = page.content()
-            soup = BeautifulSoup(content, "html.parser")
+            soup = self.html_parser.parse(content, _SEARCH_SPEC)
             detail_tags = soup.select("div.post-grid div.post a.entry-thumb")
             # 判断是否有搜索结果 若是没有返回的页面直接是详情页
             if not detail_tags:
-                return self._parse_torrent(soup, page.url)
-            
+                return set(), self._parse_torrent(soup, page.url)
+
             detail_urls = set()
             for detail_tag in detail_tags:
                 detail_url = detail_tag['href'].strip()
                 if not detail_url.startswith("http"):
                     detail_url = f"{self.spider_url}/{detail_url}"
                 detail_urls.add(detail_url)
-            
-            if not detail_urls:
-                return []
-            
-            # 获取种子信息
-            logger.info(f"{self.spider_name}-开始获取 {len(detail_urls)} 个详情页的种子信息")
-            return self._parse_detail_results(detail_urls)
+            return detail_urls, []
 
         except Exception as e:
             logger.error(f"{self.spider_name}-解析搜索结果失败: {str(e)}")
-            return []
+            return set(), []
 
     def _parse_detail_results(self, detail_urls) -> list:
-        """ 处理详情页 """
-        results = []
-        _processed_titles = set()
-
-        # 将URL列表分成多个批次
-        def chunk_list(lst, chunk_size):
-            return [lst[i:i + chunk_size] for i in range(0, len(lst), chunk_size)]
+        """ 处理详情页，已缓存的详情页直接使用缓存的种子 """
+        results, detail_urls = self._split_cached_details(detail_urls)
+        if not detail_urls:
+            return results
 
-        def process_url_batch(url_batch, index):
-            try:
-                browser, context = create_browser(self.spider_proxy)
-                if self.spider_cookie:
-                    context.add_cookies(self.spider_cookie)
-                detail_page = create_stealth_page(context)
-
-                current_batch_results = []
-                try:
-                    for url_idx, detail_url in enumerate(url_batch):
-                        self._wait_inner()  # 每个URL处理前等待
-                        logger.info(
-                            f"{self.spider_name}-线程 {index} 正在处理第 {url_idx + 1}/{len(url_batch)} 个详情页: {detail_url}")
-
-                        torrents = self._get_torrent_info(detail_page, detail_url, None)
-                        if torrents:
-                            current_batch_results.extend(torrents)
-                            logger.info(
-                                f"{self.spider_name}-线程 {index} 成功获取第 {url_idx + 1}/{len(url_batch)} 个详情页的种子信息: {len(torrents)} 个")
-                finally:
-                    detail_page.close()
-                    context.close()
-                    browser.close()
-                return current_batch_results
-            except Exception as ex:
-                logger.error(f"{self.spider_name}-线程 {index} 处理批次失败: {str(ex)}")
-                return []
+        def process_url_batch(context: BrowserContext, url_batch, index):
+            detail_page = create_stealth_page(context)
+            current_batch_results = []
+            for url_idx, detail_url in enumerate(url_batch):
+                self._wait_inner()  # 每个URL处理前等待
+                logger.info(
+                    f"{self.spider_name}-线程 {index} 正在处理第 {url_idx + 1}/{len(url_batch)} 个详情页: {detail_url}")
+
+                torrents = self._get_torrent_info(detail_page, detail_url, None)
+                if torrents:
+                    self._set_detail_cache(detail_url, torrents)
+                    current_batch_results.extend(torrents)
+                    logger.info(
+                        f"{self.spider_name}-线程 {index} 成功获取第 {url_idx + 1}/{len(url_batch)} 个详情页的种子信息: {len(torrents)} 个")
+            return current_batch_results
 
         # 计算每个线程处理的URL数量
         batch_size = max(1, len(detail_urls) // self.spider_batch_size)  # 确保每个批次至少有一个URL
-        url_batches = chunk_list(list(detail_urls), batch_size)
+        url_batches = self.chunk_list(list(detail_urls), batch_size)
 
         logger.info(f"{self.spider_name}-将 {len(detail_urls)} 个详情页分成 {len(url_batches)} 个批次处理")
 
-        # 使用线程池并发处理批次
-        with ThreadPoolExecutor(max_workers=min(4, len(url_batches))) as executor:
-            future_to_batch = {
-                executor.submit(process_url_batch, batch, idx + 1): (idx, batch)
-                for idx, batch in enumerate(url_batches)
-            }
-
-            for future in as_completed(future_to_batch):
-                idx, batch = future_to_batch[future]
-                try:
-                    batch_results = future.result()
-                    with self._result_lock:
-                        results.extend(batch_results)
-                        logger.info(
-                            f"{self.spider_name}-第 {idx + 1}/{len(url_batches)} 个批次处理完成，获取到 {len(batch_results)} 个种子")
-                except Exception as e:
-                    logger.error(f"{self.spider_name}-第 {idx + 1}/{len(url_batches)} 个批次处理失败: {str(e)}")
+        # 提交到浏览器池并发处理批次
+        pool = PlaywrightPool()
+        future_to_batch = {
+            pool.submit(self._bind_search(process_url_batch), batch, idx + 1, proxy=self.spider_proxy,
+                        cookies=self.spider_cookie, resource_policy=self.resource_policy): (idx, batch)
+            for idx, batch in enumerate(url_batches)
+        }
+
+        for future in as_completed(future_to_batch):
+            idx, batch = future_to_batch[future]
+            try:
+                batch_results = future.result()
+                with self._result_lock:
+                    results.extend(batch_results)
+                    logger.info(
+                        f"{self.spider_name}-第 {idx + 1}/{len(url_batches)} 个批次处理完成，获取到 {len(batch_results)} 个种子")
+            except Exception as e:
+                logger.error(f"{self.spider_name}-第 {idx + 1}/{len(url_batches)} 个批次处理失败: {str(e)}")
 
         logger.info(f"{self.spider_name}-所有批次处理完成，共获取到 {len(results)} 个种子")
         return results
@@ -172,7 +162,7 @@ class BtdxSpider(_ExtendSpiderBase):
             logger.info(f"{self.spider_name}-访问详情页成功,开始获取种子信息...")
             # 获取页面内容
             content = page.content()
-            soup = BeautifulSoup(content, "html.parser")
+            soup = self.html_parser.parse(content, _DETAIL_SPEC)
             return self._parse_torrent(soup, detail_url)
         except Exception as e:
             logger.error(f"{self.spider_name}-获取种子信息失败: {str(e)}")
@@ -180,7 +170,7 @@ class BtdxSpider(_ExtendSpiderBase):
 
     def _parse_torrent(self, soup, detail_url: str) -> list:
         results = []
-        a_tags = soup.select("div a.download-link")
+        a_tags = soup.select("a.download-link")
         if not a_tags:
             return results
         _processed_titles = set()
@@ -33,12 +33,14 @@ class BtlSpider(_ExtendSpiderBase):
             return results
         if not self.browser:
             logger.warn(f"{self.spider_name}-未初始化浏览器")
+            self._report_failure("未初始化浏览器")
             return []
-        tab = self.browser.new_tab(url=self.spider_url)
+        tab = self.drission_browser.checkout_tab(resource_policy=self.resource_policy)
         try:
-            # self.browser.get(self.spider_url)
+            tab.get(self.spider_url)
             if not pass_slider_verification(tab):
                 logger.warn("cloudflare challenge fail！")
+                self._report_failure("cloudflare 验证失败")
                 return results
             # 访问搜索页
             logger.info(f"{self.spider_name}-访问主页成功,开始搜索【{keyword}】...")
@@ -78,9 +80,10 @@ class BtlSpider(_ExtendSpiderBase):
             return results
         except Exception as e:
             logger.error(f"{self.spider_name}-搜索失败: {str(e)} - {traceback.format_exc()}")
+            self._report_failure(str(e))
             return results
         finally:
-            tab.close()
+            self.drission_browser.checkin_tab(tab)
 
     @staticmethod
     def match_ids(data: dict, ids2: list) -> bool:
@@ -128,6 +131,10 @@ class BtlSpider(_ExtendSpiderBase):
                 detail_urls.add(detail_url)
                 break
         results = {}
+        if detail_urls:
+            # 已缓存的详情页不再访问
+            cached, detail_urls = self._split_cached_details(detail_urls)
+            results.update({torrent["title"]: torrent for torrent in cached})
         if detail_urls:
             logger.info(f"{self.spider_name}-解析到{len(detail_urls)}个搜索结果，开始获取链接地址...")
             # 计算每个线程处理的URL数量
@@ -138,7 +145,7 @@ class BtlSpider(_ExtendSpiderBase):
             # 使用线程池并发处理批次
             with ThreadPoolExecutor(max_workers=min(2, len(url_batches))) as tp:
                 future_to_batch = {
-                    tp.submit(self._get_torrent, batch): (idx, batch)
+                    tp.submit(self._bind_search(self._get_torrent), batch): (idx, batch)
                     for idx, batch in enumerate(url_batches)
                 }
                 for future in as_completed(future_to_batch):
@@ -162,14 +169,12 @@ class BtlSpider(_ExtendSpiderBase):
         detail_urls = {}
         try:
             for down_url in down_urls:
+                torrents = {}
                 try:
                     if not new_tab:
-                        new_tab = self.browser.new_tab(down_url)
-                        new_tab.listen.start(listen_url)
-                        new_tab.set.load_mode.none()  # 设置加载模式为none
-                    else:
-                        new_tab.listen.start(listen_url)
-                        new_tab.get(down_url)
+                        new_tab = self.drission_browser.checkout_tab(load_mode="none", resource_policy=self.resource_policy)  # 设置加载模式为none
+                    new_tab.listen.start(listen_url)
+                    new_tab.get(down_url)
                     new_tab.scroll.to_bottom()
                     packet = new_tab.listen.wait(1, timeout=60)
                     new_tab.listen.stop()
@@ -209,7 +214,9 @@ class BtlSpider(_ExtendSpiderBase):
                                 'pubdate': StringUtils.str_to_timestamp(value.get('ezt')),
                                 "size": StringUtils.num_filesize(value.get("zsize", ""))
                             }
-                            detail_urls[value.get("zname")] = t_obj
+                            torrents[value.get("zname")] = t_obj
+                    detail_urls.update(torrents)
+                    self._set_detail_cache(down_url, list(torrents.values()))
                 except Exception as e:
                     logger.error(
                         f"{self.spider_name}-详情页:【{down_url}】,获取种子失败: {str(e)} - {traceback.format_exc()}")
@@ -217,7 +224,7 @@ class BtlSpider(_ExtendSpiderBase):
             return detail_urls
         finally:
             if new_tab:
-                new_tab.close()
+                self.drission_browser.checkin_tab(new_tab)
 
 
 if __name__ == "__main__":
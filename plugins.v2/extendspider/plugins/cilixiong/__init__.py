@@ -30,30 +30,32 @@ class CiLiXiongSpider(_ExtendSpiderBase):
             return results
         if not self.browser:
             logger.warn(f"{self.spider_name}-未初始化浏览器")
+            self._report_failure("未初始化浏览器")
             return results
         if self.pass_cloud_flare:
             logger.info(f"{self.spider_name}-使用flaresolver代理...")
             self._from_pass_cloud_flare(self.spider_url)
-        tab = self.browser.new_tab()
+        tab = self.drission_browser.checkout_tab(load_mode="eager", resource_policy=self.resource_policy)  # 设置加载模式为eager
         try:
             self._wait(0.5, 1)
             # 访问主页并处理 Cloudflare
             logger.info(f"{self.spider_name}-正在访问 {self.spider_url}...")
             # 等待页面加载完成
-            tab.set.load_mode.eager()  # 设置加载模式为none
             tab.get(self.spider_url)
             logger.info(f"{self.spider_name}-访问主页成功,开始搜索【{keyword}】...")
             search_ele = tab.ele('x://form[@id="searchform"]//input[@name="keyboard"]', timeout=20)
             if not search_ele:
                 logger.error(f"{self.spider_name}-未找到搜索框")
+                self._report_failure("未找到搜索框")
                 return results
             search_ele.input(f"{keyword}\n")
             return self._parse_search_result(tab, ctx)
         except Exception as e:
             logger.error(f"{self.spider_name}-搜索失败: {str(e)} - {traceback.format_exc()}")
+            self._report_failure(str(e))
             return results
         finally:
-            tab.close()
+            self.drission_browser.checkin_tab(tab)
 
     def _parse_search_result(self, browser: ChromiumPage | ChromiumTab, ctx: SearchContext):
         if not browser.wait.ele_displayed("条符合搜索条件", timeout=20):
@@ -76,6 +78,10 @@ class CiLiXiongSpider(_ExtendSpiderBase):
                 logger.info(f"{self.spider_name}-已过滤，仅获取前 {self.spider_max_load_result} 个种子")
             else:
                 urls = list(detail_urls)
+            # 已缓存的详情页不再访问
+            results, urls = self._split_cached_details(urls)
+            if not urls:
+                return results
             # 计算每个线程处理的URL数量
             batch_size = max(1, len(urls) // self.spider_batch_size)  # 确保每个批次至少有一个URL
             url_batches = self.chunk_list(urls, batch_size)
@@ -84,7 +90,7 @@ class CiLiXiongSpider(_ExtendSpiderBase):
             # 使用线程池并发处理批次
             with ThreadPoolExecutor(max_workers=min(2, len(url_batches))) as tp:
                 future_to_batch = {
-                    tp.submit(self._get_torrent, batch): (idx, batch)
+                    tp.submit(self._bind_search(self._get_torrent), batch): (idx, batch)
                     for idx, batch in enumerate(url_batches)
                 }
                 for future in as_completed(future_to_batch):
@@ -103,11 +109,11 @@ class CiLiXiongSpider(_ExtendSpiderBase):
     # @retry(Exception, 2, 3, 2, logger=logger)
     def _get_torrent(self, down_urls: list) -> Optional[list]:
         # self._wait(0.5,1.5)
-        new_tab = self.browser.new_tab()
-        new_tab.set.load_mode.eager()  # 设置加载模式为none
+        new_tab = self.drission_browser.checkout_tab(load_mode="eager", resource_policy=self.resource_policy)  # 设置加载模式为eager
         results = []
         try:
             for down_url in down_urls:
+                start = len(results)
                 try:
                     new_tab.get(down_url, timeout=20)
                     link_tags = new_tab("css:div .mv_down").eles("tag:a")
@@ -128,12 +134,13 @@ class CiLiXiongSpider(_ExtendSpiderBase):
                                 "size": title_info.size_num
                             })
                             url_set.add(link)
+                    self._set_detail_cache(down_url, results[start:])
                 except Exception as e:
                     logger.error(
                         f"{self.spider_name}-详情页:【{down_url}】,获取种子失败: {str(e)} - {traceback.format_exc()}")
                     return []
         finally:
-            new_tab.close()
+            self.drission_browser.checkin_tab(new_tab)
         return results
 
 
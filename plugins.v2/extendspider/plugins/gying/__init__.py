@@ -38,14 +38,16 @@ class GyingKSpider(_ExtendSpiderBase):
             return results
         if not self.browser:
             logger.warn(f"{self.spider_name}-未初始化浏览器")
+            self._report_failure("未初始化浏览器")
             return []
         if self.pass_cloud_flare:
             logger.info(f"{self.spider_name}-使用flaresolver代理...")
             self._from_pass_cloud_flare(self.spider_url)
-        tab = self.browser.new_tab(self.spider_url)
-        if not self.spider_cookie and not self.to_login(tab):
-            return results
+        tab = self.drission_browser.checkout_tab(resource_policy=self.resource_policy)
         try:
+            tab.get(self.spider_url)
+            if not self.spider_cookie and not self.to_login(tab):
+                return results
             # 访问主页并处理 Cloudflare
             logger.info(f"{self.spider_name}-正在访问 {self.spider_url}...")
             # 等待页面加载完成
@@ -58,9 +60,10 @@ class GyingKSpider(_ExtendSpiderBase):
             return self._parse_search_result(tab, ctx)
         except Exception as e:
             logger.error(f"{self.spider_name}-搜索失败: {str(e)} - {traceback.format_exc()}")
+            self._report_failure(str(e))
             return results
         finally:
-            tab.close()
+            self.drission_browser.checkin_tab(tab)
 
     def to_login(self, browser: ChromiumPage | ChromiumTab):
         logger.info(f"{self.spider_name}-开始登录...")
@@ -114,6 +117,10 @@ class GyingKSpider(_ExtendSpiderBase):
                 logger.info(f"{self.spider_name}-已过滤，仅获取前 {self.spider_max_load_result} 个种子")
             else:
                 urls = list(detail_urls)
+            # 已缓存的详情页不再访问
+            results, urls = self._split_cached_details(urls)
+            if not urls:
+                return results
             # 计算每个线程处理的URL数量
             batch_size = max(1, len(urls) // self.spider_batch_size)  # 确保每个批次至少有一个URL
             url_batches = self.chunk_list(urls, batch_size)
@@ -122,7 +129,7 @@ class GyingKSpider(_ExtendSpiderBase):
             # 使用线程池并发处理批次
             with ThreadPoolExecutor(max_workers=min(2, len(url_batches))) as tp:
                 future_to_batch = {
-                    tp.submit(self._get_torrent, batch): (idx, batch)
+                    tp.submit(self._bind_search(self._get_torrent), batch): (idx, batch)
                     for idx, batch in enumerate(url_batches)
                 }
                 for future in as_completed(future_to_batch):
@@ -147,12 +154,11 @@ class GyingKSpider(_ExtendSpiderBase):
         try:
             for down_url in down_urls:
                 self._wait_inner(5, 15)
+                start = len(results)
                 try:
                     if not new_tab:
-                        new_tab = self.browser.new_tab(down_url)
-                        new_tab.set.load_mode.none()  # 设置加载模式为none
-                    else:
-                        new_tab.get(down_url)
+                        new_tab = self.drission_browser.checkout_tab(load_mode="none", resource_policy=self.resource_policy)  # 设置加载模式为none
+                    new_tab.get(down_url)
                     if not new_tab.wait.ele_displayed("css:.down-link", timeout=40):
                         new_tab.stop_loading()
                         continue
@@ -219,6 +225,7 @@ class GyingKSpider(_ExtendSpiderBase):
                                 to_down_urls.add(detail_link)
 
                     if not to_down_urls:
+                        self._set_detail_cache(down_url, results[start:])
                         return results
 
                     if 0 < self.spider_max_load_result < len(to_down_urls):
@@ -234,7 +241,7 @@ class GyingKSpider(_ExtendSpiderBase):
                     # 使用线程池并发处理批次
                     with ThreadPoolExecutor(max_workers=min(2, len(url_batches))) as tp:
                         future_to_batch = {
-                            tp.submit(self.get_enclosure_by_down, batch): (idx, batch)
+                            tp.submit(self._bind_search(self.get_enclosure_by_down), batch): (idx, batch)
                             for idx, batch in enumerate(url_batches)
                         }
                         for future in as_completed(future_to_batch):
@@ -248,13 +255,14 @@ class GyingKSpider(_ExtendSpiderBase):
                             except Exception as e:
                                 logger.error(
                                     f"{self.spider_name}-第 {idx + 1}/{len(url_batches)} 个批次处理失败: {str(e)}")
+                    self._set_detail_cache(down_url, results[start:])
                 except Exception as e:
                     logger.error(
                         f"{self.spider_name}-详情页:【{down_url}】,获取种子失败: {str(e)} - {traceback.format_exc()}")
             return results
         finally:
             if new_tab:
-                new_tab.close()
+                self.drission_browser.checkin_tab(new_tab)
 
     def get_enclosure_by_down(self, down_urls: list) -> list:
         new_tab = None
@@ -265,10 +273,8 @@ class GyingKSpider(_ExtendSpiderBase):
                 self._wait_inner(5, 15)
                 logger.info(f"{self.spider_name}-正在获取种子信息: {down_url}")
                 if not new_tab:
-                    new_tab = self.browser.new_tab(down_url)
-                    new_tab.set.load_mode.none()  # 设置加载模式为none
-                else:
-                    new_tab.get(down_url)
+                    new_tab = self.drission_browser.checkout_tab(load_mode="none", resource_policy=self.resource_policy)  # 设置加载模式为none
+                new_tab.get(down_url)
                 new_tab.wait.ele_displayed("css:.down321", timeout=20)
                 for li_tag in new_tab("css:ul.down321").eles("tag:li"):
                     # 提取标题：第一个 div
@@ -303,7 +309,7 @@ class GyingKSpider(_ExtendSpiderBase):
             return results
         finally:
             if new_tab:
-                new_tab.close()
+                self.drission_browser.checkin_tab(new_tab)
 
 
 if __name__ == "__main__":
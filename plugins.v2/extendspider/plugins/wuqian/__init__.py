@@ -31,16 +31,17 @@ class WuQianSpider(_ExtendSpiderBase):
             return results
         if not self.browser:
             logger.warn(f"{self.spider_name}-未初始化浏览器")
+            self._report_failure("未初始化浏览器")
             return results
-        tab = self.browser.new_tab(self.spider_url)
-        tab.set.load_mode.eager()  # 设置加载模式为none
-        if self.pass_cloud_flare:
-            # logger.info(f"{self.spider_name}-使用flaresolver代理...")
-            # self._from_pass_cloud_flare(self.spider_url)
-            if not self.drission_browser.getTurnstileToken(tab):
-                logger.warn(f"{self.spider_name}-未通过Cloudflare验证")
-                return results
+        tab = self.drission_browser.checkout_tab(load_mode="eager", resource_policy=self.resource_policy)  # 设置加载模式为eager
         try:
+            tab.get(self.spider_url)
+            if self.pass_cloud_flare:
+                # logger.info(f"{self.spider_name}-使用flaresolver代理...")
+                # self._from_pass_cloud_flare(self.spider_url)
+                if not self.drission_browser.solve_challenge(tab, refresh_url=self.spider_url):
+                    logger.warn(f"{self.spider_name}-未通过Cloudflare验证")
+                    return results
             self._wait(0.5, 0.6)
             # 访问主页并处理 Cloudflare
             logger.info(f"{self.spider_name}-正在访问 {self.spider_url}...")
@@ -49,6 +50,7 @@ class WuQianSpider(_ExtendSpiderBase):
             search_ele = tab.ele('x://form[@id="search-form"]//input[@name="keyword"]', timeout=5)
             if not search_ele:
                 logger.error(f"{self.spider_name}-未找到搜索框")
+                self._report_failure("未找到搜索框")
                 return results
             tab.actions.move_to(search_ele, duration=1)
             search_ele.click()
@@ -56,18 +58,19 @@ class WuQianSpider(_ExtendSpiderBase):
 
             search_ele.input(f"{keyword}\n")
             self._wait(3, 5)
-            if not self.drission_browser.getTurnstileToken(tab):
+            if not self.drission_browser.solve_challenge(tab, refresh_url=self.spider_url):
                 logger.warn(f"{self.spider_name}- 获取TurnstileToken失败")
                 return results
-            if not self.drission_browser.getTurnstileToken(tab):
+            if not self.drission_browser.solve_challenge(tab, refresh_url=self.spider_url):
                 logger.warn(f"{self.spider_name}-未通过Cloudflare验证")
                 return results
             return self._parse_search_result(tab, keyword, ctx)
         except Exception as e:
             logger.error(f"{self.spider_name}-搜索失败: {str(e)} - {traceback.format_exc()}")
+            self._report_failure(str(e))
             return results
         finally:
-            tab.close()
+            self.drission_browser.checkin_tab(tab)
 
     def _parse_search_result(self, browser: ChromiumPage | ChromiumTab, keyword: str, ctx: SearchContext):
         if not browser.wait.ele_displayed("找到约", timeout=20):
@@ -104,6 +107,10 @@ class WuQianSpider(_ExtendSpiderBase):
                 urls = [detail_urls[name] for name in detail_urls.keys()]
             if not urls:
                 return []
+            # 已缓存的详情页不再访问
+            results, urls = self._split_cached_details(urls)
+            if not urls:
+                return results
             logger.info(f"{self.spider_name}-解析到{len(urls)}个搜索结果，开始获取链接地址...")
             # 计算每个线程处理的URL数量
             batch_size = max(1, len(urls) // self.spider_batch_size)  # 确保每个批次至少有一个URL
@@ -113,7 +120,7 @@ class WuQianSpider(_ExtendSpiderBase):
             # 使用线程池并发处理批次
             with ThreadPoolExecutor(max_workers=min(6, len(url_batches))) as tp:
                 future_to_batch = {
-                    tp.submit(self._get_torrent, batch): (idx, batch)
+                    tp.submit(self._bind_search(self._get_torrent), batch): (idx, batch)
                     for idx, batch in enumerate(url_batches)
                 }
                 for future in as_completed(future_to_batch):
@@ -138,10 +145,8 @@ class WuQianSpider(_ExtendSpiderBase):
             for down_url in down_urls:
                 try:
                     if not new_tab:
-                        new_tab.set.load_mode.eager()  # 设置加载模式为none
-                        new_tab = self.browser.new_tab(down_url, timeout=20)
-                    else:
-                        new_tab.get(down_url, timeout=20)
+                        new_tab = self.drission_browser.checkout_tab(load_mode="eager", resource_policy=self.resource_policy)  # 设置加载模式为eager
+                    new_tab.get(down_url, timeout=20)
 
                     size_tag = new_tab.ele(
                         'x://div[@class="panel-body"]//ul[@class="list-unstyled"]/li[starts-with(., "文件大小：")]/text()')
@@ -166,6 +171,7 @@ class WuQianSpider(_ExtendSpiderBase):
                             "description": title,
                             "size": title_info.size_num
                         })
+                        self._set_detail_cache(down_url, results[-1:])
                         url_set.add(link)
                 except Exception as e:
                     logger.error(
@@ -173,7 +179,7 @@ class WuQianSpider(_ExtendSpiderBase):
                     return []
         finally:
             if new_tab:
-                new_tab.close()
+                self.drission_browser.checkin_tab(new_tab)
         return results
 
 
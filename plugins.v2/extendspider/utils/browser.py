@@ -1,11 +1,12 @@
 import os
 
 from DrissionPage import ChromiumPage, ChromiumOptions
-from playwright.sync_api import sync_playwright, Browser, BrowserContext, Page, ViewportSize
+from playwright.sync_api import sync_playwright, Playwright, Browser, BrowserContext, Page, ViewportSize
 from app.core.config import settings
 from playwright_stealth import stealth_sync
 from app.log import logger
 from utils.system import SystemUtils
+from app.plugins.extendspider.utils.clearance_store import ClearanceStore, egress_key
 
 
 def create_browser(proxy: bool = False, headless: bool = True, ua=None) -> tuple[Browser, BrowserContext]:
@@ -20,6 +21,21 @@ def create_browser(proxy: bool = False, headless: bool = True, ua=None) -> tuple
         tuple[Browser, BrowserContext]: 浏览器实例和上下文
     """
     playwright = sync_playwright().start()
+    browser = launch_chromium(playwright, headless=headless)
+    context = new_browser_context(browser, proxy=proxy, ua=ua)
+    return browser, context
+
+
+def launch_chromium(playwright: Playwright, headless: bool = True) -> Browser:
+    """
+    启动 Chromium 浏览器
+
+    Args:
+        playwright: playwright 运行时
+        headless: 无头模式
+    Returns:
+        Browser: 浏览器实例
+    """
     args = [
         '--disable-blink-features=AutomationControlled',
         '--disable-features=IsolateOrigins,site-per-process',
@@ -39,12 +55,24 @@ def create_browser(proxy: bool = False, headless: bool = True, ua=None) -> tuple
     ]
     if SystemUtils.is_docker():
         args.append('--headless=new')
-    browser = playwright.chromium.launch(
+    return playwright.chromium.launch(
         headless=headless,
         slow_mo=60,
         args=args,
     )
 
+
+def new_browser_context(browser: Browser, proxy: bool = False, ua=None) -> BrowserContext:
+    """
+    在已启动的浏览器上创建带反检测脚本的上下文
+
+    Args:
+        browser: 浏览器实例
+        proxy: 是否使用代理
+        ua: user-agent
+    Returns:
+        BrowserContext: 浏览器上下文
+    """
     context = browser.new_context(
         user_agent=ua or settings.USER_AGENT,
         proxy=settings.PROXY_SERVER if proxy else None,
@@ -65,8 +93,46 @@ def create_browser(proxy: bool = False, headless: bool = True, ua=None) -> tuple
         Object.defineProperty(navigator, 'plugins', { get: () => [1, 2, 3] });
         Object.defineProperty(navigator, 'hardwareConcurrency', { get: () => 8 });
     """)
+    load_context_clearance(context, proxy=proxy, ua=ua)
+    return context
 
-    return browser, context
+
+def load_context_clearance(context: BrowserContext, proxy: bool = False, ua=None):
+    """
+    将已保存的 Cloudflare clearance 写入上下文
+
+    Args:
+        context: 浏览器上下文
+        proxy: 是否使用代理
+        ua: user-agent
+    """
+    cookies = ClearanceStore().cookies_for(ua or settings.USER_AGENT, egress_key(proxy))
+    if cookies:
+        context.add_cookies(cookies)
+
+
+def save_context_clearance(context: BrowserContext, proxy: bool = False, ua=None):
+    """
+    保存上下文中通过验证得到的 Cloudflare clearance
+
+    Args:
+        context: 浏览器上下文
+        proxy: 是否使用代理
+        ua: user-agent
+    """
+    store = ClearanceStore()
+    ua = ua or settings.USER_AGENT
+    egress = egress_key(proxy)
+    cookies = context.cookies()
+    for cookie in cookies:
+        if cookie.get("name") != ClearanceStore.CLEARANCE_COOKIE:
+            continue
+        domain = cookie.get("domain", "")
+        # 没有变化时不重复写盘
+        if any(c["name"] == cookie["name"] and c["value"] == cookie["value"]
+               for c in store.get_cookies(domain, ua, egress)):
+            continue
+        store.put(domain, ua, egress, cookies)
 
 
 def create_stealth_page(context: BrowserContext) -> Page:
@@ -0,0 +1,288 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Optional, Dict, Tuple, Any, List
+
+from playwright.sync_api import sync_playwright, Browser, BrowserContext
+
+from app.log import logger
+from app.utils.singleton import SingletonClass
+from app.plugins.extendspider.utils.browser import launch_chromium, new_browser_context, load_context_clearance, \
+    save_context_clearance
+from app.plugins.extendspider.utils.resource_policy import ResourceBlockPolicy
+
+
+class _BrowserWorker(threading.Thread):
+    """
+    浏览器工作线程
+
+    Playwright 的同步 API 与创建它的线程绑定，因此每个工作线程独占一个 playwright 运行时和一个 Chromium，
+    上下文按 (代理, UA) 缓存在线程内复用，任务在取出时预先写入已保存的 clearance、cookies 和资源拦截规则，
+    归还时保存新得到的 clearance，然后关闭页面、清空 cookies 并撤销拦截。
+    """
+
+    def __init__(self, pool: "PlaywrightPool", index: int):
+        super().__init__(daemon=True, name=f"playwright-pool-{index}")
+        self.pool = pool
+        self.index = index
+        self._playwright = None
+        self._browser: Optional[Browser] = None
+        self._contexts: Dict[Tuple[bool, str], BrowserContext] = {}
+        # 当前浏览器已打开的页面数
+        self._pages = 0
+        # 当前任务的资源拦截处理函数
+        self._route_handler: Optional[Callable] = None
+        # 当前任务使用的上下文 (代理, UA)
+        self._context_key: Optional[Tuple[bool, str]] = None
+        self._last_used = time.time()
+        self._running = True
+
+    def stop(self):
+        self._running = False
+
+    def run(self):
+        try:
+            while self._running:
+                try:
+                    task = self.pool.tasks.get(timeout=self.pool.idle_check_interval)
+                except queue.Empty:
+                    self._evict_if_idle()
+                    continue
+
+                if task is None:  # 哨兵
+                    self.pool.tasks.task_done()
+                    break
+                try:
+                    self._run_task(*task)
+                finally:
+                    self.pool.tasks.task_done()
+        finally:
+            self._close_browser()
+            self.pool.worker_exited(self)
+
+    def _run_task(self, func: Callable, args: tuple, kwargs: dict, options: dict, future: Future):
+        if not future.set_running_or_notify_cancel():
+            return
+        self.pool.mark_busy(1)
+        try:
+            context = self._checkout_context(**options)
+            try:
+                future.set_result(func(context, *args, **kwargs))
+            finally:
+                self._checkin_context(context)
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            self._last_used = time.time()
+            self.pool.mark_busy(-1)
+
+    def _ensure_browser(self):
+        # 浏览器断开或打开页面数达到上限时回收重建
+        if self._browser and (not self._browser.is_connected() or self._pages >= self.pool.max_pages_per_browser):
+            logger.info(f"{self.name}-浏览器已打开 {self._pages} 个页面，回收重建")
+            self._close_browser()
+            self.pool.incr_stat("recycled")
+        if self._browser:
+            return
+        if not self._playwright:
+            self._playwright = sync_playwright().start()
+        start = time.time()
+        self._browser = launch_chromium(self._playwright, headless=self.pool.headless)
+        self._pages = 0
+        self.pool.incr_stat("launched")
+        logger.info(f"{self.name}-启动 Chromium 耗时 {time.time() - start:.2f}s")
+
+    def _checkout_context(self, proxy: bool = False, ua: str = None, cookies: List[dict] = None,
+                          resource_policy: ResourceBlockPolicy = None) -> BrowserContext:
+        self._ensure_browser()
+        key = (bool(proxy), ua or "")
+        context = self._contexts.get(key)
+        if context:
+            self.pool.incr_stat("context_hits")
+            # 归还时 cookies 已清空，重新写入已保存的 clearance
+            load_context_clearance(context, proxy=proxy, ua=ua)
+        else:
+            context = new_browser_context(self._browser, proxy=proxy, ua=ua)
+            context.on("page", self._on_page)
+            self._contexts[key] = context
+            self.pool.incr_stat("context_created")
+        self._context_key = key
+        if cookies:
+            context.add_cookies(cookies)
+        if resource_policy:
+            self._route_handler = resource_policy.playwright_handler()
+            context.route("**/*", self._route_handler)
+        return context
+
+    def _checkin_context(self, context: BrowserContext):
+        try:
+            if self._route_handler:
+                handler, self._route_handler = self._route_handler, None
+                context.unroute("**/*", handler)
+            if self._context_key:
+                proxy, ua = self._context_key
+                self._context_key = None
+                try:
+                    save_context_clearance(context, proxy=proxy, ua=ua or None)
+                except Exception as e:
+                    logger.debug(f"{self.name}-保存 clearance 失败: {str(e)}")
+            for page in context.pages:
+                page.close()
+            context.clear_cookies()
+        except Exception as e:
+            logger.warning(f"{self.name}-归还浏览器上下文失败，丢弃该上下文: {str(e)}")
+            for key, value in list(self._contexts.items()):
+                if value is context:
+                    self._contexts.pop(key, None)
+            try:
+                context.close()
+            except Exception:
+                pass
+
+    def _on_page(self, _):
+        self._pages += 1
+
+    def _evict_if_idle(self):
+        if self._browser and time.time() - self._last_used > self.pool.idle_timeout:
+            logger.info(f"{self.name}-浏览器空闲超过 {self.pool.idle_timeout}s，释放资源")
+            self._close_browser()
+            self.pool.incr_stat("evicted")
+
+    def _close_browser(self):
+        for context in self._contexts.values():
+            try:
+                context.close()
+            except Exception:
+                pass
+        self._contexts = {}
+        self._route_handler = None
+        if self._browser:
+            try:
+                self._browser.close()
+            except Exception:
+                pass
+            self._browser = None
+        if self._playwright:
+            try:
+                self._playwright.stop()
+            except Exception:
+                pass
+            self._playwright = None
+        self._pages = 0
+
+
+class PlaywrightPool(metaclass=SingletonClass):
+    """
+    Playwright 浏览器池，由 ExtendSpider 插件持有，所有使用 Playwright 的爬虫共享
+
+    用法：
+        pool = PlaywrightPool()
+        result = pool.run(lambda context: ..., proxy=False, cookies=cookies, resource_policy=policy)
+        future = pool.submit(func, *args, proxy=False, cookies=cookies, resource_policy=policy)
+
+    func 的第一个参数为已写入 cookies 的 BrowserContext，func 在池内工作线程中执行，
+    不要在 func 中再次调用 run/submit，以免工作线程互相等待。
+    """
+
+    def __init__(self, max_browsers: int = 3, max_pages_per_browser: int = 50, idle_timeout: float = 300,
+                 headless: bool = True):
+        """
+        :param max_browsers: 最多同时运行的浏览器数（即工作线程数）
+        :param max_pages_per_browser: 单个浏览器打开多少个页面后回收重建
+        :param idle_timeout: 浏览器空闲多少秒后关闭
+        :param headless: 无头模式
+        """
+        self.max_browsers = max_browsers
+        self.max_pages_per_browser = max_pages_per_browser
+        self.idle_timeout = idle_timeout
+        self.idle_check_interval = min(30.0, idle_timeout)
+        self.headless = headless
+        self.tasks: "queue.Queue[tuple|None]" = queue.Queue()
+        self._workers: List[_BrowserWorker] = []
+        self._busy = 0
+        self._index = 0
+        self._lock = threading.Lock()
+        self._stats: Dict[str, int] = {}
+
+    def submit(self, func: Callable, *args, proxy: bool = False, ua: str = None, cookies: List[dict] = None,
+               resource_policy: ResourceBlockPolicy = None, **kwargs) -> Future:
+        """
+        提交任务到浏览器池
+        :param func: 任务函数，签名为 func(context, *args, **kwargs)
+        :param proxy: 是否使用代理
+        :param ua: user-agent
+        :param cookies: 预先写入上下文的 cookies
+        :param resource_policy: 资源拦截策略
+        :return: Future
+        """
+        if isinstance(threading.current_thread(), _BrowserWorker):
+            raise RuntimeError("不能在浏览器池工作线程内提交任务")
+        future = Future()
+        options = {"proxy": proxy, "ua": ua, "cookies": cookies, "resource_policy": resource_policy}
+        with self._lock:
+            self.tasks.put((func, args, kwargs, options, future))
+            self._stats["tasks"] = self._stats.get("tasks", 0) + 1
+            # 没有空闲的工作线程时按需扩容
+            idle = len(self._workers) - self._busy
+            if self.tasks.qsize() > idle and len(self._workers) < self.max_browsers:
+                self._index += 1
+                worker = _BrowserWorker(self, self._index)
+                self._workers.append(worker)
+                worker.start()
+        return future
+
+    def run(self, func: Callable, *args, timeout: Optional[float] = None, proxy: bool = False, ua: str = None,
+            cookies: List[dict] = None, resource_policy: ResourceBlockPolicy = None, **kwargs) -> Any:
+        """
+        提交任务并等待结果
+        """
+        return self.submit(func, *args, proxy=proxy, ua=ua, cookies=cookies, resource_policy=resource_policy,
+                           **kwargs).result(timeout=timeout)
+
+    def mark_busy(self, delta: int):
+        with self._lock:
+            self._busy += delta
+
+    def incr_stat(self, name: str):
+        with self._lock:
+            self._stats[name] = self._stats.get(name, 0) + 1
+
+    def worker_exited(self, worker: _BrowserWorker):
+        with self._lock:
+            if worker in self._workers:
+                self._workers.remove(worker)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        浏览器池统计信息
+        """
+        with self._lock:
+            return {
+                "workers": len(self._workers),
+                "busy": self._busy,
+                "pending": self.tasks.qsize(),
+                **self._stats
+            }
+
+    def shutdown(self):
+        """
+        关闭所有浏览器，之后再提交任务会重新启动
+        """
+        with self._lock:
+            workers = list(self._workers)
+            for worker in workers:
+                worker.stop()
+                self.tasks.put(None)
+        for worker in workers:
+            worker.join(timeout=10)
+        logger.info(f"Playwright 浏览器池已关闭，统计：{self.stats()}")
+        # 丢弃未被处理的任务
+        while True:
+            try:
+                task = self.tasks.get_nowait()
+            except queue.Empty:
+                break
+            if task:
+                task[-1].cancel()
+            self.tasks.task_done()
@@ -0,0 +1,213 @@
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Optional, Dict, Any
+
+from app.log import logger
+from app.utils.singleton import SingletonClass
+from app.plugins.extendspider.utils.clearance_store import normalize_domain
+
+
+class RefreshSkipped(Exception):
+    """
+    刷新函数暂时无法执行（如没有空闲的浏览器标签页），跳过本轮，下一轮检查时再刷新
+    """
+
+
+class _Refresher:
+    """
+    域名的后台刷新任务
+    """
+
+    def __init__(self, refresh: Callable[[], Any], expires_at: Callable[[], Optional[float]]):
+        self.refresh = refresh
+        self.expires_at = expires_at
+        self.last_used = time.time()
+
+
+class ChallengeBroker(metaclass=SingletonClass):
+    """
+    Cloudflare 验证协调器
+
+    同一域名同一时间只允许一个调用方执行验证，其它调用方等待验证结束后先复查自己的页面，
+    clearance 已生效则直接返回，否则再各自验证。
+    注册了刷新任务的域名会在 clearance 过期前由后台线程提前刷新。
+    """
+
+    def __init__(self, refresh_before: float = 120, check_interval: float = 30, idle_timeout: float = 3600,
+                 wait_timeout: float = 60):
+        """
+        :param refresh_before: clearance 过期前多少秒开始刷新
+        :param check_interval: 后台检查间隔（秒）
+        :param idle_timeout: 域名多久没有使用后停止刷新（秒）
+        :param wait_timeout: 等待其它调用方验证的最长时间（秒）
+        """
+        self.refresh_before = refresh_before
+        self.check_interval = check_interval
+        self.idle_timeout = idle_timeout
+        self.wait_timeout = wait_timeout
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, Future] = {}
+        self._refreshers: Dict[str, _Refresher] = {}
+        self._stats: Dict[str, Dict[str, Any]] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+
+    def _stat(self, domain: str) -> Dict[str, Any]:
+        return self._stats.setdefault(domain, {
+            "solves": 0, "failures": 0, "waits": 0, "shared": 0, "refreshes": 0, "refresh_skipped": 0,
+            "total_time": 0.0, "max_time": 0.0, "last_error": None,
+        })
+
+    def solve(self, domain: str, solver: Callable[[], Any], recheck: Optional[Callable[[], Any]] = None) -> Any:
+        """
+        执行验证
+        :param domain: 域名或地址
+        :param solver: 验证函数，返回值为真表示验证通过
+        :param recheck: 等待其它调用方验证结束后的复查函数，返回值为真时不再验证；
+                        不提供时直接共用其它调用方的验证结果
+        :return: solver/recheck 的返回值
+        """
+        domain = normalize_domain(domain)
+        while True:
+            with self._lock:
+                refresher = self._refreshers.get(domain)
+                if refresher:
+                    refresher.last_used = time.time()
+                future = self._inflight.get(domain)
+                if not future:
+                    future = Future()
+                    self._inflight[domain] = future
+                    break
+                self._stat(domain)["waits"] += 1
+            if not recheck:
+                result = future.result(timeout=self.wait_timeout)
+                with self._lock:
+                    self._stat(domain)["shared"] += 1
+                return result
+            try:
+                future.result(timeout=self.wait_timeout)
+            except Exception:
+                pass
+            result = recheck()
+            if result:
+                with self._lock:
+                    self._stat(domain)["shared"] += 1
+                return result
+            # 复查未通过，重新竞争执行验证
+        return self._run(domain, future, solver)
+
+    def _run(self, domain: str, future: Future, solver: Callable[[], Any]) -> Any:
+        start = time.time()
+        try:
+            result = solver()
+            future.set_result(result)
+            self._record(domain, time.time() - start, None if result else "验证未通过")
+            return result
+        except RefreshSkipped as e:
+            # 没有执行验证，等待方复查后自行验证
+            future.set_result(None)
+            with self._lock:
+                self._stat(domain)["refresh_skipped"] += 1
+            logger.info(f"{domain} 跳过本轮后台刷新: {str(e)}")
+            return None
+        except Exception as e:
+            future.set_exception(e)
+            self._record(domain, time.time() - start, str(e))
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(domain, None)
+
+    def _record(self, domain: str, elapsed: float, error: Optional[str]):
+        with self._lock:
+            stat = self._stat(domain)
+            stat["solves"] += 1
+            stat["total_time"] += elapsed
+            stat["max_time"] = max(stat["max_time"], elapsed)
+            if error:
+                stat["failures"] += 1
+                stat["last_error"] = error
+        if error:
+            logger.warning(f"{domain} 验证失败，耗时 {elapsed:.2f}s: {error}")
+        else:
+            logger.info(f"{domain} 验证完成，耗时 {elapsed:.2f}s")
+
+    def register_refresh(self, domain: str, refresh: Callable[[], Any], expires_at: Callable[[], Optional[float]]):
+        """
+        注册后台刷新任务，clearance 临近过期时调用 refresh
+        :param domain: 域名或地址
+        :param refresh: 刷新函数，返回值为真表示刷新成功；刷新在单个后台线程中依次执行，
+                        不能长时间等待资源，暂时无法执行时抛出 RefreshSkipped
+        :param expires_at: 返回当前 clearance 过期时间的函数，没有记录时返回 None
+        """
+        domain = normalize_domain(domain)
+        with self._lock:
+            refresher = self._refreshers.get(domain)
+            if refresher:
+                refresher.refresh, refresher.expires_at = refresh, expires_at
+                refresher.last_used = time.time()
+            else:
+                self._refreshers[domain] = _Refresher(refresh, expires_at)
+            if not self._thread or not self._thread.is_alive():
+                self._stop_event.clear()
+                self._thread = threading.Thread(target=self._refresh_loop, daemon=True, name="challenge-broker")
+                self._thread.start()
+
+    def _refresh_loop(self):
+        while not self._stop_event.wait(self.check_interval):
+            now = time.time()
+            with self._lock:
+                # 长时间未使用的域名不再刷新
+                for domain in [d for d, r in self._refreshers.items() if now - r.last_used > self.idle_timeout]:
+                    self._refreshers.pop(domain, None)
+                refreshers = list(self._refreshers.items())
+            for domain, refresher in refreshers:
+                if self._stop_event.is_set():
+                    break
+                try:
+                    expires = refresher.expires_at()
+                except Exception:
+                    continue
+                if not expires or expires - now > self.refresh_before:
+                    continue
+                with self._lock:
+                    if domain in self._inflight:
+                        continue
+                    future = Future()
+                    self._inflight[domain] = future
+                    self._stat(domain)["refreshes"] += 1
+                logger.info(f"{domain} clearance 将在 {int(expires - now)}s 后过期，后台刷新")
+                try:
+                    self._run(domain, future, refresher.refresh)
+                except Exception as e:
+                    logger.warning(f"{domain} 后台刷新失败: {str(e)}")
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        各域名的验证统计
+        """
+        with self._lock:
+            return {
+                domain: {
+                    **stat,
+                    "avg_time": round(stat["total_time"] / stat["solves"], 3) if stat["solves"] else 0,
+                    "total_time": round(stat["total_time"], 3),
+                    "max_time": round(stat["max_time"], 3),
+                    "inflight": domain in self._inflight,
+                    "refresh": domain in self._refreshers,
+                }
+                for domain, stat in self._stats.items()
+            }
+
+    def shutdown(self):
+        """
+        停止后台刷新
+        """
+        self._stop_event.set()
+        with self._lock:
+            self._refreshers = {}
+            thread, self._thread = self._thread, None
+        if thread:
+            thread.join(timeout=5)
+        logger.info(f"验证协调器已停止，统计：{self.stats()}")
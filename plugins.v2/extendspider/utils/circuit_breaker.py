@@ -0,0 +1,98 @@
+import threading
+import time
+from typing import Dict, Any
+
+
+class CircuitBreaker:
+    """
+    爬虫熔断器
+
+    连续 failure_threshold 次搜索失败后熔断，recovery_time 秒内的搜索直接返回空结果；
+    到期后进入半开状态，只放行一次探测搜索，成功则恢复，失败则重新熔断。
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    STATE_NAMES = {CLOSED: "正常", OPEN: "熔断", HALF_OPEN: "探测中"}
+
+    def __init__(self, failure_threshold: int = 3, recovery_time: float = 600):
+        """
+        :param failure_threshold: 熔断前允许的连续失败次数
+        :param recovery_time: 熔断持续时间（秒）
+        """
+        self.failure_threshold = max(int(failure_threshold), 1)
+        self.recovery_time = recovery_time
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._last_error = ""
+        self._last_failure_time = 0.0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def allow(self) -> bool:
+        """
+        是否允许本次搜索
+        """
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN:
+                if time.time() - self._opened_at < self.recovery_time:
+                    return False
+                self._state = self.HALF_OPEN
+                self._probing = False
+            if self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self, error: str = ""):
+        """
+        :return: 本次失败后是否处于熔断状态
+        """
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            self._last_error = error
+            self._last_failure_time = time.time()
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = self.OPEN
+                self._opened_at = time.time()
+            return self._state == self.OPEN
+
+    def retry_after(self) -> float:
+        """
+        距离允许探测还有多少秒，未熔断时为 0
+        """
+        with self._lock:
+            if self._state != self.OPEN:
+                return 0
+            return max(0.0, self.recovery_time - (time.time() - self._opened_at))
+
+    def info(self) -> Dict[str, Any]:
+        """
+        熔断状态，用于页面展示
+        """
+        retry_after = self.retry_after()
+        with self._lock:
+            return {
+                "state": self._state,
+                "state_name": self.STATE_NAMES[self._state],
+                "failures": self._failures,
+                "last_error": self._last_error,
+                "last_failure_time": self._last_failure_time,
+                "retry_after": round(retry_after),
+            }
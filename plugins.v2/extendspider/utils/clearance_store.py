@@ -0,0 +1,219 @@
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Dict, List, Any
+from urllib.parse import urlparse
+
+from app.core.config import settings
+from app.log import logger
+from app.utils.singleton import SingletonClass
+
+
+def egress_key(proxy: bool) -> str:
+    """
+    出口标识，cf_clearance 与出口 IP 绑定，使用代理和直连的 clearance 不能混用
+    """
+    return settings.PROXY_HOST if proxy and settings.PROXY_HOST else "direct"
+
+
+def normalize_domain(url_or_domain: str) -> str:
+    """
+    统一域名格式：去掉协议、端口、前导点和 www.
+    """
+    if not url_or_domain:
+        return ""
+    host = urlparse(url_or_domain).hostname if "://" in url_or_domain else url_or_domain
+    host = (host or "").lower().lstrip(".").split(":")[0]
+    return host[4:] if host.startswith("www.") else host
+
+
+class ClearanceStore(metaclass=SingletonClass):
+    """
+    Cloudflare clearance cookies 存储
+
+    按 (域名, UA, 出口) 保存 FlareSolverr、DrissionPage、Playwright 通过验证后得到的 cookies，
+    持久化到插件数据目录，重启后仍可直接使用，过期的记录在读取时丢弃。
+    cookies 统一使用 Playwright 格式：name/value/domain/path/expires/httpOnly/secure。
+    """
+
+    # 标志通过验证的 cookie
+    CLEARANCE_COOKIE = "cf_clearance"
+    # cookie 未带过期时间时的默认有效期（秒）
+    DEFAULT_TTL = 30 * 60
+
+    def __init__(self, path: Optional[Path] = None):
+        self._path = Path(path) if path else settings.PLUGIN_DATA_PATH / "extendspider" / "clearance.json"
+        self._lock = threading.RLock()
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        # 每次写入递增，浏览器据此判断是否需要重新同步 cookies
+        self.version = 0
+        self._load()
+
+    @staticmethod
+    def _key(domain: str, ua: str, egress: str) -> str:
+        return f"{normalize_domain(domain)}|{ua or ''}|{egress or 'direct'}"
+
+    @staticmethod
+    def normalize_cookie(cookie: dict) -> dict:
+        """
+        转换为 Playwright 格式的 cookie，兼容 FlareSolverr 的 expiry 字段
+        """
+        expires = cookie.get("expires", cookie.get("expiry"))
+        return {
+            "name": cookie.get("name", ""),
+            "value": cookie.get("value", ""),
+            "domain": cookie.get("domain", ""),
+            "path": cookie.get("path") or "/",
+            "expires": float(expires) if expires not in (None, "") else -1,
+            "httpOnly": bool(cookie.get("httpOnly", False)),
+            "secure": bool(cookie.get("secure", False)),
+        }
+
+    def _load(self):
+        if not self._path.exists():
+            return
+        try:
+            with open(self._path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+            now = time.time()
+            self._entries = {k: v for k, v in entries.items() if v.get("expires", 0) > now}
+            logger.info(f"加载 clearance 记录 {len(self._entries)} 条")
+        except Exception as e:
+            logger.warning(f"加载 clearance 记录失败: {str(e)}")
+            self._entries = {}
+
+    def _save(self):
+        try:
+            self._path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self._path.with_suffix(".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._entries, f, ensure_ascii=False)
+            os.replace(tmp_path, self._path)
+        except Exception as e:
+            logger.warning(f"保存 clearance 记录失败: {str(e)}")
+
+    @staticmethod
+    def _match_domain(domain: str, cookie_domain: Optional[str]) -> bool:
+        """
+        cookie 是否作用于该域名
+        """
+        cookie_domain = normalize_domain(cookie_domain)
+        return not cookie_domain or domain == cookie_domain or domain.endswith(f".{cookie_domain}")
+
+    def _valid(self, entry: Optional[dict]) -> bool:
+        return bool(entry) and entry.get("expires", 0) > time.time()
+
+    def put(self, domain: str, ua: str, egress: str, cookies: List[dict], ttl: Optional[float] = None) -> bool:
+        """
+        保存通过验证后的 cookies，cookies 中没有 cf_clearance 时不保存
+        :param domain: 域名或地址
+        :param ua: 通过验证时使用的 user-agent
+        :param egress: 出口标识，见 egress_key
+        :param cookies: cookies
+        :param ttl: 有效期（秒），默认取 cf_clearance 的过期时间
+        :return: 是否保存
+        """
+        domain = normalize_domain(domain)
+        cookies = [self.normalize_cookie(c) for c in cookies or [] if self._match_domain(domain, c.get("domain"))]
+        for cookie in cookies:
+            cookie["domain"] = cookie["domain"] or f".{domain}"
+        clearance = next((c for c in cookies if c["name"] == self.CLEARANCE_COOKIE), None)
+        if not domain or not clearance:
+            return False
+        now = time.time()
+        if ttl:
+            expires = now + ttl
+        elif clearance["expires"] > now:
+            expires = clearance["expires"]
+        else:
+            expires = now + self.DEFAULT_TTL
+        with self._lock:
+            self._entries[self._key(domain, ua, egress)] = {
+                "domain": domain,
+                "ua": ua or "",
+                "egress": egress or "direct",
+                "cookies": cookies,
+                "created": now,
+                "expires": expires,
+            }
+            self.version += 1
+            self._save()
+        logger.info(f"保存 {domain} 的 clearance，{int(expires - now)}s 后过期")
+        return True
+
+    def put_cookiejar(self, domain: str, ua: str, egress: str, cookiejar) -> bool:
+        """
+        保存 requests/http.cookiejar 格式的 cookies
+        """
+        cookies = [{
+            "name": c.name,
+            "value": c.value,
+            "domain": c.domain or domain,
+            "path": c.path,
+            "expires": c.expires,
+            "secure": c.secure,
+        } for c in cookiejar or []]
+        return self.put(domain, ua, egress, cookies)
+
+    def get(self, domain: str, ua: str, egress: str) -> Optional[Dict[str, Any]]:
+        """
+        获取指定 UA 和出口的有效记录
+        """
+        key = self._key(domain, ua, egress)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and not self._valid(entry):
+                self._entries.pop(key, None)
+                entry = None
+            return entry
+
+    def find(self, domain: str, egress: str) -> Optional[Dict[str, Any]]:
+        """
+        获取域名在该出口下最新的有效记录，不限 UA，调用方需要改用记录中的 UA
+        """
+        domain = normalize_domain(domain)
+        with self._lock:
+            entries = [e for e in self._entries.values()
+                       if e["domain"] == domain and e["egress"] == (egress or "direct") and self._valid(e)]
+        return max(entries, key=lambda e: e["created"]) if entries else None
+
+    def get_cookies(self, domain: str, ua: str, egress: str) -> List[dict]:
+        """
+        获取指定 UA 和出口的有效 cookies
+        """
+        entry = self.get(domain, ua, egress)
+        return list(entry["cookies"]) if entry else []
+
+    def cookies_for(self, ua: str, egress: str) -> List[dict]:
+        """
+        获取该 UA 和出口下所有域名的有效 cookies，用于预先写入浏览器
+        """
+        with self._lock:
+            return [c for e in self._entries.values()
+                    if e["ua"] == (ua or "") and e["egress"] == (egress or "direct") and self._valid(e)
+                    for c in e["cookies"]]
+
+    def expires_at(self, domain: str, ua: str, egress: str) -> Optional[float]:
+        """
+        记录的过期时间
+        """
+        entry = self.get(domain, ua, egress)
+        return entry["expires"] if entry else None
+
+    def invalidate(self, domain: str, ua: Optional[str] = None, egress: Optional[str] = None):
+        """
+        验证失效时删除记录，不指定 UA/出口时删除该域名下所有记录
+        """
+        domain = normalize_domain(domain)
+        with self._lock:
+            keys = [k for k, e in self._entries.items()
+                    if e["domain"] == domain
+                    and (ua is None or e["ua"] == ua)
+                    and (egress is None or e["egress"] == egress)]
+            for key in keys:
+                self._entries.pop(key, None)
+            if keys:
+                self.version += 1
+                self._save()
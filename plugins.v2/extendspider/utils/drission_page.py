@@ -5,20 +5,88 @@ from DrissionPage._pages.mix_tab import MixTab
 from app.utils.singleton import SingletonClass
 from app.log import logger
 from DrissionPage import ChromiumOptions
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional
+import threading
 import time
 import os
 
 from app.plugins.extendspider.utils.browser import find_chromium_path
 from app.plugins.extendspider.utils.pass_verify import is_cloud_flare_verification_page
+from app.plugins.extendspider.utils.resource_policy import ResourceBlockPolicy
+from app.plugins.extendspider.utils.clearance_store import ClearanceStore, egress_key
+from app.plugins.extendspider.utils.challenge_broker import ChallengeBroker, RefreshSkipped
 from app.utils.system import SystemUtils
 
+# 页面内判断是否为 Cloudflare 验证页，规则与 is_cloud_flare_verification_page 一致
+_CHALLENGE_PROBE_JS = """
+const title = (document.title || '').trim().toLowerCase();
+if (title.includes('just a moment') || title.includes('checking your browser') || title.includes('请稍候')) {
+    return true;
+}
+return !!document.querySelector('iframe[src*="challenges.cloudflare.com"], [data-testid="challenge-widget-container"]');
+"""
+
+# 等待 Turnstile token：token 出现时立即 resolve，超时 resolve(null)
+# turnstile 通过 postMessage 通知父页面，收到消息和 DOM 变化时立即检查；
+# 脚本直接给 input.value 赋值不会触发 MutationObserver，因此保留 1s 一次的兜底检查
+_TURNSTILE_WAITER_JS = """
+const timeoutMs = arguments[0];
+return new Promise((resolve) => {
+    let done = false, timer = null, deadline = null, observer = null;
+    const read = () => {
+        try {
+            const token = window.turnstile && window.turnstile.getResponse();
+            if (token) return token;
+        } catch (e) {}
+        const input = document.querySelector('[name="cf-turnstile-response"]');
+        return input && input.value ? input.value : null;
+    };
+    const finish = (value) => {
+        if (done) return;
+        done = true;
+        clearInterval(timer);
+        clearTimeout(deadline);
+        if (observer) observer.disconnect();
+        window.removeEventListener('message', onMessage, true);
+        resolve(value);
+    };
+    const check = () => {
+        const token = read();
+        if (token) finish(token);
+    };
+    const onMessage = () => setTimeout(check, 0);
+    window.addEventListener('message', onMessage, true);
+    observer = new MutationObserver(check);
+    observer.observe(document.documentElement, {subtree: true, childList: true, attributes: true});
+    timer = setInterval(check, 1000);
+    deadline = setTimeout(() => finish(null), timeoutMs);
+    check();
+});
+"""
+# DrissionPage 默认的同名下载文件处理方式
+_DEFAULT_FILE_EXISTS_MODE = "rename"
+# 每轮等待时长（秒），未通过时重新点击复选框
+_TURNSTILE_CLICK_INTERVAL = 2
+
 
 class DrissonBrowser(metaclass=SingletonClass):
 
-    def __init__(self, proxy: bool = False, headless: bool = True):
+    def __init__(self, proxy: bool = False, headless: bool = True, max_tabs: int = 8):
         self._headless = headless
         self._proxy = proxy
         self._browser = self.create_drission_chromium()
+        # 标签页池，借出的标签页用完后重置并放回，避免每次搜索都新建/关闭标签页
+        self._max_tabs = max_tabs
+        self._idle_tabs: List[ChromiumTab | MixTab] = []
+        self._tab_count = 0
+        self._tab_cond = threading.Condition()
+        # 开启了资源拦截的标签页
+        self._intercepted_tabs = set()
+        self._tab_stats: Dict[str, Any] = {"hits": 0, "created": 0, "waits": 0, "wait_time": 0.0, "discarded": 0}
+        # 已同步到浏览器的 clearance 版本
+        self._clearance_version = -1
+        self._user_agent = None
 
     def create_drission_chromium(self):
 
@@ -60,33 +128,278 @@ class DrissonBrowser(metaclass=SingletonClass):
     @browser.setter
     def browser(self, value):
         self._browser = value
+        # 更换浏览器后旧的空闲标签页不再可用
+        with self._tab_cond:
+            self._tab_count -= len(self._idle_tabs)
+            self._idle_tabs = []
+            self._tab_cond.notify_all()
+
+    @contextmanager
+    def tab(self, url: Optional[str] = None, load_mode: str = "normal", timeout: float = 120,
+            resource_policy: ResourceBlockPolicy = None):
+        """
+        从标签页池借出标签页，退出时自动归还
+        :param url: 借出后打开的地址
+        :param load_mode: 加载模式 normal/eager/none
+        :param timeout: 池满时最长等待时间（秒）
+        :param resource_policy: 资源拦截策略
+        """
+        tab = self.checkout_tab(load_mode=load_mode, timeout=timeout, resource_policy=resource_policy)
+        try:
+            if url:
+                tab.get(url)
+            yield tab
+        finally:
+            self.checkin_tab(tab)
+
+    def checkout_tab(self, load_mode: str = "normal", timeout: float = 120,
+                     resource_policy: ResourceBlockPolicy = None) -> ChromiumTab | MixTab:
+        """
+        借出标签页，优先复用空闲标签页，池满时等待其它标签页归还
+        """
+        start = time.time()
+        waited = False
+        with self._tab_cond:
+            while True:
+                while self._idle_tabs:
+                    tab = self._idle_tabs.pop()
+                    if self._is_tab_alive(tab):
+                        self._tab_stats["hits"] += 1
+                        break
+                    self._tab_count -= 1
+                    self._tab_stats["discarded"] += 1
+                else:
+                    tab = None
+                if tab or self._tab_count < self._max_tabs:
+                    break
+                remaining = timeout - (time.time() - start)
+                if remaining <= 0:
+                    raise TimeoutError(f"等待浏览器标签页超时（{timeout}s），当前已借出 {self._tab_count} 个")
+                if not waited:
+                    waited = True
+                    self._tab_stats["waits"] += 1
+                self._tab_cond.wait(remaining)
+            if waited:
+                self._tab_stats["wait_time"] += time.time() - start
+            if not tab:
+                # 先占位，新建标签页时不持有锁
+                self._tab_count += 1
+        if not tab:
+            try:
+                tab = self._browser.new_tab()
+            except Exception:
+                with self._tab_cond:
+                    self._tab_count -= 1
+                    self._tab_cond.notify()
+                raise
+            with self._tab_cond:
+                self._tab_stats["created"] += 1
+        self._load_clearance()
+        getattr(tab.set.load_mode, load_mode)()
+        if resource_policy and resource_policy.enable_cdp(tab):
+            with self._tab_cond:
+                self._intercepted_tabs.add(tab.tab_id)
+        return tab
+
+    def checkin_tab(self, tab: ChromiumTab | MixTab):
+        """
+        归还标签页，保存新得到的 clearance，撤销资源拦截、清理监听、恢复下载设置并回到空白页，重置失败的标签页直接关闭
+        """
+        if not tab:
+            return
+        self._save_clearance(tab)
+        with self._tab_cond:
+            intercepted = tab.tab_id in self._intercepted_tabs
+            self._intercepted_tabs.discard(tab.tab_id)
+        try:
+            if intercepted:
+                ResourceBlockPolicy.disable_cdp(tab)
+            tab.listen.stop()
+            tab.set.load_mode.normal()
+            # 借用方可能修改了下载目录和同名文件处理方式，恢复为浏览器默认值
+            tab.set.when_download_file_exists(_DEFAULT_FILE_EXISTS_MODE)
+            if tab.download_path != self._browser.download_path:
+                tab.set.download_path(self._browser.download_path)
+            tab.get("about:blank")
+            reusable = True
+        except Exception as e:
+            logger.debug(f"重置标签页失败，关闭该标签页: {str(e)}")
+            reusable = False
+            try:
+                tab.close()
+            except Exception:
+                pass
+        with self._tab_cond:
+            if reusable:
+                self._idle_tabs.append(tab)
+            else:
+                self._tab_count -= 1
+                self._tab_stats["discarded"] += 1
+            self._tab_cond.notify()
+
+    @property
+    def user_agent(self) -> str:
+        if not self._user_agent:
+            self._user_agent = self._browser.user_agent
+        return self._user_agent
+
+    def _load_clearance(self):
+        """
+        将已保存的 clearance 同步到浏览器，只在记录有变化时同步
+        """
+        store = ClearanceStore()
+        if store.version == self._clearance_version:
+            return
+        self._clearance_version = store.version
+        try:
+            cookies = store.cookies_for(self.user_agent, egress_key(self._proxy))
+            if cookies:
+                self._browser.set.cookies(cookies)
+        except Exception as e:
+            logger.debug(f"同步 clearance 到浏览器失败: {str(e)}")
+
+    def _save_clearance(self, tab: ChromiumTab | MixTab):
+        """
+        保存标签页通过验证后得到的 clearance
+        """
+        try:
+            if not tab.url or not tab.url.startswith("http"):
+                return
+            cookies = tab.cookies(all_info=True)
+            clearance = next((c for c in cookies if c.get("name") == ClearanceStore.CLEARANCE_COOKIE), None)
+            if not clearance:
+                return
+            store = ClearanceStore()
+            egress = egress_key(self._proxy)
+            if any(c["name"] == clearance["name"] and c["value"] == clearance["value"]
+                   for c in store.get_cookies(tab.url, self.user_agent, egress)):
+                return
+            store.put(tab.url, self.user_agent, egress, list(cookies))
+        except Exception as e:
+            logger.debug(f"保存 clearance 失败: {str(e)}")
 
     @staticmethod
-    def getTurnstileToken(page: ChromiumPage | MixTab | ChromiumTab):
-        if not page or not is_cloud_flare_verification_page(page.html):
+    def _is_tab_alive(tab: ChromiumTab | MixTab) -> bool:
+        try:
+            return tab.states.is_alive
+        except Exception:
+            return False
+
+    def tab_pool_stats(self) -> Dict[str, Any]:
+        """
+        标签页池统计信息
+        """
+        with self._tab_cond:
+            return {
+                "max_tabs": self._max_tabs,
+                "total": self._tab_count,
+                "idle": len(self._idle_tabs),
+                **self._tab_stats,
+                "wait_time": round(self._tab_stats["wait_time"], 3)
+            }
+
+    def solve_challenge(self, tab: ChromiumTab | MixTab, refresh_url: Optional[str] = None):
+        """
+        通过验证协调器处理标签页上的 Cloudflare 验证，同一域名同一时间只验证一次，
+        其它标签页等待后刷新页面复查，clearance 已生效则无需再次验证
+        :param tab: 标签页
+        :param refresh_url: 提供时注册后台刷新，clearance 过期前重新打开该地址完成验证
+        :return: 同 getTurnstileToken
+        """
+        if not tab or not self.is_challenge_page(tab):
+            return True
+        broker = ChallengeBroker()
+        if refresh_url:
+            egress = egress_key(self._proxy)
+            broker.register_refresh(refresh_url,
+                                    refresh=lambda: self._refresh_challenge(refresh_url),
+                                    expires_at=lambda: ClearanceStore().expires_at(refresh_url, self.user_agent,
+                                                                                   egress))
+
+        def _recheck():
+            self._load_clearance()
+            tab.refresh()
+            tab.wait.doc_loaded()
+            return not self.is_challenge_page(tab)
+
+        result = broker.solve(tab.url, lambda: self.getTurnstileToken(tab), recheck=_recheck)
+        if result:
+            self._save_clearance(tab)
+        return result
+
+    def _refresh_challenge(self, url: str) -> bool:
+        """
+        后台刷新 clearance：在新借出的标签页中打开地址并完成验证，归还时保存 clearance
+        刷新在验证协调器的后台线程中执行，不等待标签页，池满时跳过本轮
+        """
+        try:
+            tab = self.checkout_tab(timeout=0)
+        except TimeoutError:
+            raise RefreshSkipped("没有空闲的浏览器标签页")
+        try:
+            tab.get(url)
+            return bool(self.getTurnstileToken(tab))
+        finally:
+            self.checkin_tab(tab)
+
+    @staticmethod
+    def is_challenge_page(page: ChromiumPage | MixTab | ChromiumTab) -> bool:
+        """
+        在页面内判断是否为 Cloudflare 验证页，只返回一个布尔值，避免通过 CDP 拉取整个 DOM
+        """
+        try:
+            return bool(page.run_js(_CHALLENGE_PROBE_JS))
+        except Exception:
+            return is_cloud_flare_verification_page(page.html)
+
+    @staticmethod
+    def _click_turnstile(page: ChromiumPage | MixTab | ChromiumTab):
+        """
+        点击 Turnstile 复选框，元素还未出现时忽略
+        """
+        try:
+            challengeSolution = page.ele("@name=cf-turnstile-response", timeout=0.5)
+            challengeWrapper = challengeSolution.parent()
+            challengeIframe = challengeWrapper.shadow_root.ele("tag:iframe")
+            challengeIframeBody = challengeIframe.ele("tag:body").shadow_root
+            challengeButton = challengeIframeBody.ele("tag:input")
+            challengeButton.click()
+        except Exception:
+            pass
+
+    @staticmethod
+    def getTurnstileToken(page: ChromiumPage | MixTab | ChromiumTab, timeout: float = 15):
+        """
+        获取 Turnstile token
+
+        在页面中注入等待脚本，token 回调触发后立即返回；每轮等待前尝试点击复选框，整体不超过 timeout。
+        整页验证（5秒盾）通过后页面会跳转，等待脚本随之失效，此时复查页面即可。
+        :param page: 页面
+        :param timeout: 最长等待时间（秒）
+        :return: 未触发验证返回 True，通过返回 token，失败返回 None
+        """
+        if not page or not DrissonBrowser.is_challenge_page(page):
             return True
         logger.info('Starting Cloudflare bypass.')
+        start = time.time()
+        deadline = start + timeout
         page.run_js("try { turnstile.reset() } catch(e) { }")
-
-        turnstileResponse = None
-        for i in range(0, 15):
+        while (remaining := deadline - time.time()) > 0:
+            DrissonBrowser._click_turnstile(page)
+            wait = min(remaining, _TURNSTILE_CLICK_INTERVAL)
             try:
-                turnstileResponse = page.run_js("try { return turnstile.getResponse() } catch(e) { return null }")
-                if turnstileResponse:
-                    return turnstileResponse
-
-                challengeSolution = page.ele("@name=cf-turnstile-response")
-                challengeWrapper = challengeSolution.parent()
-                challengeIframe = challengeWrapper.shadow_root.ele("tag:iframe")
-                challengeIframeBody = challengeIframe.ele("tag:body").shadow_root
-                challengeButton = challengeIframeBody.ele("tag:input")
-                challengeButton.click()
-            except:
-                pass
-            time.sleep(1)
-            # if i % 5 == 0:
-            #     page.refresh()
-                # page.wait.ele_displayed("@name=cf-turnstile-response", timeout=15)
+                token = page.run_js(_TURNSTILE_WAITER_JS, int(wait * 1000), timeout=wait + 2)
+            except Exception:
+                # 页面跳转导致脚本上下文丢失
+                token = None
+                page.wait.doc_loaded(timeout=max(1.0, deadline - time.time()))
+                if not DrissonBrowser.is_challenge_page(page):
+                    logger.info(f"Cloudflare 验证通过，耗时 {time.time() - start:.2f}s")
+                    return True
+            if token:
+                logger.info(f"获取 TurnstileToken 成功，耗时 {time.time() - start:.2f}s")
+                return token
+        logger.warning(f"获取 TurnstileToken 超时（{timeout}s）")
         page.refresh()
         return None
 
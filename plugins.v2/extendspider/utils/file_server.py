@@ -2,8 +2,8 @@ import os
 from abc import abstractmethod, ABC
 from typing import Dict, Any, Tuple
 from urllib.parse import urlparse, unquote
-import requests
 from app.log import logger
+from app.plugins.extendspider.utils.http_client import HttpClient
 from app.utils.common import retry
 from app.utils.ratelimit import rate_limit
 
@@ -28,46 +28,54 @@ class FileServer(ABC):
     def _download_file(self, url: str, save_path: str, timeout: int = 30) -> Dict[str, Any]:
         """下载远程文件到本地"""
         try:
-            response = requests.get(url, stream=True, timeout=timeout)
-            response.raise_for_status()
-
-            # 获取实际下载的文件名
-            content_disposition = response.headers.get('content-disposition')
-            downloaded_filename = "downloaded_file"
-
-            if content_disposition and 'filename=' in content_disposition:
-                downloaded_filename = content_disposition.split('filename=')[1].strip('"\'')
-            else:
-                # 如果没有在响应头中找到文件名，从URL解析
-                parsed_url = urlparse(url)
-                filename = os.path.basename(parsed_url.path)
-                if filename:
-                    downloaded_filename = filename
-
-            # 确保有文件扩展名
-            if '.' not in downloaded_filename:
-                _, ext = os.path.splitext(url)
-                if ext:
-                    downloaded_filename += ext
-
-            # 保存完整路径
-            full_save_path = os.path.join(save_path, downloaded_filename)
-
-            # 下载文件
-            with open(full_save_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
-
-            return {
-                "success": True,
-                "file_path": full_save_path,
-                "file_name": downloaded_filename
-            }
+            response = HttpClient().get(url, stream=True, timeout=timeout)
+            try:
+                response.raise_for_status()
+                return self._save_response(url, response, save_path)
+            finally:
+                # 流式下载需要关闭响应，连接才会放回连接池
+                response.close()
         except Exception as e:
             logger.error(f"下载文件失败：{str(e)}")
             return {"success": False, "error": f"下载失败：{str(e)}"}
 
+    @staticmethod
+    def _save_response(url: str, response, save_path: str) -> Dict[str, Any]:
+        """保存下载响应到本地"""
+        # 获取实际下载的文件名
+        content_disposition = response.headers.get('content-disposition')
+        downloaded_filename = "downloaded_file"
+
+        if content_disposition and 'filename=' in content_disposition:
+            downloaded_filename = content_disposition.split('filename=')[1].strip('"\'')
+        else:
+            # 如果没有在响应头中找到文件名，从URL解析
+            parsed_url = urlparse(url)
+            filename = os.path.basename(parsed_url.path)
+            if filename:
+                downloaded_filename = filename
+
+        # 确保有文件扩展名
+        if '.' not in downloaded_filename:
+            _, ext = os.path.splitext(url)
+            if ext:
+                downloaded_filename += ext
+
+        # 保存完整路径
+        full_save_path = os.path.join(save_path, downloaded_filename)
+
+        # 下载文件
+        with open(full_save_path, 'wb') as f:
+            for chunk in response.iter_content(chunk_size=8192):
+                if chunk:
+                    f.write(chunk)
+
+        return {
+            "success": True,
+            "file_path": full_save_path,
+            "file_name": downloaded_filename
+        }
+
 
 class FileCodeBox(FileServer):
     def __init__(self, url) -> None:
@@ -0,0 +1,220 @@
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional, Dict, List, Any, Tuple
+
+from app.log import logger
+from app.utils.singleton import SingletonClass
+from app.plugins.extendspider.utils.clearance_store import normalize_domain
+from app.plugins.extendspider.utils.http_client import HttpClient
+
+
+class FlareSolverrSession:
+    """
+    FlareSolverr 会话状态
+    """
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        # 正在执行的请求数
+        self.busy = 0
+        # 连续失败次数
+        self.failures = 0
+        self.requests = 0
+        self.healthy = True
+        self.ready = False
+        self.created = time.time()
+        self.last_used = self.created
+
+
+class FlareSolverrSessionPool(metaclass=SingletonClass):
+    """
+    FlareSolverr 会话池
+
+    每个域名最多保持 size 个 FlareSolverr 会话，请求分配给正在执行请求最少的会话，
+    会话内的浏览器保留 clearance，后续请求无需重新验证。
+    会话连续失败、超过最长存活时间或健康检查发现已不存在时标记为不可用，空闲后销毁，下次需要时重新创建。
+    """
+
+    # FlareSolverr 接口超时（连接, 读取）
+    REQUEST_TIMEOUT = (10, 120)
+
+    def __init__(self, max_failures: int = 2, max_age: float = 3600, idle_timeout: float = 900,
+                 check_interval: float = 300):
+        """
+        :param max_failures: 连续失败多少次后回收会话
+        :param max_age: 会话最长存活时间（秒）
+        :param idle_timeout: 会话空闲多久后回收（秒）
+        :param check_interval: 健康检查间隔（秒）
+        """
+        self.max_failures = max_failures
+        self.max_age = max_age
+        self.idle_timeout = idle_timeout
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        # (FlareSolverr 地址, 域名) -> 会话列表
+        self._sessions: Dict[Tuple[str, str], List[FlareSolverrSession]] = {}
+        self._last_check: Dict[str, float] = {}
+        self._counter = itertools.count(1)
+        self._client = HttpClient()
+
+    def call(self, flaresolverr_url: str, payload: dict, timeout: Optional[Tuple[float, float]] = None) -> dict:
+        """
+        调用 FlareSolverr 接口
+        :return: 响应 JSON
+        """
+        response = self._client.post(f"{flaresolverr_url}/v1", json=payload, timeout=timeout or self.REQUEST_TIMEOUT)
+        response.raise_for_status()
+        return response.json()
+
+    @contextmanager
+    def session(self, flaresolverr_url: str, domain: str, size: int = 2, prefix: str = "moviepilot"):
+        """
+        借出一个会话，用法：
+            with pool.session(url, domain) as session: ...
+        请求结果通过 report 反馈
+        :param flaresolverr_url: FlareSolverr 地址
+        :param domain: 域名或地址
+        :param size: 该域名最多保持的会话数
+        :param prefix: 会话 ID 前缀
+        """
+        session = self.acquire(flaresolverr_url, domain, size=size, prefix=prefix)
+        try:
+            yield session
+        finally:
+            self.release(flaresolverr_url, domain, session)
+
+    def acquire(self, flaresolverr_url: str, domain: str, size: int = 2, prefix: str = "moviepilot") \
+            -> FlareSolverrSession:
+        """
+        借出正在执行请求最少的可用会话，会话都在使用且未达上限时新建，超龄或空闲过久的空闲会话同时回收
+        """
+        self._check_health(flaresolverr_url)
+        key = (flaresolverr_url, normalize_domain(domain))
+        with self._lock:
+            sessions = self._sessions.setdefault(key, [])
+            recycle = [s for s in sessions if s.busy == 0 and not self._usable(s)]
+            for s in recycle:
+                sessions.remove(s)
+            candidates = [s for s in sessions if self._usable(s)]
+            session = min(candidates, key=lambda s: (s.busy, s.last_used), default=None)
+            create = session is None or (session.busy > 0 and len(candidates) < max(1, size))
+            if create:
+                session = FlareSolverrSession(f"{prefix}_{key[1] or 'default'}_{next(self._counter)}")
+                sessions.append(session)
+            session.busy += 1
+            session.last_used = time.time()
+        for s in recycle:
+            self._destroy(flaresolverr_url, s)
+        if create:
+            try:
+                result = self.call(flaresolverr_url, {"cmd": "sessions.create", "session": session.session_id})
+                if result.get("status") != "ok":
+                    raise RuntimeError(result.get("message") or "创建会话失败")
+                session.ready = True
+                logger.info(f"创建 FlareSolverr 会话 {session.session_id}")
+            except Exception:
+                with self._lock:
+                    session.busy -= 1
+                    session.healthy = False
+                    sessions.remove(session)
+                raise
+        return session
+
+    def release(self, flaresolverr_url: str, domain: str, session: FlareSolverrSession):
+        """
+        归还会话，不可用的会话空闲后销毁
+        """
+        key = (flaresolverr_url, normalize_domain(domain))
+        with self._lock:
+            session.busy -= 1
+            session.last_used = time.time()
+            recycle = [s for s in self._sessions.get(key, []) if s.busy == 0 and not self._usable(s)]
+            for s in recycle:
+                self._sessions[key].remove(s)
+        for s in recycle:
+            self._destroy(flaresolverr_url, s)
+
+    def report(self, session: FlareSolverrSession, ok: bool):
+        """
+        反馈请求结果，连续失败达到上限时标记为不可用
+        """
+        with self._lock:
+            session.requests += 1
+            if ok:
+                session.failures = 0
+                return
+            session.failures += 1
+            if session.failures >= self.max_failures and session.healthy:
+                session.healthy = False
+                logger.warning(f"FlareSolverr 会话 {session.session_id} 连续失败 {session.failures} 次，等待回收")
+
+    def _usable(self, session: FlareSolverrSession) -> bool:
+        now = time.time()
+        return session.healthy and now - session.created < self.max_age and now - session.last_used < self.idle_timeout
+
+    def _destroy(self, flaresolverr_url: str, session: FlareSolverrSession):
+        if not session.ready:
+            return
+        try:
+            self.call(flaresolverr_url, {"cmd": "sessions.destroy", "session": session.session_id}, timeout=(5, 30))
+            logger.info(f"销毁 FlareSolverr 会话 {session.session_id}")
+        except Exception as e:
+            logger.debug(f"销毁 FlareSolverr 会话 {session.session_id} 失败: {str(e)}")
+
+    def _check_health(self, flaresolverr_url: str):
+        """
+        定期对照 FlareSolverr 中实际存在的会话，FlareSolverr 重启后丢失的会话标记为不可用，同时回收空闲过久的会话
+        """
+        now = time.time()
+        with self._lock:
+            if now - self._last_check.get(flaresolverr_url, 0) < self.check_interval:
+                return
+            self._last_check[flaresolverr_url] = now
+        try:
+            alive = set(self.call(flaresolverr_url, {"cmd": "sessions.list"}, timeout=(5, 10)).get("sessions") or [])
+        except Exception as e:
+            logger.warning(f"FlareSolverr 健康检查失败 {flaresolverr_url}: {str(e)}")
+            return
+        recycle = []
+        with self._lock:
+            for (url, _), sessions in self._sessions.items():
+                if url != flaresolverr_url:
+                    continue
+                for s in list(sessions):
+                    if s.ready and s.session_id not in alive:
+                        s.healthy, s.ready = False, False
+                    if s.busy == 0 and not self._usable(s):
+                        sessions.remove(s)
+                        recycle.append(s)
+        for s in recycle:
+            self._destroy(flaresolverr_url, s)
+
+    def stats(self) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        各域名的会话状态
+        """
+        with self._lock:
+            return {
+                f"{url}|{domain}": [{
+                    "session": s.session_id,
+                    "busy": s.busy,
+                    "requests": s.requests,
+                    "failures": s.failures,
+                    "healthy": s.healthy,
+                    "age": int(time.time() - s.created),
+                } for s in sessions]
+                for (url, domain), sessions in self._sessions.items()
+            }
+
+    def shutdown(self):
+        """
+        销毁所有会话
+        """
+        with self._lock:
+            sessions = [(url, s) for (url, _), items in self._sessions.items() for s in items]
+            self._sessions = {}
+            self._last_check = {}
+        for url, session in sessions:
+            self._destroy(url, session)
@@ -0,0 +1,234 @@
+import re
+import threading
+import time
+from typing import Optional, Union, List, Dict, Any, Tuple, FrozenSet
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+from app.log import logger
+
+try:
+    import lxml  # noqa: F401
+
+    _HAS_LXML = True
+except ImportError:
+    _HAS_LXML = False
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+
+class LexborNode:
+    """
+    selectolax 节点包装，提供与 BeautifulSoup Tag 相同的常用接口
+    """
+    __slots__ = ("_node",)
+
+    def __init__(self, node):
+        self._node = node
+
+    @property
+    def name(self) -> str:
+        return self._node.tag
+
+    @property
+    def attrs(self) -> Dict[str, Optional[str]]:
+        return dict(self._node.attributes)
+
+    @property
+    def text(self) -> str:
+        return self._node.text(deep=True)
+
+    def get_text(self, separator: str = "", strip: bool = False) -> str:
+        return self._node.text(deep=True, separator=separator, strip=strip)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        value = self._node.attributes.get(key)
+        return default if value is None else value
+
+    def __getitem__(self, key: str) -> str:
+        value = self._node.attributes.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    @staticmethod
+    def _selector(selector: str) -> str:
+        # soupsieve 的文本包含伪类在 lexbor 中对应 :lexbor-contains
+        return selector.replace(":-soup-contains(", ":lexbor-contains(")
+
+    def select(self, selector: str) -> List["LexborNode"]:
+        return [LexborNode(node) for node in self._node.css(self._selector(selector))]
+
+    def select_one(self, selector: str) -> Optional["LexborNode"]:
+        node = self._node.css_first(self._selector(selector))
+        return LexborNode(node) if node is not None else None
+
+    def __str__(self) -> str:
+        return self._node.html or ""
+
+
+class ParseSpec:
+    """
+    页面解析范围
+
+    只保留与选择器匹配的元素及其子树，侧栏、广告等其它部分在解析时直接丢弃，不建立节点。
+    选择器只支持单个元素的 tag、.class、#id 组合，如 "li.media.thread.tap"、"div#downlist"，
+    需要在爬虫模块加载时创建，之后每次解析复用。
+    匹配到的元素成为文档的顶层节点，后续 CSS 选择器不能再依赖其外层元素。
+    """
+
+    def __init__(self, *selectors: str):
+        self.selectors = selectors
+        self._rules: List[Tuple[Optional[str], Optional[str], FrozenSet[str]]] = \
+            [self._compile(selector) for selector in selectors]
+        self._tags = {tag for tag, _, _ in self._rules}
+        self.strainer = _SpecStrainer(self)
+
+    @staticmethod
+    def _compile(selector: str) -> Tuple[Optional[str], Optional[str], FrozenSet[str]]:
+        tag, element_id, classes = None, None, set()
+        for part in re.findall(r"[.#]?[^.#]+", selector.strip()):
+            if part.startswith("."):
+                classes.add(part[1:])
+            elif part.startswith("#"):
+                element_id = part[1:]
+            else:
+                tag = part.lower()
+        return tag, element_id, frozenset(classes)
+
+    def match(self, name: str, attrs) -> bool:
+        """
+        判断开始标签是否在解析范围内
+        """
+        if None not in self._tags and name not in self._tags:
+            return False
+        attrs = attrs if isinstance(attrs, dict) else dict(attrs or ())
+        classes = attrs.get("class") or ()
+        if isinstance(classes, str):
+            classes = classes.split()
+        for tag, element_id, required in self._rules:
+            if tag and tag != name:
+                continue
+            if element_id and attrs.get("id") != element_id:
+                continue
+            if required and not required.issubset(classes):
+                continue
+            return True
+        return False
+
+
+class _SpecStrainer(SoupStrainer):
+    """
+    按 ParseSpec 过滤的 SoupStrainer，兼容 bs4 4.13 前后两套过滤接口
+    """
+
+    def __init__(self, spec: ParseSpec):
+        super().__init__()
+        self.spec = spec
+
+    @property
+    def includes_everything(self) -> bool:
+        return False
+
+    @property
+    def excludes_everything(self) -> bool:
+        return False
+
+    # bs4 >= 4.13
+    def allow_tag_creation(self, nsprefix, name, attrs) -> bool:
+        return self.spec.match(name, attrs)
+
+    def allow_string_creation(self, string) -> bool:
+        return False
+
+    # bs4 < 4.13
+    def search_tag(self, markup_name=None, markup_attrs=None):
+        if markup_name is None or not isinstance(markup_name, str):
+            return super().search_tag(markup_name, markup_attrs)
+        return self.spec.match(markup_name, markup_attrs or {})
+
+
+class HtmlParser:
+    """
+    HTML 解析器
+
+    每个页面只解析一次，返回的文档在各个提取步骤之间共用。
+    为了在不同后端之间切换，爬虫只使用以下接口：select/select_one（CSS 选择器，支持 :-soup-contains）、
+    get_text/text、get/[] 取属性，不使用 find/find_all 等 BeautifulSoup 专有接口。
+    后端：
+        lxml        BeautifulSoup + lxml，默认
+        html.parser BeautifulSoup + 标准库，最慢，未安装 lxml 时使用
+        selectolax  selectolax(lexbor)，最快
+    """
+
+    BACKENDS = ("lxml", "html.parser", "selectolax")
+    DEFAULT_BACKEND = "lxml"
+
+    def __init__(self, backend: Optional[str] = None):
+        self.backend = self._resolve(backend or self.DEFAULT_BACKEND)
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Any] = {"documents": 0, "bytes": 0, "cpu_time": 0.0}
+
+    @classmethod
+    def from_config(cls, config: dict) -> "HtmlParser":
+        """
+        从爬虫配置创建，html_parser 指定后端
+        """
+        return cls(config.get("html_parser"))
+
+    @classmethod
+    def _resolve(cls, backend: str) -> str:
+        """
+        检查后端是否可用，不可用时依次回退到 lxml、html.parser
+        """
+        if backend not in cls.BACKENDS:
+            logger.warning(f"不支持的 HTML 解析后端: {backend}，使用 {cls.DEFAULT_BACKEND}")
+            backend = cls.DEFAULT_BACKEND
+        if backend == "selectolax" and LexborHTMLParser is None:
+            logger.warning("未安装 selectolax，HTML 解析改用 lxml")
+            backend = "lxml"
+        if backend == "lxml" and not _HAS_LXML:
+            logger.warning("未安装 lxml，HTML 解析改用 html.parser")
+            backend = "html.parser"
+        return backend
+
+    def parse(self, content: Union[str, bytes], spec: Optional[ParseSpec] = None) \
+            -> Union[BeautifulSoup, LexborNode]:
+        """
+        解析页面
+        :param content: 页面内容
+        :param spec: 解析范围，只建立范围内的节点；selectolax 解析整页足够快，忽略该参数
+        :return: 文档根节点
+        """
+        content = content or ""
+        start = time.thread_time()
+        if self.backend == "selectolax":
+            parser = LexborHTMLParser(content)
+            document = LexborNode(parser.root if parser.root is not None else parser)
+        else:
+            document = BeautifulSoup(content, self.backend, parse_only=spec.strainer if spec else None)
+        self._record(len(content), time.thread_time() - start)
+        return document
+
+    def _record(self, size: int, cpu_time: float):
+        with self._lock:
+            self._stats["documents"] += 1
+            self._stats["bytes"] += size
+            self._stats["cpu_time"] += cpu_time
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        解析统计快照（累计值）
+        """
+        with self._lock:
+            return dict(self._stats)
+
+    def since(self, snapshot: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        计算自快照以来的解析次数、字节数和 CPU 耗时
+        """
+        current = self.snapshot()
+        return {key: current[key] - snapshot.get(key, 0) for key in current}
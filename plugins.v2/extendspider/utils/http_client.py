@@ -0,0 +1,232 @@
+import asyncio
+import ssl
+import threading
+import weakref
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+from typing import Optional, Dict, Any, Tuple, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+
+from app.core.config import settings
+from app.log import logger
+from app.utils.singleton import SingletonClass
+
+try:
+    import brotli  # noqa: F401 urllib3 有 brotli 时可解压 br
+
+    _ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    _ACCEPT_ENCODING = "gzip, deflate"
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+try:
+    import h2  # noqa: F401 httpx 启用 HTTP/2 需要 h2
+
+    _HTTP2 = httpx is not None
+except ImportError:
+    _HTTP2 = False
+
+Timeout = Union[float, Tuple[float, float]]
+
+
+class HttpClient(metaclass=SingletonClass):
+    """
+    插件共享的 HTTP 客户端
+
+    同步接口基于带连接池的 requests.Session，按主机限制连接数并复用 keep-alive 连接；
+    异步接口优先使用 httpx（安装了 h2 时启用 HTTP/2），否则使用 aiohttp，每个事件循环一个客户端。
+    会话不保存 cookies，需要 cookies 时每次请求传入，避免不同爬虫之间串用。
+    """
+
+    # 默认超时（连接, 读取）
+    DEFAULT_TIMEOUT: Tuple[float, float] = (10, 30)
+
+    def __init__(self, max_per_host: int = 10, max_hosts: int = 32, max_connections: int = 100):
+        """
+        :param max_per_host: 单个主机最多同时保持的连接数，超出时等待
+        :param max_hosts: 最多缓存多少个主机的连接池
+        :param max_connections: 异步客户端最大连接数
+        """
+        self.max_per_host = max_per_host
+        self.max_hosts = max_hosts
+        self.max_connections = max_connections
+        self._session = self._create_session()
+        self._async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Optional[str], Any]]" = \
+            weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def _create_session(self) -> requests.Session:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.max_hosts, pool_maxsize=self.max_per_host, pool_block=True)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.headers.update({
+            "User-Agent": settings.USER_AGENT,
+            "Accept-Encoding": _ACCEPT_ENCODING,
+        })
+        session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        return session
+
+    @staticmethod
+    def get_proxies(proxy: bool) -> Optional[Dict[str, str]]:
+        return settings.PROXY if proxy else None
+
+    # 同步接口
+    def request(self, method: str, url: str, proxy: bool = False, timeout: Optional[Timeout] = None,
+                **kwargs) -> requests.Response:
+        """
+        发送请求，参数同 requests.request
+        :param proxy: 是否使用系统代理
+        :param timeout: 超时时间，默认 DEFAULT_TIMEOUT
+        """
+        if proxy and "proxies" not in kwargs:
+            kwargs["proxies"] = self.get_proxies(proxy)
+        return self._session.request(method, url, timeout=timeout or self.DEFAULT_TIMEOUT, **kwargs)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    # 异步接口
+    def _get_async_client(self, proxy: bool, verify: Union[bool, str] = True):
+        loop = asyncio.get_running_loop()
+        proxy_url = settings.PROXY_HOST if proxy else None
+        with self._lock:
+            clients = self._async_clients.setdefault(loop, {})
+            # httpx 的证书校验只能在客户端上设置，不校验或使用自定义证书时单独创建客户端
+            key = (proxy_url, verify) if httpx else proxy_url
+            client = clients.get(key)
+            if client is None or (client.is_closed if httpx else client.closed):
+                client = self._create_async_client(proxy_url, verify)
+                clients[key] = client
+            return client
+
+    def _create_async_client(self, proxy_url: Optional[str], verify: Union[bool, str] = True):
+        headers = {"User-Agent": settings.USER_AGENT, "Accept-Encoding": _ACCEPT_ENCODING}
+        connect, read = self.DEFAULT_TIMEOUT
+        if httpx:
+            return httpx.AsyncClient(
+                http2=_HTTP2,
+                headers=headers,
+                # 客户端不保存响应中的 cookies
+                cookies=CookieJar(policy=DefaultCookiePolicy(allowed_domains=[])),
+                proxy=proxy_url,
+                verify=self._ssl_context(verify),
+                timeout=httpx.Timeout(read, connect=connect),
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_per_host * 2),
+                follow_redirects=True,
+            )
+        import aiohttp
+        return aiohttp.ClientSession(
+            headers=headers,
+            timeout=aiohttp.ClientTimeout(sock_connect=connect, sock_read=read),
+            connector=aiohttp.TCPConnector(limit=self.max_connections, limit_per_host=self.max_per_host),
+            cookie_jar=aiohttp.DummyCookieJar(),
+        )
+
+    @staticmethod
+    def _ssl_context(verify: Union[bool, str]) -> Union[bool, ssl.SSLContext]:
+        """
+        requests 的 verify 参数：布尔值或 CA 证书路径
+        """
+        if isinstance(verify, str):
+            return ssl.create_default_context(cafile=verify)
+        return bool(verify)
+
+    @staticmethod
+    def _form_data(data: Any, files: dict):
+        """
+        将 requests 格式的 data/files 转换为 aiohttp.FormData
+        files 的值为文件对象/内容，或 (文件名, 文件对象/内容[, content_type])
+        """
+        import aiohttp
+        form = aiohttp.FormData()
+        for name, value in (data.items() if isinstance(data, dict) else data or ()):
+            form.add_field(name, str(value))
+        for name, value in files.items():
+            if isinstance(value, (tuple, list)):
+                filename, content, *rest = value
+                form.add_field(name, content, filename=filename, content_type=rest[0] if rest else None)
+            else:
+                form.add_field(name, value, filename=getattr(value, "name", name))
+        return form
+
+    async def arequest(self, method: str, url: str, proxy: bool = False, timeout: Optional[float] = None,
+                       params: Optional[dict] = None, headers: Optional[dict] = None,
+                       cookies: Optional[dict] = None, data: Any = None, json: Any = None,
+                       files: Optional[dict] = None, allow_redirects: bool = True,
+                       verify: Union[bool, str] = True, **kwargs) -> requests.Response:
+        """
+        异步发送请求，返回与同步接口一致的 requests.Response
+        参数与同步接口对应，不支持的 requests 参数（如 stream、cert、hooks、auth）直接报错，不静默忽略
+        :param proxy: 是否使用系统代理
+        :param timeout: 总超时时间（秒）
+        :param files: 上传的文件，格式同 requests
+        :param allow_redirects: 是否跟随重定向
+        :param verify: 是否校验证书，或 CA 证书路径
+        """
+        if kwargs:
+            raise TypeError(f"异步请求不支持参数: {', '.join(sorted(kwargs))}")
+        client = self._get_async_client(proxy, verify)
+        if httpx:
+            if cookies:
+                # httpx 不建议按请求传入 cookies，直接写入请求头
+                headers = {**(headers or {}), "Cookie": "; ".join(f"{k}={v}" for k, v in cookies.items())}
+            resp = await client.request(method, url, params=params, headers=headers, data=data,
+                                        json=json, files=files, follow_redirects=allow_redirects,
+                                        timeout=timeout or httpx.USE_CLIENT_DEFAULT)
+            response = self._to_response(url, resp.status_code, resp.headers, resp.content, str(resp.url))
+            for cookie in resp.cookies.jar:
+                response.cookies.set_cookie(cookie)
+            return response
+        import aiohttp
+        options = {"timeout": aiohttp.ClientTimeout(total=timeout)} if timeout else {}
+        if verify is not True:
+            options["ssl"] = self._ssl_context(verify)
+        if files:
+            data = self._form_data(data, files)
+        async with client.request(method, url, params=params, headers=headers, cookies=cookies, data=data,
+                                  json=json, proxy=settings.PROXY_HOST if proxy else None,
+                                  allow_redirects=allow_redirects, **options) as resp:
+            content = await resp.read()
+            response = self._to_response(url, resp.status, resp.headers, content, str(resp.url))
+            for name, morsel in resp.cookies.items():
+                response.cookies.set(name, morsel.value, domain=morsel["domain"] or resp.url.host or "",
+                                     path=morsel["path"] or "/")
+            return response
+
+    async def aget(self, url: str, **kwargs) -> requests.Response:
+        return await self.arequest("GET", url, **kwargs)
+
+    async def apost(self, url: str, **kwargs) -> requests.Response:
+        return await self.arequest("POST", url, **kwargs)
+
+    @staticmethod
+    def _to_response(request_url: str, status: int, headers, content: bytes, url: str) -> requests.Response:
+        response = Response()
+        response.status_code = status
+        response.headers = CaseInsensitiveDict(dict(headers))
+        response._content = content
+        response.url = url or request_url
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        return response
+
+    def close(self):
+        """
+        关闭同步会话，异步客户端随事件循环释放
+        """
+        try:
+            self._session.close()
+        except Exception as e:
+            logger.debug(f"关闭 HTTP 会话失败: {str(e)}")
+        self._session = self._create_session()
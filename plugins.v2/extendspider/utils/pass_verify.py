@@ -1,26 +1,84 @@
 import random
+import re
+from typing import Iterable, Tuple
 
 from DrissionPage._pages.chromium_page import ChromiumPage
 from DrissionPage._pages.chromium_tab import ChromiumTab
 from DrissionPage._pages.mix_tab import MixTab
-from bs4 import BeautifulSoup
 
 from app.log import logger
 from utils.system import SystemUtils
 
 
-def is_slider_verification_page(html: str) -> bool:
+class _PageSignature:
+    """
+    预编译的验证页特征，直接在原始文本/字节上查找，不解析 DOM
+
+    title_keywords: 标题关键字（不区分大小写），只在 <head> 内查找
+    markers: 任一子串命中即判定
+    marker_groups: 组内子串全部命中即判定
+    patterns: (预筛子串, 正则)，预筛子串命中后再用正则确认
+    """
+
+    _HEAD_END = {str: re.compile(r"</head\s*>", re.IGNORECASE), bytes: re.compile(rb"</head\s*>", re.IGNORECASE)}
+
+    def __init__(self, title_keywords: Iterable[str] = (), markers: Iterable[str] = (),
+                 marker_groups: Iterable[Iterable[str]] = (), patterns: Iterable[Tuple[str, str]] = ()):
+        title_keywords = tuple(title_keywords)
+        self._compiled = {}
+        for kind, encode in ((str, lambda x: x), (bytes, lambda x: x.encode("utf-8"))):
+            title_re = None
+            if title_keywords:
+                keywords = "|".join(re.escape(k) for k in title_keywords)
+                title_re = re.compile(encode(rf"<title\b[^>]*>[^<]*?(?:{keywords})"), re.IGNORECASE)
+            self._compiled[kind] = (
+                title_re,
+                tuple(encode(m) for m in markers),
+                tuple(tuple(encode(m) for m in group) for group in marker_groups),
+                tuple((encode(literal), re.compile(encode(regex), re.IGNORECASE)) for literal, regex in patterns),
+            )
+
+    def match(self, html: str | bytes) -> bool:
+        if not html:
+            return False
+        kind = bytes if isinstance(html, (bytes, bytearray)) else str
+        title_re, markers, marker_groups, patterns = self._compiled[kind]
+        if title_re:
+            head_end = self._HEAD_END[kind].search(html)
+            if title_re.search(html, 0, head_end.end() if head_end else len(html)):
+                return True
+        if any(marker in html for marker in markers):
+            return True
+        if any(all(marker in html for marker in group) for group in marker_groups):
+            return True
+        return any(literal in html and regex.search(html) for literal, regex in patterns)
+
+
+_SLIDER_SIGNATURE = _PageSignature(
+    markers=("滑动上面方块到右侧解锁",),
+    marker_groups=(("GOEDGE_WAF_CAPTCHA_ID", "ui-handler"),),
+)
+
+_CLOUD_FLARE_SIGNATURE = _PageSignature(
+    # 特征 1：标题
+    title_keywords=("just a moment", "checking your browser", "请稍候"),
+    patterns=(
+        # 特征 2：iframe 指向 challenges.cloudflare.com
+        ("challenges.cloudflare.com", r"<iframe\b[^>]*\bsrc\s*=\s*[\"']?[^\"'>]*challenges\.cloudflare\.com"),
+        # 特征 3：页面内包含 Turnstile 验证容器
+        ("challenge-widget-container", r"data-testid\s*=\s*[\"']?challenge-widget-container"),
+    ),
+)
+
+
+def is_slider_verification_page(html: str | bytes) -> bool:
     """
     判断当前页面是否为滑块验证页面
 
     :param html: 页面源代码
     :return: 如果页面包含特定的验证码标识，则返回True，否则返回False
     """
-    return (
-            ('GOEDGE_WAF_CAPTCHA_ID' in html and
-             'ui-handler' in html) or
-            '滑动上面方块到右侧解锁' in html
-    )
+    return _SLIDER_SIGNATURE.match(html)
 
 
 def pass_slider_verification(tab: ChromiumPage | MixTab | ChromiumTab):
@@ -49,26 +107,11 @@ def pass_slider_verification(tab: ChromiumPage | MixTab | ChromiumTab):
     return not is_slider_verification_page(tab1.html)
 
 
-def is_cloud_flare_verification_page(html: str) -> bool:
+def is_cloud_flare_verification_page(html: str | bytes) -> bool:
     """
     判断页面是否为 Cloudflare 的验证页（如5秒盾、Turnstile验证码等）
     """
-    soup = BeautifulSoup(html, "html.parser")
-
-    # 特征 1：标题
-    title = soup.title.string.strip().lower() if soup.title and soup.title.string else ""
-    if "just a moment..." in title or "just a moment" in title  or "checking your browser" in title or "请稍候" in title or "请稍候…" in title:
-        return True
-
-    # 特征 2：iframe 指向 challenges.cloudflare.com
-    if soup.find("iframe", src=lambda s: s and "challenges.cloudflare.com" in s):
-        return True
-
-    # 特征 4：页面内包含 Turnstile 验证容器
-    if soup.find(attrs={"data-testid": "challenge-widget-container"}):
-        return True
-
-    return False
+    return _CLOUD_FLARE_SIGNATURE.match(html)
 
 
 def pass_turnstile_verification(driver: ChromiumPage | MixTab | ChromiumPage, headless: bool = True):
@@ -280,3 +323,51 @@ class CloudflareBypasser:
             logger.info("Bypass successful.")
         else:
             logger.error("Bypass failed.")
+
+
+if __name__ == "__main__":
+    # 对比 BeautifulSoup 解析与特征查找的耗时，可传入保存的页面文件：python pass_verify.py a.html b.html
+    import sys
+    import timeit
+    from bs4 import BeautifulSoup
+
+
+    def is_cloud_flare_verification_page_bs4(html: str) -> bool:
+        soup = BeautifulSoup(html, "html.parser")
+        title = soup.title.string.strip().lower() if soup.title and soup.title.string else ""
+        if "just a moment" in title or "checking your browser" in title or "请稍候" in title:
+            return True
+        if soup.find("iframe", src=lambda s: s and "challenges.cloudflare.com" in s):
+            return True
+        return bool(soup.find(attrs={"data-testid": "challenge-widget-container"}))
+
+
+    rows = "".join(f'<tr><td><a href="/mv/{i}.html" title="电影{i}">电影{i} 1080p</a></td>'
+                   f'<td>{i % 30 + 1}.{i % 9}GB</td><td><img src="/img/{i}.jpg"></td></tr>' for i in range(2000))
+    pages = {
+        "challenge": '<!DOCTYPE html><html lang="en-US"><head><title>Just a moment...</title>'
+                     '<meta http-equiv="refresh" content="390"><script src="/cdn-cgi/challenge-platform/h/b/orchestrate/'
+                     'chl_page/v1?ray=8a"></script></head><body><div class="main-wrapper" role="main">'
+                     '<div class="main-content"><noscript>Enable JavaScript and cookies to continue</noscript>'
+                     '</div></div></body></html>',
+        "turnstile": '<html><head><title>搜索结果</title></head><body><form><div class="cf-turnstile">'
+                     '<div data-testid="challenge-widget-container"><iframe src="https://challenges.cloudflare.com/'
+                     'cdn-cgi/challenge-platform/turnstile/if/ov2/av0/rcv0/0/abc"></iframe></div>'
+                     '<input type="hidden" name="cf-turnstile-response"></div></form>' + rows + '</body></html>',
+        "normal": '<html><head><title>电影天堂 - 最新电影</title><link rel="stylesheet" href="/a.css"></head>'
+                  '<body><table>' + rows + '</table></body></html>',
+    }
+    for path in sys.argv[1:]:
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            pages[path] = f.read()
+
+    for name, html in pages.items():
+        expected = is_cloud_flare_verification_page_bs4(html)
+        assert is_cloud_flare_verification_page(html) == expected, name
+        assert is_cloud_flare_verification_page(html.encode("utf-8")) == expected, name
+        number = 20
+        bs4_time = timeit.timeit(lambda: is_cloud_flare_verification_page_bs4(html), number=number) / number
+        fast_time = timeit.timeit(lambda: is_cloud_flare_verification_page(html), number=number * 50) / number / 50
+        print(f"{name:<12} {len(html) / 1024:>8.1f}KB  验证页={expected!s:<5}  "
+              f"BeautifulSoup {bs4_time * 1000:>8.3f}ms  特征查找 {fast_time * 1000:>8.4f}ms  "
+              f"提升 {bs4_time / fast_time:>8.0f}x")
@@ -5,9 +5,13 @@ import requests
 from typing import Optional, Dict, Tuple
 from requests.models import Response
 from requests.structures import CaseInsensitiveDict
+import asyncio
 import time
 import random
 from app.log import logger
+from app.plugins.extendspider.utils.clearance_store import ClearanceStore
+from app.plugins.extendspider.utils.flaresolverr_pool import FlareSolverrSessionPool
+from app.plugins.extendspider.utils.http_client import HttpClient
 
 class ProxyBase(ABC):
     """代理基类"""
@@ -19,6 +23,8 @@ class ProxyBase(ABC):
         """
         self._min_interval, self._max_interval = request_interval
         self._last_request_time = 0
+        # 共享连接池的 HTTP 客户端
+        self._client = HttpClient()
 
     def _wait_for_interval(self):
         """等待请求间隔"""
@@ -46,13 +52,19 @@ class ProxyBase(ABC):
         """发送请求"""
         pass
 
+    async def arequest(self, method: str, url: str, **kwargs) -> requests.Response:
+        """异步发送请求，默认在线程中执行同步请求"""
+        return await asyncio.to_thread(self.request, method, url, **kwargs)
+
 
 class DirectProxy(ProxyBase):
     """直接请求代理"""
 
-    def __init__(self, headers: Dict[str, str] = None, request_interval: Tuple[float, float] = (0, 0)):
+    def __init__(self, headers: Dict[str, str] = None, request_interval: Tuple[float, float] = (0, 0),
+                 egress: str = "direct"):
         super().__init__(request_interval)
         self._headers = headers or {}
+        self._egress = egress
 
     def get_headers(self) -> Dict[str, str]:
         return self._headers
@@ -62,19 +74,61 @@ class DirectProxy(ProxyBase):
 
     def request(self, method: str, url: str, **kwargs) -> requests.Response:
         self._wait_for_interval()
-        headers = {**self._headers, **kwargs.get('headers', {})}
-        return requests.request(method, url, headers=headers, **kwargs)
+        headers = {**self._headers, **(kwargs.pop('headers', None) or {})}
+        ua = headers.get("User-Agent")
+        # 带上已保存的 clearance
+        stored = {c["name"]: c["value"] for c in ClearanceStore().get_cookies(url, ua, self._egress)}
+        if stored:
+            kwargs['cookies'] = {**stored, **(kwargs.get('cookies') or {})}
+        response = self._client.request(method, url, headers=headers, **kwargs)
+        self._update_clearance(url, ua, bool(stored), response)
+        return response
+
+    async def arequest(self, method: str, url: str, **kwargs) -> requests.Response:
+        headers = {**self._headers, **(kwargs.pop('headers', None) or {})}
+        ua = headers.get("User-Agent")
+        stored = {c["name"]: c["value"] for c in ClearanceStore().get_cookies(url, ua, self._egress)}
+        if stored:
+            kwargs['cookies'] = {**stored, **(kwargs.get('cookies') or {})}
+        response = await self._client.arequest(method, url, headers=headers, **kwargs)
+        self._update_clearance(url, ua, bool(stored), response)
+        return response
+
+    def _update_clearance(self, url: str, ua: str, used_stored: bool, response: requests.Response):
+        """响应带回新的 clearance 时保存，已保存的 clearance 失效时删除"""
+        store = ClearanceStore()
+        if ClearanceStore.CLEARANCE_COOKIE in response.cookies:
+            store.put_cookiejar(url, ua, self._egress, response.cookies)
+        elif used_stored and response.headers.get("cf-mitigated") == "challenge":
+            store.invalidate(url, ua, self._egress)
 
 
 class FlareSolverrProxy(ProxyBase):
-    """FlareSolverr代理"""
+    """
+    FlareSolverr代理
+
+    请求通过会话池分配到该域名下空闲的 FlareSolverr 会话，多个请求可以并行。
+    cookies_only 模式下 FlareSolverr 只负责验证并返回 cookies，页面由本地直接请求，
+    clearance 有效期内不再经过 FlareSolverr。
+    """
 
     def __init__(self, flaresolverr_url: str, session_id: str = None, headers: Dict[str, str] = None,
-                 request_interval: Tuple[float, float] = (0, 0)):
+                 request_interval: Tuple[float, float] = (0, 0), egress: str = "direct", pool_size: int = 2,
+                 cookies_only: bool = False):
+        """
+        :param flaresolverr_url: FlareSolverr 地址
+        :param session_id: 会话 ID 前缀
+        :param pool_size: 每个域名最多保持的会话数
+        :param cookies_only: 只从 FlareSolverr 获取 cookies，页面直接请求
+        """
         super().__init__(request_interval)
-        self._flaresolverr_url = flaresolverr_url
+        self._flaresolverr_url = flaresolverr_url.rstrip('/')
         self._headers = headers or {}
-        self._session_id = session_id
+        self._session_id = session_id or "moviepilot"
+        self._egress = egress
+        self._pool_size = pool_size
+        self._cookies_only = cookies_only
+        self._pool = FlareSolverrSessionPool()
 
     def get_headers(self) -> Dict[str, str]:
         return self._headers
@@ -82,38 +136,6 @@ class FlareSolverrProxy(ProxyBase):
     def get_proxy(self) -> Optional[Dict[str, str]]:
         return None
 
-    def _create_session(self) -> None:
-        """创建FlareSolverr会话"""
-        self._wait_for_interval()
-        response = requests.post(
-            f"{self._flaresolverr_url}/v1",
-            json={
-                "cmd": "sessions.create",
-                "session": self._session_id if self._session_id else "moviepilot"
-            }
-        )
-        if response.status_code == 200:
-            self._session_id = response.json().get("session")
-
-    def _destroy_session(self) -> None:
-        """销毁FlareSolverr会话"""
-        if not self._session_id:
-            return
-
-        self._wait_for_interval()
-        try:
-            response = requests.post(
-                f"{self._flaresolverr_url}/v1",
-                json={
-                    "cmd": "sessions.destroy",
-                    "session": self._session_id
-                }
-            )
-            if response.status_code == 200:
-                self._session_id = None
-        except Exception as e:
-            logger.error(f"销毁会话失败: {str(e)}")
-
     @staticmethod
     def _parse_cookies(cookies_list: list) -> CookieJar:
         """解析cookie列表为CookieJar对象"""
@@ -149,18 +171,20 @@ class FlareSolverrProxy(ProxyBase):
                 logger.error(f"解析cookie失败: {str(e)}")
         return cookie_jar
 
-    def _make_request(self, method: str, url: str, **kwargs) -> requests.Response:
+    def _make_request(self, method: str, url: str, cookies_only: bool = False, **kwargs) -> requests.Response:
         """发送请求到FlareSolverr"""
-        if not self._session_id:
-            self._create_session()
-
         data = kwargs.get('json', {}) or kwargs.get('data', {})
 
         request_data = {
             "cmd": "request.get" if method.upper() == "GET" else "request.post",
-            "session": self._session_id,
             "url": url,
         }
+        if cookies_only:
+            request_data["returnOnlyCookies"] = True
+        # 已有未过期的 clearance 时交给 FlareSolverr，避免重复验证
+        stored = ClearanceStore().find(url, self._egress)
+        if stored:
+            request_data["cookies"] = [{"name": c["name"], "value": c["value"]} for c in stored["cookies"]]
 
         # 添加请求体数据
         if method.upper() == "POST":
@@ -169,47 +193,84 @@ class FlareSolverrProxy(ProxyBase):
             else:
                 request_data["postData"] = str(data)
 
-        response = requests.post(
-            f"{self._flaresolverr_url}/v1",
-            json=request_data
-        )
-
-        if response.status_code == 200:
-            result = response.json()
-            if result.get("status") == "ok":
-                solution = result.get("solution", {})
-                # 创建一个新的Response对象
-                new_response = Response()
-                new_response.status_code = solution.get("status", 200)
-                new_response._content = solution.get("response", "").encode('utf-8')
-                new_response.encoding = 'utf-8'
-                new_response.headers = CaseInsensitiveDict(solution.get("headers", {}))
-                new_response.user_agent = solution.get("userAgent")
-                # 处理cookies
-                cookies_list = solution.get("cookies", [])
-                new_response.cookies = self._parse_cookies(cookies_list)
-
-                new_response.url = url
-                return new_response
+        with self._pool.session(self._flaresolverr_url, url, size=self._pool_size,
+                                prefix=self._session_id) as session:
+            request_data["session"] = session.session_id
+            try:
+                response = self._client.post(
+                    f"{self._flaresolverr_url}/v1",
+                    timeout=self._pool.REQUEST_TIMEOUT,
+                    json=request_data
+                )
+            except Exception:
+                self._pool.report(session, False)
+                raise
+            result = response.json() if response.status_code == 200 else {}
+            self._pool.report(session, result.get("status") == "ok")
+
+        if result.get("status") == "ok":
+            solution = result.get("solution", {})
+            # 创建一个新的Response对象
+            new_response = Response()
+            new_response.status_code = solution.get("status", 200)
+            new_response._content = (solution.get("response") or "").encode('utf-8')
+            new_response.encoding = 'utf-8'
+            new_response.headers = CaseInsensitiveDict(solution.get("headers") or {})
+            new_response.user_agent = solution.get("userAgent")
+            # 处理cookies
+            cookies_list = solution.get("cookies", [])
+            new_response.cookies = self._parse_cookies(cookies_list)
+            ClearanceStore().put(url, new_response.user_agent, self._egress, cookies_list)
+
+            new_response.url = url
+            return new_response
 
         return response
 
+    def _request_with_clearance(self, method: str, url: str, **kwargs) -> Optional[requests.Response]:
+        """
+        使用已保存的 clearance 直接请求，没有 clearance 或遇到验证时返回 None
+        """
+        entry = ClearanceStore().find(url, self._egress)
+        if not entry:
+            return None
+        headers = {**self._headers, **(kwargs.pop('headers', None) or {}), "User-Agent": entry["ua"] or self._headers.get("User-Agent")}
+        cookies = {**{c["name"]: c["value"] for c in entry["cookies"]}, **(kwargs.pop('cookies', None) or {})}
+        response = self._client.request(method, url, headers=headers, cookies=cookies, **kwargs)
+        if response.status_code in (403, 503) and response.headers.get("cf-mitigated") == "challenge":
+            ClearanceStore().invalidate(url, entry["ua"], self._egress)
+            return None
+        response.user_agent = entry["ua"]
+        return response
+
+    def _request_cookies_only(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        FlareSolverr 只负责验证，页面直接请求
+        """
+        response = self._request_with_clearance(method, url, **dict(kwargs))
+        if response is not None:
+            return response
+        self._wait_for_interval()
+        self._make_request("GET", url, cookies_only=True)
+        response = self._request_with_clearance(method, url, **dict(kwargs))
+        if response is not None:
+            return response
+        # 直接请求仍无法通过验证（如 FlareSolverr 出口与本地不同），改由 FlareSolverr 返回页面
+        logger.warning(f"使用 FlareSolverr cookies 直接请求失败，改由 FlareSolverr 请求: {url}")
+        return self._make_request(method, url, **kwargs)
+
     def request(self, method: str, url: str, **kwargs) -> requests.Response:
         """发送请求"""
+        if self._cookies_only:
+            return self._request_cookies_only(method, url, **kwargs)
         try:
             self._wait_for_interval()
             return self._make_request(method, url, **kwargs)
         except Exception as e:
+            # 失败的会话已计入健康统计，重试时会分配到其它会话或新会话
             logger.error(f"请求失败: {str(e)}")
-            # 如果请求失败，尝试重新创建会话
-            self._destroy_session()
-            self._create_session()
             return self._make_request(method, url, **kwargs)
 
-    def __del__(self):
-        """析构函数，确保会话被销毁"""
-        self._destroy_session()
-
 
 class ProxyFactory:
     """代理工厂类"""
@@ -0,0 +1,233 @@
+import copy
+import re
+import threading
+from typing import Iterable, Optional, Dict, Any, List
+
+from app.log import logger
+
+
+class ResourceBlockPolicy:
+    """
+    浏览器资源拦截策略
+
+    爬虫只需要页面中的链接，图片、字体、样式、视频封面和广告统计脚本都不必下载。
+    按资源类型和 URL 关键字拦截，Cloudflare 验证相关的请求始终放行。
+    Playwright 通过 context.route 生效，DrissionPage 通过 CDP Fetch 拦截生效。
+    拦截发生在请求阶段，带 Content-Length 的请求按实际大小统计，其余按资源类型估算，两者分开记录。
+    """
+
+    # 默认拦截的资源类型（Playwright resource_type 命名）
+    DEFAULT_BLOCK_TYPES = ("image", "media", "font", "stylesheet")
+    # 默认拦截的 URL 关键字（广告、统计）
+    DEFAULT_BLOCK_PATTERNS = (
+        "googlesyndication.com", "googletagmanager.com", "google-analytics.com", "doubleclick.net",
+        "adservice.google", "hm.baidu.com", "cnzz.com", "51.la", "umeng.com", "clarity.ms",
+    )
+    # 始终放行的 URL 关键字（Cloudflare 验证）
+    ALLOW_PATTERNS = ("challenges.cloudflare.com", "/cdn-cgi/", "turnstile")
+    # 被拦截请求未带 Content-Length 时使用的平均大小估算（字节）
+    ESTIMATED_SIZES = {
+        "image": 40 * 1024,
+        "media": 512 * 1024,
+        "font": 60 * 1024,
+        "stylesheet": 30 * 1024,
+        "script": 40 * 1024,
+    }
+    DEFAULT_ESTIMATED_SIZE = 10 * 1024
+
+    # CDP 资源类型与 Playwright 资源类型的对应关系
+    _CDP_TYPES = {
+        "Image": "image",
+        "Media": "media",
+        "Font": "font",
+        "Stylesheet": "stylesheet",
+        "Script": "script",
+        "Document": "document",
+        "XHR": "xhr",
+        "Fetch": "fetch",
+        "WebSocket": "websocket",
+        "Manifest": "manifest",
+        "Other": "other",
+    }
+
+    def __init__(self, block_types: Optional[Iterable[str]] = None, block_patterns: Optional[Iterable[str]] = None,
+                 allow_patterns: Optional[Iterable[str]] = None):
+        """
+        :param block_types: 拦截的资源类型
+        :param block_patterns: 拦截的 URL 关键字
+        :param allow_patterns: 额外放行的 URL 关键字
+        """
+        self.block_types = frozenset(t.lower() for t in (block_types if block_types is not None
+                                                          else self.DEFAULT_BLOCK_TYPES))
+        self.block_patterns = tuple(block_patterns if block_patterns is not None else self.DEFAULT_BLOCK_PATTERNS)
+        self.allow_patterns = self.ALLOW_PATTERNS + tuple(allow_patterns or ())
+        self._block_re = self._compile(self.block_patterns)
+        self._allow_re = self._compile(self.allow_patterns)
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Any] = self._new_stats()
+        # scope() 创建的策略同时记入上级策略
+        self._parent: Optional["ResourceBlockPolicy"] = None
+
+    @staticmethod
+    def _new_stats() -> Dict[str, Any]:
+        # bytes 为按 Content-Length 统计的字节数，estimated_bytes 为按 ESTIMATED_SIZES 估算的字节数
+        return {"requests": 0, "bytes": 0, "estimated_bytes": 0, "estimated_requests": 0, "types": {}}
+
+    @classmethod
+    def from_config(cls, config: dict) -> Optional["ResourceBlockPolicy"]:
+        """
+        从爬虫配置创建策略，block_resources 为 False 时返回 None
+        """
+        if not config.get("block_resources", True):
+            return None
+        return cls(block_types=config.get("block_resource_types"),
+                   block_patterns=config.get("block_url_patterns"))
+
+    @staticmethod
+    def _compile(patterns: Iterable[str]) -> Optional[re.Pattern]:
+        patterns = [re.escape(p) for p in patterns if p]
+        if not patterns:
+            return None
+        return re.compile("|".join(patterns), re.IGNORECASE)
+
+    def should_block(self, url: str, resource_type: str) -> bool:
+        """
+        判断请求是否需要拦截
+        :param url: 请求地址
+        :param resource_type: 资源类型
+        """
+        if not url or url.startswith("data:"):
+            return False
+        if self._allow_re and self._allow_re.search(url):
+            return False
+        if resource_type in ("document", "xhr", "fetch"):
+            # 页面本身和接口数据不拦截，只按 URL 关键字拦截广告
+            return bool(self._block_re and resource_type != "document" and self._block_re.search(url))
+        if resource_type in self.block_types:
+            return True
+        return bool(self._block_re and self._block_re.search(url))
+
+    def scope(self) -> "ResourceBlockPolicy":
+        """
+        创建使用相同规则、单独统计的策略，拦截同时记入本策略的累计统计
+        用于单次搜索：并发搜索各自使用自己的 scope，统计互不混淆
+        """
+        scoped = copy.copy(self)
+        scoped._lock = threading.Lock()
+        scoped._stats = self._new_stats()
+        scoped._parent = self
+        return scoped
+
+    @staticmethod
+    def content_length(headers: Any) -> Optional[int]:
+        """
+        从请求头中取 Content-Length，支持 dict 和 CDP 的 [{"name": .., "value": ..}] 格式
+        """
+        if not headers:
+            return None
+        if isinstance(headers, dict):
+            items = headers.items()
+        else:
+            items = ((h.get("name"), h.get("value")) for h in headers if isinstance(h, dict))
+        for name, value in items:
+            if name and name.lower() == "content-length":
+                try:
+                    size = int(value)
+                except (TypeError, ValueError):
+                    return None
+                return size if size >= 0 else None
+        return None
+
+    def record(self, resource_type: str, size: Optional[int] = None):
+        """
+        记录一次拦截
+        :param resource_type: 资源类型
+        :param size: 被拦截请求的 Content-Length，未知时按资源类型估算
+        """
+        with self._lock:
+            self._stats["requests"] += 1
+            if size is not None:
+                self._stats["bytes"] += size
+            else:
+                self._stats["estimated_requests"] += 1
+                self._stats["estimated_bytes"] += self.ESTIMATED_SIZES.get(resource_type, self.DEFAULT_ESTIMATED_SIZE)
+            self._stats["types"][resource_type] = self._stats["types"].get(resource_type, 0) + 1
+        if self._parent:
+            self._parent.record(resource_type, size)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        拦截统计（本策略创建以来的累计值）
+        """
+        with self._lock:
+            return {**self._stats, "types": dict(self._stats["types"])}
+
+    # Playwright
+    def playwright_handler(self):
+        """
+        生成 Playwright route 处理函数，用法：context.route("**/*", handler)
+        """
+
+        def _handler(route):
+            request = route.request
+            if self.should_block(request.url, request.resource_type):
+                self.record(request.resource_type, self.content_length(request.headers))
+                route.abort("blockedbyclient")
+            else:
+                route.continue_()
+
+        return _handler
+
+    # DrissionPage
+    def cdp_patterns(self) -> List[dict]:
+        """
+        生成 CDP Fetch.enable 的拦截规则，只暂停可能被拦截的请求，其余请求不经过回调
+        """
+        patterns = [{"urlPattern": "*", "resourceType": cdp_type, "requestStage": "Request"}
+                    for cdp_type, pw_type in self._CDP_TYPES.items() if pw_type in self.block_types]
+        patterns.extend({"urlPattern": f"*{p}*", "requestStage": "Request"} for p in self.block_patterns)
+        return patterns
+
+    def enable_cdp(self, tab) -> bool:
+        """
+        在 DrissionPage 标签页上开启拦截
+        :param tab: ChromiumTab/MixTab
+        """
+        patterns = self.cdp_patterns()
+        if not patterns:
+            return False
+
+        def _on_paused(**kwargs):
+            request_id = kwargs.get("requestId")
+            request = kwargs.get("request", {})
+            url = request.get("url", "")
+            resource_type = self._CDP_TYPES.get(kwargs.get("resourceType"), "other")
+            try:
+                if self.should_block(url, resource_type):
+                    # 在响应阶段暂停时带有响应头，否则只有请求头
+                    self.record(resource_type,
+                                self.content_length(kwargs.get("responseHeaders") or request.get("headers")))
+                    tab.run_cdp("Fetch.failRequest", requestId=request_id, errorReason="BlockedByClient")
+                else:
+                    tab.run_cdp("Fetch.continueRequest", requestId=request_id)
+            except Exception as e:
+                logger.debug(f"处理拦截请求失败 {url}: {str(e)}")
+
+        try:
+            tab.driver.set_callback("Fetch.requestPaused", _on_paused)
+            tab.run_cdp("Fetch.enable", patterns=patterns)
+            return True
+        except Exception as e:
+            logger.warning(f"开启资源拦截失败: {str(e)}")
+            return False
+
+    @staticmethod
+    def disable_cdp(tab):
+        """
+        关闭 DrissionPage 标签页上的拦截
+        """
+        try:
+            tab.run_cdp("Fetch.disable")
+            tab.driver.set_callback("Fetch.requestPaused", None)
+        except Exception as e:
+            logger.debug(f"关闭资源拦截失败: {str(e)}")
@@ -176,6 +176,7 @@ class SpiderHelper(metaclass=SingletonClass):
                 "url": spider.spider_url,
                 "enable": config.get("spider_enable", False),
                 "desc": config.get("spider_desc", ""),
-                "web_status": spider.spider_web_status
+                "web_status": spider.spider_web_status,
+                "circuit": spider.circuit_breaker.info()
             })
         return status_list
@@ -39,7 +39,7 @@ class TokenWorker(threading.Thread):
         for attempt in range(1, self.max_retries + 1):
             try:
                 with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
-                    future = executor.submit(self.spider.drission_browser.getTurnstileToken, tab)
+                    future = executor.submit(self.spider.drission_browser.solve_challenge, tab)
                     ok = future.result(timeout=self.token_timeout)  # 超时保护
                     if ok:
                         return True
@@ -69,8 +69,9 @@ class TokenWorker(threading.Thread):
 
             tab = None
             try:
-                # 打开新页签（单线程，无争抢）
-                tab = self.spider.browser.new_tab(url)
+                # 从标签页池借出页签（单线程，无争抢）
+                tab = self.spider.drission_browser.checkout_tab(resource_policy=self.spider.resource_policy)
+                tab.get(url)
                 tab.set.when_download_file_exists('skip')
 
                 # 可选：等待页面稳定（避免 ContextLostError）
@@ -121,7 +122,7 @@ class TokenWorker(threading.Thread):
             finally:
                 try:
                     if tab:
-                        tab.close()
+                        self.spider.drission_browser.checkin_tab(tab)
                 except Exception:
                     pass
                 self.queue.task_done()
@@ -3,9 +3,9 @@ import urllib.parse
 from typing import Tuple, Optional
 from urllib.parse import unquote, parse_qs, urlparse
 
-import requests
 
 from app.core.config import settings
+from app.plugins.extendspider.utils.http_client import HttpClient
 from playwright.sync_api import  Page
 from cf_clearance import sync_cf_retry, sync_stealth
 
@@ -107,7 +107,7 @@ def get_magnet_info_from_url(magnet_url: str):
         return None
     if magnet_url.startswith("magnet:"):
         logger.debug(f"正在获取种子信息: {magnet_url}")
-        res = requests.get(whats_link, params={"url": magnet_url}, headers={"User-Agent": settings.USER_AGENT})
+        res = HttpClient().get(whats_link, params={"url": magnet_url}, headers={"User-Agent": settings.USER_AGENT})
         if res.status_code == 200:
             return res.json()
     return None
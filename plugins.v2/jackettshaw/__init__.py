@@ -1,24 +1,40 @@
 # _*_ coding: utf-8 _*_
 from typing import List, Dict, Any, Tuple, Optional
 from datetime import datetime, timedelta
-import xml.dom.minidom
+import re
+import time
 from urllib.parse import urlencode, quote_plus
 
-import requests
 import pytz
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
-from cachetools import cached, TTLCache
+from cachetools import cached
 
 from app.log import logger
 from app.plugins import _PluginBase
 from app.core.config import settings
 from app.schemas import SearchContext, MediaType
-from app.utils.dom import DomUtils
 from app.utils.http import RequestUtils
-from app.utils.string import StringUtils
 from app.core.event import EventManager
 from app.schemas.types import EventType
+from app.plugins.jackettshaw.aggregate import AggregateCache
+from app.plugins.jackettshaw.caps import CapsCache, build_search_params, media_ids, parse_caps
+from app.plugins.jackettshaw.indexer_health import IndexerHealth
+from app.plugins.jackettshaw.jackett_client import JackettClient
+from app.plugins.jackettshaw.search_cache import PersistentTLRUCache, SearchKeyNormalizer, SingleFlight, \
+    single_flight
+from app.plugins.jackettshaw.torznab import parse_torznab_response, split_by_indexer
+
+
+# 检索缓存键归一化，关键词写法不同或上下文无关字段不同的检索共用缓存
+_search_keys = SearchKeyNormalizer()
+
+
+def _search_key(self, indexer, keyword, page, search_context: Optional[SearchContext] = None):
+    """
+    检索缓存和并发合并共用的键
+    """
+    return _search_keys.key(indexer.get("id"), keyword, page, search_context)
 
 
 class JackettShaw(_PluginBase):
@@ -53,6 +69,22 @@ class JackettShaw(_PluginBase):
     _password = ""
     _onlyonce = False
     _indexers = []
+    # 单个索引器最多解析的结果数，0 为不限制
+    _max_results = 0
+    # 聚合检索：一次 all 请求检索全部索引器，结果按索引器拆分后短时间缓存
+    _aggregate = False
+    _aggregate_cache = AggregateCache()
+    # 各索引器的 caps，用于判断能否按 ID 检索
+    _caps_cache = CapsCache()
+    # 检索结果缓存，持久化到插件数据目录
+    _search_cache = PersistentTLRUCache(settings.PLUGIN_DATA_PATH / "jackettshaw" / "search_cache.db",
+                                        ttl=1 * 3600, maxsize=200)
+    # 相同检索并发时只执行一次
+    _search_flight = SingleFlight()
+    # 各索引器的耗时和熔断状态，聚合检索记为 all
+    _health = IndexerHealth()
+    # Jackett 管理接口客户端，复用登录 cookie 和索引器列表
+    _client: Optional[JackettClient] = None
     # 仅用于标识，避免重复注册
     jackett_domain = "jackett_extend.shaw"
 
@@ -72,12 +104,24 @@ class JackettShaw(_PluginBase):
             self._password = config.get("password")
             self._enabled = config.get("enabled")
             self._proxy = config.get("proxy")
+            self._aggregate = config.get("aggregate", False)
             self._onlyonce = config.get("onlyonce")
             self._cron = config.get("cron") or "0 0 */24 * *"
+            try:
+                self._max_results = max(int(config.get("max_results") or 0), 0)
+            except (TypeError, ValueError):
+                self._max_results = 0
         if not self._enabled:
             return
         # 停止现有任务
         self.stop_service()
+        if self._host and self._api_key:
+            self._client = JackettClient(self._host, self._api_key, self._password,
+                                         user_agent=settings.USER_AGENT,
+                                         proxies=settings.PROXY if self._proxy else None)
+        count = self._search_cache.warm_up()
+        if count:
+            logger.info(f"【{self.plugin_name}】已载入 {count} 条检索缓存")
         # 启动定时任务 & 立即运行一次
         self._scheduler = BackgroundScheduler(timezone=settings.TZ)
         if self._cron:
@@ -106,7 +150,12 @@ class JackettShaw(_PluginBase):
         """
         if not self._api_key or not self._host:
             return False
-        self._indexers = self.get_indexers()
+        fingerprint = self._client.fingerprint if self._client else None
+        self._indexers = self.get_indexers(refresh=True)
+        # 索引器有增减时通知重新加载
+        if fingerprint and self._client and self._client.fingerprint != fingerprint:
+            logger.info(f"【{self.plugin_name}】Jackett 索引器有变化，重新加载")
+            EventManager().send_event(EventType.SpiderPluginsRload, data={"plugin_id": self.plugin_name})
         return True if isinstance(self._indexers, list) and len(self._indexers) > 0 else False
 
     def get_state(self) -> bool:
@@ -122,6 +171,10 @@ class JackettShaw(_PluginBase):
                 if self._scheduler.running:
                     self._scheduler.shutdown()
                 self._scheduler = None
+            if self._client:
+                self._client.close()
+                self._client = None
+            self._search_cache.close()
         except Exception as e:
             logger.error(f"【{self.plugin_name}】停止插件错误: {str(e)}")
 
@@ -135,49 +188,24 @@ class JackettShaw(_PluginBase):
             "host": self._host,
             "api_key": self._api_key,
             "password": self._password,
+            "max_results": self._max_results,
+            "aggregate": self._aggregate,
         })
 
-    def get_indexers(self):
+    def get_indexers(self, refresh: bool = False):
         """
         获取配置的 Jackett Indexer 信息
+        :param refresh: 忽略缓存有效期，立即条件刷新
         :return: Indexer 列表，每项包含 id、name、url、domain、public、proxy、parser
         """
-        headers = {
-            "Content-Type": "application/x-www-form-urlencoded; charset=UTF-8",
-            "User-Agent": settings.USER_AGENT,
-            "X-Api-Key": self._api_key,
-            "Accept": "application/json, text/javascript, */*; q=0.01"
-        }
-
-        cookie = None
-        session = requests.session()
-
+        if not self._client:
+            return []
         try:
-            login_url = f"{self._host.rstrip('/')}/UI/Dashboard"
-            login_data = {"password": self._password}
-            login_params = {"password": self._password}
-            login_res = RequestUtils(headers=headers, session=session).post_res(
-                url=login_url,
-                data=login_data,
-                params=login_params,
-                proxies=settings.PROXY if self._proxy else None
-            )
-            if login_res and session.cookies:
-                cookie = session.cookies.get_dict()
-            else:
-                logger.warning(f"【{self.plugin_name}】Jackett 登录失败，无法获取 cookie")
-
-            indexer_query_url = f"{self._host.rstrip('/')}/api/v2.0/indexers?configured=true"
-            ret = RequestUtils(headers=headers, cookies=cookie).get_res(
-                indexer_query_url,
-                proxies=settings.PROXY if self._proxy else None
-            )
-
-            if not ret or not ret.json():
+            raw_indexers = self._client.get_indexers(refresh=refresh)
+            if not raw_indexers:
                 logger.warning(f"【{self.plugin_name}】未获取到任何 indexer 配置")
                 return []
 
-            raw_indexers = ret.json()
             indexers = []
             for v in raw_indexers:
                 indexer_id = v.get("id")
@@ -201,10 +229,8 @@ class JackettShaw(_PluginBase):
             logger.error(f"【{self.plugin_name}】获取 Jackett indexers 失败：{str(e)}")
             return []
 
-    @cached(cache=TTLCache(maxsize=200, ttl=1 * 3600),
-            key=lambda self, indexer, keyword, page, search_context=None: (indexer.get("id"), keyword, page,
-                                                                           hash(
-                                                                               f"{search_context.search_type}{search_context.search_sub_id}{search_context.media_info.title} ") if search_context else None))
+    @cached(cache=_search_cache, key=_search_key)
+    @single_flight(_search_flight, key=_search_key)
     def search(self, indexer, keyword, page, search_context: Optional[SearchContext] = None):
         """
         根据关键字多线程检索
@@ -215,18 +241,10 @@ class JackettShaw(_PluginBase):
         categories = self.get_cat(search_context=search_context)
         logger.info(f"【{self.plugin_name}】开始检索Indexer：{indexer.get("name")} 分类：{categories}...")
 
-        # 构造查询参数
-        params = {
-            "apikey": self._api_key,
-            "t": "search",
-            "q": keyword,
-            "cat": ",".join(map(str, categories))
-        }
-        # 拼接完整 URL
-        query_string = urlencode(params, doseq=True, quote_via=quote_plus)
-        api_url = f"{indexer.get("url").rstrip("/")}?{query_string}"
-
-        result_array = self.__parse_torznab_xml(api_url)
+        result_array, by_id = self.__search_indexer(indexer, keyword, categories, search_context)
+        if not result_array and by_id:
+            logger.info(f"【{self.plugin_name}】{indexer.get('name')} 按 ID 未检索到数据，改用关键词检索")
+            result_array, _ = self.__search_indexer(indexer, keyword, categories)
 
         if len(result_array) == 0:
             logger.warn(f"【{self.plugin_name}】{indexer.get("name")} 未检索到数据")
@@ -258,93 +276,140 @@ class JackettShaw(_PluginBase):
         """
         pass
 
-    def __parse_torznab_xml(self, url):
+    def __build_query(self, params: Dict[str, str]) -> str:
         """
-        从torznab xml中解析种子信息
-        :param url: URL地址
-        :return: 解析出来的种子信息列表
+        构造 torznab 查询参数
+        """
+        return urlencode({"apikey": self._api_key, **params}, doseq=True, quote_via=quote_plus)
+
+    def __search_params(self, url: str, keyword: str, categories: List[int],
+                        search_context: Optional[SearchContext] = None) -> Dict[str, str]:
+        """
+        根据索引器 caps 构造检索参数，支持时按 ID 检索
+        """
+        modes = None
+        if media_ids(search_context):
+            modes = self._caps_cache.get(url, lambda: self.__fetch_caps(url))
+        return build_search_params(modes, keyword, categories, search_context)
+
+    def __fetch_caps(self, url: str):
+        """
+        请求 t=caps 获取索引器支持的检索模式
         """
-        if not url:
-            return []
         try:
-            ret = RequestUtils(timeout=60).get_res(url,
+            ret = RequestUtils(timeout=30).get_res(f"{url.rstrip('/')}?{self.__build_query({'t': 'caps'})}",
                                                    proxies=settings.PROXY if self._proxy else None)
+            if not ret or not ret.ok:
+                logger.warning(f"【{self.plugin_name}】获取 caps 失败：{url}")
+                return None
+            return parse_caps(ret.content)
+        except Exception as e:
+            logger.error(f"【{self.plugin_name}】解析 caps 失败：{url} {str(e)}")
+            return None
+
+    def __search_indexer(self, indexer: dict, keyword: str, categories: List[int],
+                         search_context: Optional[SearchContext] = None) -> Tuple[List[dict], bool]:
+        """
+        检索单个索引器，开启聚合检索时优先从聚合结果中取
+        :return: 结果列表，是否按 ID 检索
+        """
+        if self._aggregate:
+            params = self.__search_params(self.__aggregate_url(), keyword, categories, search_context)
+            result_array = self.__search_from_aggregate(indexer, params)
+            if result_array is not None:
+                return result_array, params["t"] != "search"
+        url = indexer.get('url').rstrip('/')
+        match = re.search(r"/indexers/([^/]+)/results", url)
+        params = self.__search_params(url, keyword, categories, search_context)
+        return self.__parse_torznab_xml(f"{url}?{self.__build_query(params)}",
+                                        match.group(1) if match else url), params["t"] != "search"
+
+    def __aggregate_url(self) -> str:
+        return f"{self._host}/api/v2.0/indexers/all/results/torznab/"
+
+    def __search_from_aggregate(self, indexer: dict, params: Dict[str, str]) -> Optional[List[dict]]:
+        """
+        从聚合检索结果中取该索引器的结果，相同检索参数只发起一次聚合检索
+        :return: 聚合检索失败时返回 None，由调用方单独检索
+        """
+        match = re.search(r"/indexers/([^/]+)/results", indexer.get("url", ""))
+        if not match:
+            return None
+        grouped = self._aggregate_cache.get(tuple(sorted(params.items())),
+                                            lambda: self.__aggregate_search(params))
+        if grouped is None:
+            return None
+        results = grouped.get(match.group(1), [])
+        if self._max_results:
+            results = results[:self._max_results]
+        # 缓存中的结果由多个调用共用，返回副本
+        return [dict(result) for result in results]
+
+    def __aggregate_search(self, params: Dict[str, str]) -> Optional[Dict[str, List[dict]]]:
+        """
+        通过 all 端点一次检索全部索引器
+        :return: {索引器ID: 结果列表}，失败返回 None
+        """
+        if not self._health.allow("all"):
+            logger.warning(f"【{self.plugin_name}】聚合检索已熔断，改为单独检索")
+            return None
+        api_url = f"{self.__aggregate_url()}?{self.__build_query(params)}"
+        logger.info(f"【{self.plugin_name}】聚合检索：{params}")
+        start = time.time()
+        ret = self.__request_torznab(api_url, timeout=self._health.timeout("all"))
+        if not ret:
+            self._health.record("all", False, error="请求失败")
+            return None
+        try:
+            grouped = split_by_indexer(parse_torznab_response(ret, with_indexer=True))
+        except Exception as e:
+            self._health.record("all", False, error=str(e))
+            logger.error(f"【{self.plugin_name}】聚合检索解析失败：{str(e)}")
+            return None
+        self._health.record("all", True, time.time() - start)
+        logger.info(f"【{self.plugin_name}】聚合检索 {params.get('q') or params.get('t')} 返回数据："
+                    f"{sum(len(v) for v in grouped.values())}，来自 {len(grouped)} 个索引器")
+        return grouped
+
+    def __request_torznab(self, url, timeout: float = 60):
+        """
+        请求 torznab 接口，不读取响应内容
+        """
+        if not url:
+            return None
+        try:
+            ret = RequestUtils(timeout=timeout).get_res(url,
+                                                   proxies=settings.PROXY if self._proxy else None,
+                                                   stream=True)
         except Exception as e:
             logger.error(str(e))
+            return None
+        return ret if ret else None
+
+    def __parse_torznab_xml(self, url, indexer_id: str):
+        """
+        从torznab xml中解析种子信息，边下载边解析
+        索引器熔断时直接跳过，超时时间按该索引器近期耗时调整
+        :param url: URL地址
+        :param indexer_id: 索引器ID
+        :return: 解析出来的种子信息列表
+        """
+        if not self._health.allow(indexer_id):
+            logger.warning(f"【{self.plugin_name}】索引器 {indexer_id} 连续失败已熔断，跳过检索")
             return []
-        if not ret or not ret.text:
+        start = time.time()
+        ret = self.__request_torznab(url, timeout=self._health.timeout(indexer_id))
+        if not ret:
+            self._health.record(indexer_id, False, error="请求失败")
             return []
-        xmls = ret.text
-        torrents = []
         try:
-            # 解析XML
-            dom_tree = xml.dom.minidom.parseString(xmls)
-            root_node = dom_tree.documentElement
-            items = root_node.getElementsByTagName("item")
-            for item in items:
-                try:
-
-                    # 标题
-                    title = DomUtils.tag_value(item, "title", default="")
-                    if not title:
-                        continue
-                    # 种子链接
-                    enclosure = DomUtils.tag_value(item, "enclosure", "url", default="")
-                    if not enclosure:
-                        continue
-                    # 描述
-                    description = DomUtils.tag_value(item, "description", default="")
-                    # 种子大小
-                    size = DomUtils.tag_value(item, "size", default=0)
-                    # 种子页面
-                    page_url = DomUtils.tag_value(item, "comments", default="")
-                    # 发布时间
-                    pubdate = DomUtils.tag_value(item, "pubDate", default="")
-                    if pubdate:
-                        pubdate = StringUtils.unify_datetime_str(pubdate)
-                    # 做种数
-                    seeders = 0
-                    # 下载数
-                    peers = 0
-                    # imdbid
-                    imdbid = ""
-
-                    torznab_attrs = item.getElementsByTagName("torznab:attr")
-                    for torznab_attr in torznab_attrs:
-                        name = torznab_attr.getAttribute('name')
-                        value = torznab_attr.getAttribute('value')
-                        if name == "seeders":
-                            seeders = value
-                        if name == "peers":
-                            peers = value
-                        if name == "downloadvolumefactor":
-                            downloadvolumefactor = value
-                            if float(downloadvolumefactor) == 0:
-                                freeleech = True
-                        if name == "uploadvolumefactor":
-                            uploadvolumefactor = value
-                        if name == "imdbid":
-                            imdbid = value
-
-                    tmp_dict = {
-                        'title': title,
-                        'enclosure': enclosure,
-                        'description': description,
-                        'size': size,
-                        'seeders': seeders,
-                        'peers': peers,
-                        'page_url': page_url,
-                        'imdbid': imdbid
-                    }
-                    torrents.append(tmp_dict)
-                except Exception as e:
-                    logger.error(str(e))
-                    continue
+            results = list(parse_torznab_response(ret, limit=self._max_results))
         except Exception as e:
+            self._health.record(indexer_id, False, error=str(e))
             logger.error(str(e))
-            pass
-
-        return torrents
+            return []
+        self._health.record(indexer_id, True, time.time() - start)
+        return results
 
     def get_form(self) -> Tuple[List[dict], Dict[str, Any]]:
         """
@@ -392,6 +457,23 @@ class JackettShaw(_PluginBase):
                                             }
                                         ]
                                     },
+                                    {
+                                        'component': 'VCol',
+                                        'props': {
+                                            'cols': 12,
+                                            'md': 4
+                                        },
+                                        'content': [
+                                            {
+                                                'component': 'VSwitch',
+                                                'props': {
+                                                    'model': 'aggregate',
+                                                    'label': '聚合检索',
+                                                    'hint': '同一关键词只通过all端点请求一次Jackett，结果按索引器拆分后分发，减少请求次数'
+                                                }
+                                            }
+                                        ]
+                                    },
                                     {
                                         'component': 'VCol',
                                         'props': {
@@ -462,7 +544,7 @@ class JackettShaw(_PluginBase):
                                 'component': 'VCol',
                                 'props': {
                                     'cols': 12,
-                                    'md': 6
+                                    'md': 4
                                 },
                                 'content': [
                                     {
@@ -481,7 +563,7 @@ class JackettShaw(_PluginBase):
                                 'component': 'VCol',
                                 'props': {
                                     'cols': 12,
-                                    'md': 6
+                                    'md': 4
                                 },
                                 'content': [
                                     {
@@ -494,6 +576,25 @@ class JackettShaw(_PluginBase):
                                         }
                                     }
                                 ]
+                            },
+                            {
+                                'component': 'VCol',
+                                'props': {
+                                    'cols': 12,
+                                    'md': 4
+                                },
+                                'content': [
+                                    {
+                                        'component': 'VTextField',
+                                        'props': {
+                                            'model': 'max_results',
+                                            'label': '最大结果数',
+                                            'placeholder': '0',
+                                            'type': 'number',
+                                            'hint': '单个索引器最多解析的结果数，达到后停止读取，0为不限制'
+                                        }
+                                    }
+                                ]
                             }
                         ]
                     },
@@ -528,6 +629,8 @@ class JackettShaw(_PluginBase):
             "api_key": "",
             "password": "",
             "cron": "0 0 */24 * *",
+            "max_results": 0,
+            "aggregate": False,
             "onlyonce": False
         }
 
@@ -540,6 +643,8 @@ class JackettShaw(_PluginBase):
 
         items = []
         for site in self._indexers:
+            match = re.search(r"/indexers/([^/]+)/results", site.get("url", ""))
+            health = self._health.get(match.group(1)) if match else {}
             items.append({
                 'component': 'tr',
                 'content': [
@@ -554,10 +659,33 @@ class JackettShaw(_PluginBase):
                     {
                         'component': 'td',
                         'text': site.get("public")
+                    },
+                    {
+                        'component': 'td',
+                        'text': health.get("state", "-")
+                    },
+                    {
+                        'component': 'td',
+                        'text': f"{health['p95']}s" if health.get("p95") is not None else "-"
+                    },
+                    {
+                        'component': 'td',
+                        'text': f"{health['timeout']}s" if health else "-"
+                    },
+                    {
+                        'component': 'td',
+                        'text': f"{health.get('failures', 0)}/{health.get('total_failures', 0)}"
                     }
                 ]
             })
 
+        cache_stats = self._search_cache.stats()
+        flight_stats = self._search_flight.stats()
+        key_stats = _search_keys.stats()
+        summary = (f"检索缓存命中 {cache_stats['hits']}/{cache_stats['hits'] + cache_stats['misses']}"
+                   f"（{cache_stats['hit_rate']:.0%}），关键词归一化合并 {key_stats['normalized']} 次，"
+                   f"并发检索合并 {flight_stats['merged']} 次，累计等待 {flight_stats['wait_time']}s")
+
         return [
             {
                 'component': 'VRow',
@@ -568,6 +696,14 @@ class JackettShaw(_PluginBase):
                             'cols': 12
                         },
                         'content': [
+                            {
+                                'component': 'VAlert',
+                                'props': {
+                                    'type': 'info',
+                                    'variant': 'tonal',
+                                    'text': summary
+                                }
+                            },
                             {
                                 'component': 'VTable',
                                 'props': {
@@ -600,6 +736,34 @@ class JackettShaw(_PluginBase):
                                                             'class': 'text-start ps-4'
                                                         },
                                                         'text': '是否公开'
+                                                    },
+                                                    {
+                                                        'component': 'th',
+                                                        'props': {
+                                                            'class': 'text-start ps-4'
+                                                        },
+                                                        'text': '状态'
+                                                    },
+                                                    {
+                                                        'component': 'th',
+                                                        'props': {
+                                                            'class': 'text-start ps-4'
+                                                        },
+                                                        'text': 'P95耗时'
+                                                    },
+                                                    {
+                                                        'component': 'th',
+                                                        'props': {
+                                                            'class': 'text-start ps-4'
+                                                        },
+                                                        'text': '超时'
+                                                    },
+                                                    {
+                                                        'component': 'th',
+                                                        'props': {
+                                                            'class': 'text-start ps-4'
+                                                        },
+                                                        'text': '连续/累计失败'
                                                     }
                                                 ]
                                             }
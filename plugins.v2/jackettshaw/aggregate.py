@@ -0,0 +1,62 @@
+# _*_ coding: utf-8 _*_
+import threading
+from typing import Callable, Dict, Hashable, List, Optional
+
+from cachetools import TTLCache
+
+
+class AggregateCache:
+    """
+    聚合检索结果缓存
+
+    MoviePilot 按索引器逐个调用 search，同一关键词的第一个调用发起一次 all 聚合检索，
+    结果按索引器拆分后短时间缓存，其余索引器的调用直接从缓存取结果；
+    聚合检索进行中时，其它调用等待其完成，不会重复发起。
+    """
+
+    def __init__(self, ttl: float = 120, maxsize: int = 64):
+        """
+        :param ttl: 缓存有效期（秒），只需覆盖一轮检索
+        :param maxsize: 最多缓存的关键词数
+        """
+        self._cache: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self._inflight: Dict[Hashable, threading.Event] = {}
+
+    def get(self, key: Hashable, loader: Callable[[], Optional[Dict[str, List[dict]]]],
+            timeout: float = 90) -> Optional[Dict[str, List[dict]]]:
+        """
+        获取按索引器拆分的结果，缓存中没有时调用 loader
+        :param key: 缓存键，如 (关键词, 分类)
+        :param loader: 发起聚合检索，返回 {索引器ID: 结果列表}，失败返回 None
+        :param timeout: 等待其它调用完成的最长时间（秒）
+        :return: 聚合检索失败或等待超时返回 None
+        """
+        with self._lock:
+            if key in self._cache:
+                return self._cache[key]
+            event = self._inflight.get(key)
+            leader = event is None
+            if leader:
+                event = threading.Event()
+                self._inflight[key] = event
+        if not leader:
+            if not event.wait(timeout):
+                return None
+            # 发起者失败时缓存中没有结果，交由调用方单独检索
+            with self._lock:
+                return self._cache.get(key)
+        try:
+            result = loader()
+            if result is not None:
+                with self._lock:
+                    self._cache[key] = result
+            return result
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            event.set()
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
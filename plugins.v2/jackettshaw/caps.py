@@ -0,0 +1,113 @@
+# _*_ coding: utf-8 _*_
+import threading
+from typing import Callable, Dict, FrozenSet, Hashable, List, Optional, Any
+from xml.etree import ElementTree
+
+from cachetools import TTLCache
+
+from app.schemas import SearchContext, MediaType
+
+# Torznab 检索模式 -> t 参数
+SEARCH_MODES = {"search": "search", "movie-search": "movie", "tv-search": "tvsearch"}
+# 可用于精确检索的 ID 参数
+ID_PARAMS = ("imdbid", "tmdbid", "tvdbid")
+
+
+def parse_caps(content: bytes) -> Dict[str, FrozenSet[str]]:
+    """
+    解析 t=caps 返回的 <searching> 节点
+    :return: {检索模式: 支持的参数}，只包含 available="yes" 的模式，参数统一为小写
+    """
+    modes = {}
+    searching = ElementTree.fromstring(content).find("searching")
+    if searching is None:
+        return modes
+    for node in searching:
+        if node.tag not in SEARCH_MODES or node.get("available") != "yes":
+            continue
+        params = node.get("supportedParams") or "q"
+        modes[node.tag] = frozenset(p.strip().lower() for p in params.split(",") if p.strip())
+    return modes
+
+
+def _context_value(search_context: SearchContext, name: str) -> Any:
+    """
+    依次从 SearchContext、media_info 中取值，没有该属性时返回 None
+    """
+    value = getattr(search_context, name, None)
+    if value is None:
+        value = getattr(search_context.media_info, name, None)
+    return value
+
+
+def media_ids(search_context: Optional[SearchContext]) -> Dict[str, str]:
+    """
+    从检索上下文中提取 imdbid/tmdbid/tvdbid/season/ep，忽略空值
+    """
+    if not search_context or not search_context.media_info:
+        return {}
+    media_info = search_context.media_info
+    values = {
+        "imdbid": getattr(media_info, "imdb_id", None),
+        "tmdbid": getattr(media_info, "tmdb_id", None),
+        "tvdbid": getattr(media_info, "tvdb_id", None),
+        "season": _context_value(search_context, "season"),
+        "ep": _context_value(search_context, "episode"),
+    }
+    return {key: str(value) for key, value in values.items()
+            if value not in (None, "", 0, "0") and str(value).lower() != "none"}
+
+
+def build_search_params(modes: Optional[Dict[str, FrozenSet[str]]], keyword: str, categories: List[int],
+                        search_context: Optional[SearchContext] = None) -> Dict[str, str]:
+    """
+    构造检索参数，索引器支持且上下文带有 ID 时使用 movie/tvsearch 按 ID 检索，否则按关键词检索
+    :param modes: parse_caps 的结果，为空时按关键词检索
+    :return: 不含 apikey 的 torznab 参数
+    """
+    cat = ",".join(map(str, categories))
+    if modes and search_context and search_context.media_info:
+        mode = {MediaType.MOVIE: "movie-search", MediaType.TV: "tv-search"}.get(search_context.media_info.type)
+        supported = modes.get(mode) or frozenset()
+        ids = {key: value for key, value in media_ids(search_context).items() if key in supported}
+        if any(key in ids for key in ID_PARAMS):
+            return {"t": SEARCH_MODES[mode], "cat": cat, **ids}
+    return {"t": "search", "q": keyword, "cat": cat}
+
+
+class CapsCache:
+    """
+    索引器 caps 缓存
+
+    每个索引器只请求一次 t=caps，成功结果缓存 ttl 秒；
+    请求失败时在 fail_ttl 秒内按不支持 ID 检索处理，避免每次检索都重试。
+    """
+
+    def __init__(self, ttl: float = 24 * 3600, fail_ttl: float = 600, maxsize: int = 512):
+        self._cache: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._failed: TTLCache = TTLCache(maxsize=maxsize, ttl=fail_ttl)
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, loader: Callable[[], Optional[Dict[str, FrozenSet[str]]]]) \
+            -> Optional[Dict[str, FrozenSet[str]]]:
+        """
+        :param key: 索引器标识
+        :param loader: 请求并解析 caps，失败返回 None
+        """
+        with self._lock:
+            if key in self._cache:
+                return self._cache[key]
+            if key in self._failed:
+                return None
+        modes = loader()
+        with self._lock:
+            if modes is None:
+                self._failed[key] = True
+            else:
+                self._cache[key] = modes
+        return modes
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self._failed.clear()
@@ -0,0 +1,155 @@
+# _*_ coding: utf-8 _*_
+import hashlib
+import threading
+import time
+from typing import List, Optional, Dict, Any
+
+import requests
+
+from app.log import logger
+
+
+class JackettClient:
+    """
+    Jackett 管理接口客户端
+
+    整个生命周期共用一个会话，登录一次后复用 cookie，
+    只有请求返回 401 或被重定向到登录页时才重新登录。
+    已配置索引器列表在 ttl 内直接使用缓存，过期后带 ETag/Last-Modified 条件刷新。
+    """
+
+    LOGIN_PATH = "/UI/Dashboard"
+    INDEXERS_PATH = "/api/v2.0/indexers?configured=true"
+
+    def __init__(self, host: str, api_key: str, password: str = "", user_agent: Optional[str] = None,
+                 proxies: Optional[dict] = None, ttl: float = 300, timeout=(10, 30)):
+        """
+        :param host: Jackett 地址
+        :param api_key: API Key
+        :param password: 管理密码，为空时不主动登录
+        :param user_agent: User-Agent
+        :param proxies: 代理
+        :param ttl: 索引器列表缓存有效期（秒）
+        :param timeout: 请求超时（连接，读取）
+        """
+        self.host = host.rstrip("/")
+        self.password = password or ""
+        self.ttl = ttl
+        self.timeout = timeout
+        self._session = requests.Session()
+        self._session.headers.update({
+            "Content-Type": "application/x-www-form-urlencoded; charset=UTF-8",
+            "X-Api-Key": api_key or "",
+            "Accept": "application/json, text/javascript, */*; q=0.01"
+        })
+        if user_agent:
+            self._session.headers["User-Agent"] = user_agent
+        if proxies:
+            self._session.proxies.update(proxies)
+        self._lock = threading.Lock()
+        self._logged_in = False
+        # 索引器列表缓存
+        self._indexers: Optional[List[Dict[str, Any]]] = None
+        self._fetched_at = 0.0
+        self._etag: Optional[str] = None
+        self._last_modified: Optional[str] = None
+        self.fingerprint: Optional[str] = None
+
+    def close(self):
+        self._session.close()
+
+    def login(self) -> bool:
+        """
+        登录 Jackett 管理界面，cookie 保存在会话中
+        """
+        with self._lock:
+            try:
+                res = self._session.post(f"{self.host}{self.LOGIN_PATH}",
+                                         data={"password": self.password},
+                                         params={"password": self.password},
+                                         allow_redirects=False, timeout=self.timeout)
+            except requests.RequestException as e:
+                logger.warning(f"Jackett 登录失败：{str(e)}")
+                self._logged_in = False
+                return False
+            self._logged_in = res.status_code < 400 and bool(self._session.cookies)
+            if not self._logged_in:
+                logger.warning(f"Jackett 登录失败，无法获取 cookie：HTTP {res.status_code}")
+            return self._logged_in
+
+    @staticmethod
+    def _need_login(res: requests.Response) -> bool:
+        """
+        未登录或 cookie 失效时 Jackett 返回 401 或重定向到 /UI/Login
+        """
+        if res.status_code == 401:
+            return True
+        return res.is_redirect and "/UI/Login" in (res.headers.get("Location") or "")
+
+    def request(self, method: str, path: str, **kwargs) -> Optional[requests.Response]:
+        """
+        请求 Jackett，登录失效时重新登录后重试一次
+        :param path: 以 / 开头的路径
+        :return: 请求失败返回 None
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        kwargs.setdefault("allow_redirects", False)
+        if self.password and not self._logged_in:
+            self.login()
+        try:
+            res = self._session.request(method, f"{self.host}{path}", **kwargs)
+            if self._need_login(res):
+                logger.info("Jackett 登录已失效，重新登录")
+                res.close()
+                if not self.login():
+                    return None
+                res = self._session.request(method, f"{self.host}{path}", **kwargs)
+            return res
+        except requests.RequestException as e:
+            logger.warning(f"请求 Jackett 失败：{path} {str(e)}")
+            return None
+
+    def get_indexers(self, refresh: bool = False) -> Optional[List[Dict[str, Any]]]:
+        """
+        获取已配置的索引器
+        :param refresh: 忽略 ttl 立即条件刷新
+        :return: Jackett 返回的索引器列表，请求失败且没有缓存时返回 None
+        """
+        if not refresh and self._indexers is not None and time.time() - self._fetched_at < self.ttl:
+            return self._indexers
+        headers = {}
+        if self._indexers is not None:
+            if self._etag:
+                headers["If-None-Match"] = self._etag
+            if self._last_modified:
+                headers["If-Modified-Since"] = self._last_modified
+        res = self.request("GET", self.INDEXERS_PATH, headers=headers)
+        if res is None:
+            return self._indexers
+        if res.status_code == 304 and self._indexers is not None:
+            self._fetched_at = time.time()
+            return self._indexers
+        if not res.ok:
+            logger.warning(f"获取 Jackett 索引器失败：HTTP {res.status_code}")
+            return self._indexers
+        try:
+            indexers = res.json()
+        except ValueError as e:
+            logger.warning(f"Jackett 索引器列表解析失败：{str(e)}")
+            return self._indexers
+        if not isinstance(indexers, list):
+            return self._indexers
+        self._indexers = indexers
+        self._fetched_at = time.time()
+        self._etag = res.headers.get("ETag")
+        self._last_modified = res.headers.get("Last-Modified")
+        self.fingerprint = self._fingerprint(indexers)
+        return indexers
+
+    @staticmethod
+    def _fingerprint(indexers: List[Dict[str, Any]]) -> str:
+        """
+        索引器集合的摘要，只取 id 和名称，与顺序无关
+        """
+        keys = sorted(f"{v.get('id')}\t{v.get('name')}" for v in indexers if isinstance(v, dict))
+        return hashlib.md5("\n".join(keys).encode("utf-8")).hexdigest()
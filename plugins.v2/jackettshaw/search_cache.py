@@ -0,0 +1,427 @@
+import functools
+import json
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+import zlib
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, Iterator, Optional, Tuple, Union
+
+from app.log import logger
+
+try:
+    from zhconv import convert as _zh_convert
+except ImportError:
+    _zh_convert = None
+
+
+class PersistentTLRUCache(MutableMapping):
+    """
+    持久化的检索结果缓存
+
+    内存中按 LRU 保留最近使用的 maxsize 条，同时写入 SQLite，重启或插件重载后仍然有效；
+    启动时调用 warm_up 把未过期的记录载入内存。
+    可直接作为 cachetools.cached 的 cache 使用，键需为可 JSON 序列化的元组，值为 JSON 压缩后保存。
+    元组键的第一项（索引器ID）可以在 ttls 中单独设置有效期，未设置的使用 ttl。
+    空结果默认只缓存在内存中，不写入磁盘，避免站点临时故障的结果在重启后继续生效。
+    """
+
+    # 每写入多少次清理一次磁盘上的过期记录
+    PURGE_INTERVAL = 200
+
+    def __init__(self, path: Union[str, Path], ttl: float, maxsize: int = 1024, persist_empty: bool = False):
+        """
+        :param path: SQLite 文件路径，首次使用时创建
+        :param ttl: 默认有效期（秒）
+        :param maxsize: 内存中最多保留的条数，磁盘上的记录只按有效期清理
+        :param persist_empty: 是否将空结果写入磁盘
+        """
+        self._path = Path(path)
+        self.ttl = ttl
+        self.ttls: Dict[Hashable, float] = {}
+        self.maxsize = maxsize
+        self.persist_empty = persist_empty
+        self._lock = threading.RLock()
+        self._memory: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._writes = 0
+        self._hits = 0
+        self._misses = 0
+
+    def ttl_for(self, key: Hashable) -> float:
+        """
+        键对应的有效期（秒）
+        """
+        if isinstance(key, tuple) and key and key[0] in self.ttls:
+            return self.ttls[key[0]]
+        return self.ttl
+
+    @staticmethod
+    def _dump_key(key: Hashable) -> str:
+        return json.dumps(key, ensure_ascii=False, separators=(",", ":"), default=str)
+
+    @classmethod
+    def _load_key(cls, text: str) -> Hashable:
+        def to_tuple(value):
+            return tuple(to_tuple(v) for v in value) if isinstance(value, list) else value
+
+        return to_tuple(json.loads(text))
+
+    @staticmethod
+    def _encode(value: Any) -> bytes:
+        return zlib.compress(json.dumps(value, ensure_ascii=False, separators=(",", ":"),
+                                        default=str).encode("utf-8"))
+
+    @staticmethod
+    def _decode(blob: bytes) -> Any:
+        return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+    def _db(self) -> Optional[sqlite3.Connection]:
+        """
+        打开数据库，失败时只使用内存缓存
+        """
+        if self._conn is None:
+            try:
+                self._path.parent.mkdir(parents=True, exist_ok=True)
+                conn = sqlite3.connect(str(self._path), check_same_thread=False, timeout=10)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("CREATE TABLE IF NOT EXISTS cache "
+                             "(key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL NOT NULL, updated REAL NOT NULL)")
+                conn.commit()
+                self._conn = conn
+            except sqlite3.Error as e:
+                logger.error(f"打开检索缓存 {self._path} 失败：{str(e)}")
+                return None
+        return self._conn
+
+    def _remember(self, key: Hashable, expires: float, value: Any):
+        self._memory[key] = (expires, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+
+    def warm_up(self) -> int:
+        """
+        清理过期记录，并把最近写入的未过期记录载入内存
+        :return: 载入的条数
+        """
+        with self._lock:
+            conn = self._db()
+            if conn is None:
+                return 0
+            try:
+                now = time.time()
+                conn.execute("DELETE FROM cache WHERE expires <= ?", (now,))
+                conn.commit()
+                rows = conn.execute("SELECT key, value, expires FROM cache ORDER BY updated DESC LIMIT ?",
+                                    (self.maxsize,)).fetchall()
+            except sqlite3.Error as e:
+                logger.error(f"载入检索缓存失败：{str(e)}")
+                return 0
+            count = 0
+            # 按写入时间从旧到新放入，最近写入的排在 LRU 末尾
+            for key, blob, expires in reversed(rows):
+                try:
+                    self._remember(self._load_key(key), expires, self._decode(blob))
+                    count += 1
+                except (ValueError, zlib.error):
+                    continue
+            return count
+
+    def __getitem__(self, key: Hashable) -> Any:
+        with self._lock:
+            try:
+                value = self._get(key)
+            except KeyError:
+                self._misses += 1
+                raise
+            self._hits += 1
+            return value
+
+    def _get(self, key: Hashable) -> Any:
+        with self._lock:
+            now = time.time()
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._memory.move_to_end(key)
+                    return entry[1]
+                self._memory.pop(key, None)
+            conn = self._db()
+            if conn is None:
+                raise KeyError(key)
+            try:
+                row = conn.execute("SELECT value, expires FROM cache WHERE key = ?",
+                                   (self._dump_key(key),)).fetchone()
+            except sqlite3.Error:
+                row = None
+            if row is None or row[1] <= now:
+                raise KeyError(key)
+            try:
+                value = self._decode(row[0])
+            except (ValueError, zlib.error):
+                raise KeyError(key)
+            self._remember(key, row[1], value)
+            return value
+
+    def __setitem__(self, key: Hashable, value: Any):
+        with self._lock:
+            now = time.time()
+            expires = now + self.ttl_for(key)
+            self._remember(key, expires, value)
+            if not value and not self.persist_empty:
+                return
+            conn = self._db()
+            if conn is None:
+                return
+            try:
+                conn.execute("INSERT OR REPLACE INTO cache (key, value, expires, updated) VALUES (?, ?, ?, ?)",
+                             (self._dump_key(key), self._encode(value), expires, now))
+                self._writes += 1
+                if self._writes % self.PURGE_INTERVAL == 0:
+                    conn.execute("DELETE FROM cache WHERE expires <= ?", (now,))
+                conn.commit()
+            except (sqlite3.Error, TypeError, ValueError) as e:
+                logger.warning(f"写入检索缓存失败：{str(e)}")
+
+    def __delitem__(self, key: Hashable):
+        with self._lock:
+            found = self._memory.pop(key, None) is not None
+            conn = self._db()
+            if conn is not None:
+                try:
+                    found = conn.execute("DELETE FROM cache WHERE key = ?",
+                                         (self._dump_key(key),)).rowcount > 0 or found
+                    conn.commit()
+                except sqlite3.Error:
+                    pass
+            if not found:
+                raise KeyError(key)
+
+    def __contains__(self, key: object) -> bool:
+        try:
+            self._get(key)
+        except KeyError:
+            return False
+        return True
+
+    def __iter__(self) -> Iterator[Hashable]:
+        with self._lock:
+            return iter(list(self._memory))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._memory)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            conn = self._db()
+            if conn is not None:
+                try:
+                    conn.execute("DELETE FROM cache")
+                    conn.commit()
+                except sqlite3.Error:
+                    pass
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        命中统计
+        """
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / total, 4) if total else 0,
+                "memory": len(self._memory),
+            }
+
+    def close(self):
+        """
+        关闭数据库连接，之后再次使用时重新打开
+        """
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class _Call:
+    """
+    进行中的一次调用
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    合并相同的并发调用
+
+    相同键的调用进行中时，后到的调用等待第一个调用完成并共用其结果（异常同样共用），不再重复执行。
+    与 cachetools.cached 配合时放在 cached 之内，缓存未命中的并发调用只有一个会真正执行。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._stats = {"calls": 0, "executed": 0, "merged": 0, "wait_time": 0.0}
+
+    def do(self, key: Hashable, func: Callable[[], Any]) -> Any:
+        """
+        执行 func，相同键的调用进行中时等待其结果
+        """
+        with self._lock:
+            self._stats["calls"] += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._stats["executed"] += 1
+            else:
+                self._stats["merged"] += 1
+        if not leader:
+            start = time.time()
+            call.done.wait()
+            with self._lock:
+                self._stats["wait_time"] += time.time() - start
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = func()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        调用统计：总调用数、实际执行数、合并数、合并调用的累计等待时间（秒）
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["inflight"] = len(self._calls)
+        stats["wait_time"] = round(stats["wait_time"], 3)
+        return stats
+
+
+def single_flight(group: SingleFlight, key: Callable[..., Hashable]):
+    """
+    SingleFlight 装饰器，key 与 cachetools.cached 的 key 参数相同，接收被装饰函数的全部参数
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            return group.do(key(*args, **kwargs), lambda: func(*args, **kwargs))
+
+        return wrapper
+
+    return decorator
+
+
+class SearchKeyNormalizer:
+    """
+    检索缓存键归一化
+
+    关键词做 NFKC 全半角统一、转小写、繁体转简体（需安装 zhconv，未安装时跳过），标点和连续空白合并为一个空格；
+    检索上下文只保留会影响检索结果的字段：检索类型、检索范围、是否过滤结果，以及媒体的类型、标题、年份、季、集和各站点ID，
+    爬虫会按这些字段过滤结果，缺少任何一项都可能让不同的检索共用同一份结果。
+    同时统计有多少次调用因归一化而与此前不同写法的关键词共用了同一个键。
+    """
+
+    # 检索上下文中影响检索结果的字段
+    CONTEXT_FIELDS = ("search_type", "search_sub_id", "area")
+    # 上下文中影响检索结果的 ID 字段
+    ID_FIELDS = ("imdb_id", "tmdb_id", "tvdb_id", "douban_id")
+    # 匹配标点、符号和空白，\w 在 Unicode 模式下包含中日韩文字
+    _SEPARATORS = re.compile(r"[\W_]+")
+
+    def __init__(self, maxsize: int = 4096):
+        """
+        :param maxsize: 记录多少个键的首次关键词写法，用于统计归一化合并次数
+        """
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._variants: "OrderedDict[Hashable, str]" = OrderedDict()
+        self._stats = {"keys": 0, "normalized": 0}
+
+    @classmethod
+    def keyword(cls, keyword: Optional[str]) -> str:
+        """
+        归一化关键词，归一化后为空时（如只有标点）保留原关键词去除首尾空白后的结果
+        """
+        text = unicodedata.normalize("NFKC", str(keyword or "")).lower()
+        if _zh_convert:
+            try:
+                text = _zh_convert(text, "zh-cn")
+            except Exception:
+                pass
+        return cls._SEPARATORS.sub(" ", text).strip() or str(keyword or "").strip()
+
+    @classmethod
+    def context(cls, search_context: Any) -> Optional[Tuple]:
+        """
+        检索上下文中影响检索结果的字段，没有上下文时为 None
+        :return: ((检索类型, 检索子ID, 检索范围), 是否过滤结果, 媒体类型, 归一化标题, 年份, 季, 集, ((ID字段, 值), ...))
+        """
+        if not search_context:
+            return None
+        media_info = getattr(search_context, "media_info", None)
+
+        def value(name: str, *sources) -> Optional[str]:
+            for source in sources:
+                v = getattr(source, name, None)
+                if v not in (None, "", 0, "0") and str(v).lower() != "none":
+                    return str(v)
+            return None
+
+        media_type = getattr(media_info, "type", None)
+        title = getattr(media_info, "title", None)
+        return (tuple(value(name, search_context) for name in cls.CONTEXT_FIELDS),
+                bool(getattr(search_context, "enable_search_filter", False)),
+                getattr(media_type, "value", media_type),
+                cls.keyword(title) if title else None,
+                value("year", media_info),
+                value("season", search_context, media_info),
+                value("episode", search_context, media_info),
+                tuple((name, v) for name in cls.ID_FIELDS if (v := value(name, media_info))))
+
+    def key(self, indexer_id: Any, keyword: Optional[str], page: Any, search_context: Any = None) -> Tuple:
+        """
+        检索缓存和并发合并共用的键：(索引器ID, 归一化关键词, 页码, 上下文字段)
+        """
+        key = (indexer_id, self.keyword(keyword), page, self.context(search_context))
+        raw = str(keyword or "")
+        with self._lock:
+            self._stats["keys"] += 1
+            first = self._variants.get(key)
+            if first is None:
+                self._variants[key] = raw
+                while len(self._variants) > self.maxsize:
+                    self._variants.popitem(last=False)
+            else:
+                self._variants.move_to_end(key)
+                if first != raw:
+                    self._stats["normalized"] += 1
+        return key
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        键统计：生成键的次数、因归一化与其他写法共用键的次数
+        """
+        with self._lock:
+            return dict(self._stats)
@@ -0,0 +1,199 @@
+# _*_ coding: utf-8 _*_
+from typing import Iterable, Iterator, Optional, Dict, Any, List
+from xml.etree.ElementTree import XMLPullParser, Element
+
+from app.log import logger
+
+# 每次从响应中读取的字节数
+CHUNK_SIZE = 64 * 1024
+# 来源索引器在结果中的临时字段，返回给 MoviePilot 前需去掉
+INDEXER_KEY = "_jackettindexer"
+
+
+def _local_name(tag: str) -> str:
+    """
+    去掉命名空间，{http://torznab.com/schemas/2015/feed}attr -> attr
+    """
+    return tag.rpartition("}")[2]
+
+
+def _parse_item(item: Element, with_indexer: bool = False) -> Optional[Dict[str, Any]]:
+    """
+    解析单个 <item>，缺少标题或种子链接时返回 None
+    with_indexer 为真时将 <jackettindexer id="..."> 标明的来源索引器记录在 INDEXER_KEY 中，用于拆分聚合检索结果
+    """
+    title = enclosure = description = page_url = indexer = ""
+    size = 0
+    attrs = {}
+    for child in item:
+        name = _local_name(child.tag)
+        if name == "title":
+            title = child.text or ""
+        elif name == "enclosure":
+            enclosure = child.get("url", "")
+        elif name == "description":
+            description = child.text or ""
+        elif name == "size":
+            size = child.text or 0
+        elif name == "comments":
+            page_url = child.text or ""
+        elif name == "attr":
+            attrs[child.get("name")] = child.get("value")
+        elif name == "jackettindexer" and with_indexer:
+            indexer = child.get("id", "")
+    if not title or not enclosure:
+        return None
+    result = {
+        'title': title,
+        'enclosure': enclosure,
+        'description': description,
+        'size': size,
+        'seeders': attrs.get("seeders", 0),
+        'peers': attrs.get("peers", 0),
+        'page_url': page_url,
+        'imdbid': attrs.get("imdbid", "")
+    }
+    if indexer:
+        result[INDEXER_KEY] = indexer
+    return result
+
+
+def split_by_indexer(results: Iterable[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    按来源索引器拆分聚合检索结果，并去掉 INDEXER_KEY
+    """
+    grouped: Dict[str, List[Dict[str, Any]]] = {}
+    for result in results:
+        indexer = result.pop(INDEXER_KEY, "")
+        grouped.setdefault(indexer, []).append(result)
+    return grouped
+
+
+def iter_torznab_items(chunks: Iterable[bytes], limit: Optional[int] = None,
+                       with_indexer: bool = False) -> Iterator[Dict[str, Any]]:
+    """
+    流式解析 Torznab XML，每解析完一个 <item> 产出一条结果并释放该节点，内存占用与结果总数无关
+    :param chunks: XML 内容分块，如 response.iter_content()
+    :param limit: 最多产出的结果数，达到后停止读取，为空或 0 时不限制
+    :param with_indexer: 是否记录来源索引器
+    """
+    parser = XMLPullParser(events=("start", "end"))
+    channel = None
+    count = 0
+    for chunk in chunks:
+        if not chunk:
+            continue
+        parser.feed(chunk)
+        for event, elem in parser.read_events():
+            name = _local_name(elem.tag)
+            if event == "start":
+                if name == "channel":
+                    channel = elem
+                continue
+            if name != "item":
+                continue
+            try:
+                result = _parse_item(elem, with_indexer)
+            except Exception as e:
+                logger.error(f"解析 Torznab 条目失败: {str(e)}")
+                result = None
+            # 已解析的条目从树中移除，避免整棵树留在内存中
+            elem.clear()
+            if channel is not None:
+                channel.remove(elem)
+            if not result:
+                continue
+            yield result
+            count += 1
+            if limit and count >= limit:
+                return
+    parser.close()
+
+
+def parse_torznab_response(response, limit: Optional[int] = None,
+                           with_indexer: bool = False) -> Iterator[Dict[str, Any]]:
+    """
+    边下载边解析 Torznab 响应，请求需使用 stream=True，提前结束时关闭连接
+    :param response: requests.Response
+    :param limit: 最多产出的结果数
+    :param with_indexer: 是否记录来源索引器
+    """
+    try:
+        yield from iter_torznab_items(response.iter_content(chunk_size=CHUNK_SIZE), limit=limit,
+                                      with_indexer=with_indexer)
+    finally:
+        response.close()
+
+
+if __name__ == "__main__":
+    # 与 minidom 整体解析对比耗时和峰值内存：python torznab.py [条目数]
+    import sys
+    import time
+    import tracemalloc
+    import xml.dom.minidom
+
+    def _minidom_parse(data: bytes) -> list:
+        def tag_value(node, tag, attname=None, default=None):
+            tags = node.getElementsByTagName(tag)
+            if not tags:
+                return default
+            if attname:
+                return tags[0].getAttribute(attname)
+            return tags[0].firstChild.data if tags[0].firstChild else default
+
+        results = []
+        for item in xml.dom.minidom.parseString(data).documentElement.getElementsByTagName("item"):
+            title = tag_value(item, "title", default="")
+            enclosure = tag_value(item, "enclosure", "url", default="")
+            if not title or not enclosure:
+                continue
+            attrs = {a.getAttribute("name"): a.getAttribute("value")
+                     for a in item.getElementsByTagName("torznab:attr")}
+            results.append({
+                'title': title,
+                'enclosure': enclosure,
+                'description': tag_value(item, "description", default=""),
+                'size': tag_value(item, "size", default=0),
+                'seeders': attrs.get("seeders", 0),
+                'peers': attrs.get("peers", 0),
+                'page_url': tag_value(item, "comments", default=""),
+                'imdbid': attrs.get("imdbid", "")
+            })
+        return results
+
+    def _feed(count: int) -> bytes:
+        items = "".join(
+            f'<item><title>Movie.{i}.2024.1080p.WEB-DL.H264-GRP</title>'
+            f'<guid>https://jackett/dl/{i}</guid><jackettindexer id="demo">Demo</jackettindexer>'
+            f'<comments>https://tracker/details/{i}</comments><pubDate>Mon, 01 Jan 2024 00:00:00 +0000</pubDate>'
+            f'<size>{1024 ** 3 + i}</size><description>Description of release {i}</description>'
+            f'<category>2000</category><enclosure url="https://jackett/dl/{i}.torrent" length="{1024 ** 3}" '
+            f'type="application/x-bittorrent" />'
+            f'<torznab:attr name="seeders" value="{i % 100}" /><torznab:attr name="peers" value="{i % 150}" />'
+            f'<torznab:attr name="imdbid" value="tt{1000000 + i}" />'
+            f'<torznab:attr name="downloadvolumefactor" value="1" /></item>'
+            for i in range(count))
+        return ('<?xml version="1.0" encoding="UTF-8"?><rss version="2.0" '
+                'xmlns:torznab="http://torznab.com/schemas/2015/feed"><channel><title>Demo</title>'
+                f'{items}</channel></rss>').encode("utf-8")
+
+    def _measure(func):
+        tracemalloc.start()
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return result, elapsed, peak
+
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    feed = _feed(total)
+    chunks = [feed[i:i + CHUNK_SIZE] for i in range(0, len(feed), CHUNK_SIZE)]
+    print(f"{total} 条，{len(feed) / 1024 / 1024:.1f}MB")
+    old, old_time, old_peak = _measure(lambda: _minidom_parse(feed))
+    new, new_time, new_peak = _measure(lambda: list(iter_torznab_items(chunks)))
+    top, top_time, top_peak = _measure(lambda: list(iter_torznab_items(chunks, limit=100)))
+    assert old == new, "解析结果不一致"
+    print(f"minidom      {old_time * 1000:>8.1f}ms  峰值 {old_peak / 1024 / 1024:>6.1f}MB")
+    print(f"iterparse    {new_time * 1000:>8.1f}ms  峰值 {new_peak / 1024 / 1024:>6.1f}MB")
+    print(f"前 100 条    {top_time * 1000:>8.1f}ms  峰值 {top_peak / 1024 / 1024:>6.1f}MB")
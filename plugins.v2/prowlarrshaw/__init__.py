@@ -3,12 +3,13 @@ import traceback
 from typing import List, Dict, Any, Tuple, Optional
 from datetime import datetime, timedelta
 import re
+import time
 from urllib.parse import urlencode, quote_plus
 
 import pytz
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
-from cachetools import cached, TTLCache
+from cachetools import cached
 
 from app.plugins import _PluginBase
 from app.core.config import settings
@@ -18,6 +19,24 @@ from app.utils.string import StringUtils
 from app.log import logger
 from app.core.event import EventManager
 from app.schemas.types import EventType
+from app.plugins.prowlarrshaw.batcher import SearchBatcher
+from app.plugins.prowlarrshaw.caps import build_search
+from app.plugins.prowlarrshaw.indexer_health import IndexerHealth
+from app.plugins.prowlarrshaw.json_stream import parse_json_response
+from app.plugins.prowlarrshaw.search_cache import PersistentTLRUCache, SearchKeyNormalizer, SingleFlight, \
+    single_flight
+from app.plugins.prowlarrshaw.prowlarr_client import ProwlarrClient
+
+
+# 检索缓存键归一化，关键词写法不同或上下文无关字段不同的检索共用缓存
+_search_keys = SearchKeyNormalizer()
+
+
+def _search_key(self, indexer, keyword, page, search_context: Optional[SearchContext] = None):
+    """
+    检索缓存和并发合并共用的键
+    """
+    return _search_keys.key(indexer.get("id"), keyword, page, search_context)
 
 
 class ProwlarrShaw(_PluginBase):
@@ -50,7 +69,21 @@ class ProwlarrShaw(_PluginBase):
     _api_key = ""
     _onlyonce = False
     _indexers = []
+    _batch = True
+    _batcher = SearchBatcher()
+    # Prowlarr 接口客户端，缓存索引器列表和 capabilities
+    _client: Optional[ProwlarrClient] = None
+    # 检索结果缓存，持久化到插件数据目录
+    _search_cache = PersistentTLRUCache(settings.PLUGIN_DATA_PATH / "prowlarrshaw" / "search_cache.db",
+                                        ttl=1 * 3600, maxsize=200)
+    # 相同检索并发时只执行一次
+    _search_flight = SingleFlight()
+    # 各索引器的耗时和熔断状态
+    _health = IndexerHealth()
     prowlarr_domain = "prowlarr_extend.shaw"
+    # 搜索结果只解析需要的字段
+    _search_fields = ("title", "downloadUrl", "magnetUrl", "sortTitle", "size", "seeders", "publishDate",
+                      "infoUrl", "guid", "indexerId")
 
     def init_plugin(self, config: dict = None):
         """
@@ -67,11 +100,18 @@ class ProwlarrShaw(_PluginBase):
             self._api_key = config.get("api_key")
             self._enabled = config.get("enabled")
             self._proxy = config.get("proxy")
+            self._batch = config.get("batch", True)
             self._onlyonce = config.get("onlyonce")
             self._cron = config.get("cron") or "0 0 */24 * *"
 
         # 停止现有任务
         self.stop_service()
+        if self._host and self._api_key:
+            self._client = ProwlarrClient(self._host, self._api_key, user_agent=settings.USER_AGENT,
+                                          proxies=settings.PROXY if self._proxy else None)
+        count = self._search_cache.warm_up()
+        if count:
+            logger.info(f"【{self.plugin_name}】已载入 {count} 条检索缓存")
         # 启动定时任务 & 立即运行一次
         self._scheduler = BackgroundScheduler(timezone=settings.TZ)
         if self._cron:
@@ -99,7 +139,12 @@ class ProwlarrShaw(_PluginBase):
         """
         if not self._api_key or not self._host:
             return False
-        self._indexers = self.get_indexers()
+        fingerprint = self._client.fingerprint if self._client else None
+        self._indexers = self.get_indexers(refresh=True)
+        # 索引器有变化时通知重新加载
+        if fingerprint and self._client and self._client.fingerprint != fingerprint:
+            logger.info(f"【{self.plugin_name}】Prowlarr 索引器有变化，重新加载")
+            EventManager().send_event(EventType.SpiderPluginsRload, data={"plugin_id": self.plugin_name})
         return True if isinstance(self._indexers, list) and len(self._indexers) > 0 else False
 
     def get_state(self) -> bool:
@@ -115,6 +160,10 @@ class ProwlarrShaw(_PluginBase):
                 if self._scheduler.running:
                     self._scheduler.shutdown()
                 self._scheduler = None
+            if self._client:
+                self._client.close()
+                self._client = None
+            self._search_cache.close()
         except Exception as e:
             logger.error(f"【{self.plugin_name}】停止插件错误: {str(e)}")
 
@@ -126,7 +175,8 @@ class ProwlarrShaw(_PluginBase):
             "onlyonce": False,
             "cron": self._cron,
             "host": self._host,
-            "api_key": self._api_key
+            "api_key": self._api_key,
+            "batch": self._batch,
         })
 
     def get_api(self) -> List[Dict[str, Any]]:
@@ -141,41 +191,29 @@ class ProwlarrShaw(_PluginBase):
         """
         pass
 
-    def get_indexers(self):
+    def get_indexers(self, refresh: bool = False):
         """
-        获取配置的 Prowlarr Indexer 信息
+        获取配置的 Prowlarr Indexer 信息，只返回已启用的 torrent 索引器
 
+        :param refresh: 忽略缓存有效期，立即条件刷新
         :return: Indexer 列表，包含 id, name, url, domain, public, proxy 信息
         """
-        headers = {
-            "Content-Type": "application/x-www-form-urlencoded; charset=UTF-8",
-            "User-Agent": settings.USER_AGENT,
-            "X-Api-Key": self._api_key,
-            "Accept": "application/json, text/javascript, */*; q=0.01"
-        }
-        indexer_query_url = f"{self._host.rstrip('/')}/api/v1/indexerstats"
+        if not self._client:
+            return []
         try:
-            ret = RequestUtils(headers=headers).get_res(indexer_query_url)
-            if not ret:
-                logger.warning(f"【{self.plugin_name}】获取 indexer 请求无响应")
-                return []
-
-            data = ret.json()
-            if not data or "indexers" not in data:
-                logger.warning(f"【{self.plugin_name}】返回数据不包含 indexers 字段")
-                return []
-
-            indexers_raw = data.get("indexers", [])
+            indexers_raw = self._client.get_indexers(refresh=refresh)
             if not indexers_raw:
                 logger.info(f"【{self.plugin_name}】未配置任何 indexer")
                 return []
 
             indexers = []
             for v in indexers_raw:
-                indexer_id = v.get("indexerId")
-                indexer_name = v.get("indexerName")
+                indexer_id = v.get("id")
+                indexer_name = v.get("name")
                 if not indexer_id or not indexer_name:
                     continue
+                if not v.get("enable") or v.get("protocol", "torrent") != "torrent":
+                    continue
 
                 indexers.append({
                     "id": f'{self.plugin_name}-{indexer_name}',
@@ -192,10 +230,8 @@ class ProwlarrShaw(_PluginBase):
             logger.error(f"【{self.plugin_name}】获取 indexer 失败：{str(e)}")
             return []
 
-    @cached(cache=TTLCache(maxsize=200, ttl=1 * 3600),
-            key=lambda self, indexer, keyword, page, search_context=None: (indexer.get("id"), keyword, page,
-                                                                           hash(
-                                                                               f"{search_context.search_type}{search_context.search_sub_id}{search_context.media_info.title} ") if search_context else None))
+    @cached(cache=_search_cache, key=_search_key)
+    @single_flight(_search_flight, key=_search_key)
     def search(self, indexer, keyword, page, search_context: Optional[SearchContext] = None):
         """
         根据关键字多线程检索
@@ -215,6 +251,64 @@ class ProwlarrShaw(_PluginBase):
             logger.warning(f"【{self.plugin_name}】{indexer_name} 索引 ID 为空，跳过检索")
             return []
 
+        if not self._health.allow(indexer_id):
+            logger.warning(f"【{self.plugin_name}】{indexer_name} 连续失败已熔断，跳过检索")
+            return []
+
+        # 索引器支持时按 ID 检索，无结果再按关键词检索
+        capabilities = self._client.capabilities.get(indexer_id) if self._client else None
+        search_type, query = build_search(capabilities, keyword, search_context)
+        torrents = self.__search_indexer(indexer_name, indexer_id, search_type, query, categories, page)
+        if not torrents and search_type != "search":
+            logger.info(f"【{self.plugin_name}】{indexer_name} 按 ID 未检索到数据，改用关键词检索")
+            torrents = self.__search_indexer(indexer_name, indexer_id, "search", keyword, categories, page)
+        logger.info(f"【{self.plugin_name}】{indexer_name} 返回数据：{len(torrents)}")
+        return torrents
+
+    def __search_indexer(self, indexer_name: str, indexer_id: str, search_type: str, query: str,
+                         categories: List[int], page: int) -> List[dict]:
+        """
+        检索单个索引器，开启批量检索时与其它索引器的相同检索合并为一次请求，
+        熔断探测中或近期耗时过高的索引器单独检索
+        """
+        if self._batch and self._health.batchable(indexer_id):
+            torrents = self._batcher.search(
+                (search_type, query, tuple(categories), page), indexer_id,
+                lambda ids: self.__fetch(ids, search_type, query, categories, page, batched=True))
+            if torrents is not None:
+                return torrents
+            logger.warning(f"【{self.plugin_name}】{indexer_name} 批量检索失败，改为单独检索")
+        grouped = self.__fetch([indexer_id], search_type, query, categories, page)
+        return [torrent for torrents in (grouped or {}).values() for torrent in torrents]
+
+    def __fetch(self, indexer_ids: List[str], search_type: str, query: str, categories: List[int],
+                page: int, batched: bool = False) -> Optional[Dict[str, List[dict]]]:
+        """
+        一次请求检索多个索引器，结果按 indexerId 拆分
+        单独检索时使用该索引器的超时，结果和耗时计入其健康状态；
+        批量检索只包含健康且不慢的索引器，超时取各索引器超时的最大值，
+        返回了结果的索引器记为成功并记录整批耗时，其余索引器不记录
+        :return: {索引器ID: 结果列表}，请求失败返回 None
+        """
+        if not batched:
+            indexer_id = indexer_ids[0]
+            start = time.time()
+            grouped = self.__request_search(indexer_ids, search_type, query, categories, page,
+                                            timeout=self._health.timeout(indexer_id))
+            self._health.record(indexer_id, grouped is not None, time.time() - start,
+                                "" if grouped is not None else "请求失败")
+            return grouped
+        start = time.time()
+        grouped = self.__request_search(indexer_ids, search_type, query, categories, page,
+                                        timeout=max(self._health.timeout(i) for i in indexer_ids))
+        self._health.record_batch(indexer_ids, grouped, time.time() - start)
+        return grouped
+
+    def __request_search(self, indexer_ids: List[str], search_type: str, query: str, categories: List[int],
+                         page: int, timeout: float) -> Optional[Dict[str, List[dict]]]:
+        """
+        请求 /api/v1/search，边下载边解析
+        """
         try:
             headers = {
                 "Content-Type": "application/x-www-form-urlencoded; charset=UTF-8",
@@ -222,30 +316,31 @@ class ProwlarrShaw(_PluginBase):
                 "X-Api-Key": self._api_key,
                 "Accept": "application/json, text/javascript, */*; q=0.01"
             }
-            # 构造 API 请求 URL
+            # 构造 API 请求 URL，limit 按索引器生效
             params = [
-                         ("query", keyword),
-                         ("indexerIds", indexer_id),
-                         ("type", "search"),
+                         ("query", query),
+                         ("type", search_type),
                          ("limit", 150),
                          ("offset", page * 150 if page else 0),
-                     ] + [("categories", cat) for cat in categories]
+                     ] + [("indexerIds", indexer_id) for indexer_id in indexer_ids] \
+                     + [("categories", cat) for cat in categories]
             query_string = urlencode(params, quote_via=quote_plus)
             api_url = f"{self._host.rstrip('/')}/api/v1/search?{query_string}"
-            response = RequestUtils(headers=headers).get_res(api_url)
+            response = RequestUtils(headers=headers, timeout=timeout).get_res(api_url, stream=True)
 
             # 校验响应内容
             if not response:
-                logger.warning(f"【{self.plugin_name}】{indexer_name} 返回为空")
-                return []
-
-            json_data = response.json()
-            if not isinstance(json_data, list):
-                logger.warning(f"【{self.plugin_name}】{indexer_name} 返回非列表数据")
-                return []
-            torrents = []
-            for entry in json_data:
-                torrents.append({
+                logger.warning(f"【{self.plugin_name}】索引器 {indexer_ids} 返回为空")
+                return None
+            if not response.ok:
+                logger.warning(f"【{self.plugin_name}】索引器 {indexer_ids} 请求失败：HTTP {response.status_code}")
+                response.close()
+                return None
+
+            grouped: Dict[str, List[dict]] = {}
+            # 边下载边解析，每次只解码一条结果
+            for entry in parse_json_response(response, fields=self._search_fields):
+                grouped.setdefault(str(entry.get("indexerId")), []).append({
                     'title': entry.get("title"),
                     'enclosure': entry.get("downloadUrl") or entry.get("magnetUrl"),
                     'description': entry.get("sortTitle"),
@@ -254,12 +349,13 @@ class ProwlarrShaw(_PluginBase):
                     'pubdate': entry.get("publishDate"),
                     'page_url': entry.get("infoUrl") or entry.get("guid"),
                 })
-            logger.info(f"【{self.plugin_name}】{indexer_name} 返回数据：{len(torrents)}")
-
-            return torrents
+            if len(indexer_ids) > 1:
+                logger.info(f"【{self.plugin_name}】批量检索 {len(indexer_ids)} 个索引器，"
+                            f"返回数据：{sum(len(torrents) for torrents in grouped.values())}")
+            return grouped
         except Exception as e:
-            logger.error(f"【{self.plugin_name}】{indexer_name} 请求失败: {e}\n{traceback.format_exc()}")
-            return []
+            logger.error(f"【{self.plugin_name}】索引器 {indexer_ids} 请求失败: {e}\n{traceback.format_exc()}")
+            return None
 
     @staticmethod
     def get_cat(search_context: Optional[SearchContext] = None):
@@ -314,6 +410,23 @@ class ProwlarrShaw(_PluginBase):
                                         }
                                     }
                                 ]
+                            },
+                            {
+                                'component': 'VCol',
+                                'props': {
+                                    'cols': 12,
+                                    'md': 4
+                                },
+                                'content': [
+                                    {
+                                        'component': 'VSwitch',
+                                        'props': {
+                                            'model': 'batch',
+                                            'label': '批量检索',
+                                            'hint': '同一关键词的各索引器检索合并为一次请求，结果按indexerId分发，减少请求次数'
+                                        }
+                                    }
+                                ]
                             }
                         ]
                     },
@@ -427,6 +540,7 @@ class ProwlarrShaw(_PluginBase):
             "host": "",
             "api_key": "",
             "cron": "0 0 */24 * *",
+            "batch": True,
             "onlyonce": False
         }
 
@@ -439,6 +553,8 @@ class ProwlarrShaw(_PluginBase):
 
         items = []
         for site in self._indexers:
+            match = re.search(r"/api/v1/indexer/([^/]+)", site.get("url", ""))
+            health = self._health.get(match.group(1)) if match else {}
             items.append({
                 'component': 'tr',
                 'content': [
@@ -453,10 +569,33 @@ class ProwlarrShaw(_PluginBase):
                     {
                         'component': 'td',
                         'text': site.get("public")
+                    },
+                    {
+                        'component': 'td',
+                        'text': health.get("state", "-")
+                    },
+                    {
+                        'component': 'td',
+                        'text': f"{health['p95']}s" if health.get("p95") is not None else "-"
+                    },
+                    {
+                        'component': 'td',
+                        'text': f"{health['timeout']}s" if health else "-"
+                    },
+                    {
+                        'component': 'td',
+                        'text': f"{health.get('failures', 0)}/{health.get('total_failures', 0)}"
                     }
                 ]
             })
 
+        cache_stats = self._search_cache.stats()
+        flight_stats = self._search_flight.stats()
+        key_stats = _search_keys.stats()
+        summary = (f"检索缓存命中 {cache_stats['hits']}/{cache_stats['hits'] + cache_stats['misses']}"
+                   f"（{cache_stats['hit_rate']:.0%}），关键词归一化合并 {key_stats['normalized']} 次，"
+                   f"并发检索合并 {flight_stats['merged']} 次，累计等待 {flight_stats['wait_time']}s")
+
         return [
             {
                 'component': 'VRow',
@@ -467,6 +606,14 @@ class ProwlarrShaw(_PluginBase):
                             'cols': 12
                         },
                         'content': [
+                            {
+                                'component': 'VAlert',
+                                'props': {
+                                    'type': 'info',
+                                    'variant': 'tonal',
+                                    'text': summary
+                                }
+                            },
                             {
                                 'component': 'VTable',
                                 'props': {
@@ -499,6 +646,34 @@ class ProwlarrShaw(_PluginBase):
                                                             'class': 'text-start ps-4'
                                                         },
                                                         'text': '是否公开'
+                                                    },
+                                                    {
+                                                        'component': 'th',
+                                                        'props': {
+                                                            'class': 'text-start ps-4'
+                                                        },
+                                                        'text': '状态'
+                                                    },
+                                                    {
+                                                        'component': 'th',
+                                                        'props': {
+                                                            'class': 'text-start ps-4'
+                                                        },
+                                                        'text': 'P95耗时'
+                                                    },
+                                                    {
+                                                        'component': 'th',
+                                                        'props': {
+                                                            'class': 'text-start ps-4'
+                                                        },
+                                                        'text': '超时'
+                                                    },
+                                                    {
+                                                        'component': 'th',
+                                                        'props': {
+                                                            'class': 'text-start ps-4'
+                                                        },
+                                                        'text': '连续/累计失败'
                                                     }
                                                 ]
                                             }
@@ -0,0 +1,69 @@
+# _*_ coding: utf-8 _*_
+import threading
+import time
+from typing import Callable, Dict, Hashable, List, Optional, Set
+
+
+class _Batch:
+    """
+    一次合并请求
+    """
+
+    def __init__(self):
+        self.indexer_ids: Set[str] = set()
+        self.done = threading.Event()
+        self.results: Optional[Dict[str, List[dict]]] = None
+
+
+class SearchBatcher:
+    """
+    合并检索请求
+
+    MoviePilot 按索引器逐个调用 search，同一检索条件在 window 秒内到达的调用合并为一次请求，
+    请求中列出全部索引器 ID，结果按 indexerId 分发回各个调用。
+    第一个到达的调用负责等待窗口结束并发起请求，其它调用等待其结果。
+    """
+
+    def __init__(self, window: float = 0.5, timeout: float = 120):
+        """
+        :param window: 合并窗口（秒）
+        :param timeout: 等待合并请求完成的最长时间（秒）
+        """
+        self.window = window
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._pending: Dict[Hashable, _Batch] = {}
+
+    def search(self, key: Hashable, indexer_id: str,
+               fetch: Callable[[List[str]], Optional[Dict[str, List[dict]]]]) -> Optional[List[dict]]:
+        """
+        加入合并请求并返回该索引器的结果
+        :param key: 检索条件，如 (关键词, 分类, 页码)
+        :param indexer_id: 索引器 ID
+        :param fetch: 发起合并请求，参数为索引器 ID 列表，返回 {索引器ID: 结果列表}，失败返回 None
+        :return: 合并请求失败或等待超时返回 None
+        """
+        indexer_id = str(indexer_id)
+        with self._lock:
+            batch = self._pending.get(key)
+            leader = batch is None
+            if leader:
+                batch = _Batch()
+                self._pending[key] = batch
+            batch.indexer_ids.add(indexer_id)
+        if leader:
+            time.sleep(self.window)
+            with self._lock:
+                # 窗口结束后到达的调用进入新的合并请求
+                if self._pending.get(key) is batch:
+                    self._pending.pop(key)
+                indexer_ids = sorted(batch.indexer_ids)
+            try:
+                batch.results = fetch(indexer_ids)
+            finally:
+                batch.done.set()
+        elif not batch.done.wait(self.timeout):
+            return None
+        if batch.results is None:
+            return None
+        return batch.results.get(indexer_id, [])
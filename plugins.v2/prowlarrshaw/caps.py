@@ -0,0 +1,58 @@
+# _*_ coding: utf-8 _*_
+from typing import Dict, Optional, Any, Tuple
+
+from app.schemas import SearchContext, MediaType
+
+# Prowlarr 检索 query 中的 ID 标记，如 {ImdbId:tt0111161}
+ID_TOKENS = {"imdbid": "ImdbId", "tmdbid": "TmdbId", "tvdbid": "TvdbId", "season": "Season", "ep": "Episode"}
+# 可用于精确检索的 ID 参数
+ID_PARAMS = ("imdbid", "tmdbid", "tvdbid")
+# 媒体类型 -> (检索类型, capabilities 中的参数字段)
+SEARCH_MODES = {
+    MediaType.MOVIE: ("movie", "movieSearchParams"),
+    MediaType.TV: ("tvsearch", "tvSearchParams"),
+}
+
+
+def _context_value(search_context: SearchContext, name: str) -> Any:
+    """
+    依次从 SearchContext、media_info 中取值，没有该属性时返回 None
+    """
+    value = getattr(search_context, name, None)
+    if value is None:
+        value = getattr(search_context.media_info, name, None)
+    return value
+
+
+def media_ids(search_context: Optional[SearchContext]) -> Dict[str, str]:
+    """
+    从检索上下文中提取 imdbid/tmdbid/tvdbid/season/ep，忽略空值
+    """
+    if not search_context or not search_context.media_info:
+        return {}
+    media_info = search_context.media_info
+    values = {
+        "imdbid": getattr(media_info, "imdb_id", None),
+        "tmdbid": getattr(media_info, "tmdb_id", None),
+        "tvdbid": getattr(media_info, "tvdb_id", None),
+        "season": _context_value(search_context, "season"),
+        "ep": _context_value(search_context, "episode"),
+    }
+    return {key: str(value) for key, value in values.items()
+            if value not in (None, "", 0, "0") and str(value).lower() != "none"}
+
+
+def build_search(capabilities: Optional[Dict[str, Any]], keyword: str,
+                 search_context: Optional[SearchContext] = None) -> Tuple[str, str]:
+    """
+    构造 /api/v1/search 的 type 和 query，索引器支持且上下文带有 ID 时按 ID 检索，否则按关键词检索
+    :param capabilities: /api/v1/indexer 返回的 capabilities
+    :return: (type, query)
+    """
+    if capabilities and search_context and search_context.media_info:
+        search_type, field = SEARCH_MODES.get(search_context.media_info.type, (None, None))
+        supported = {str(param).lower() for param in capabilities.get(field) or ()}
+        ids = {key: value for key, value in media_ids(search_context).items() if key in supported}
+        if any(key in ids for key in ID_PARAMS):
+            return search_type, "".join(f"{{{ID_TOKENS[key]}:{value}}}" for key, value in ids.items())
+    return "search", keyword
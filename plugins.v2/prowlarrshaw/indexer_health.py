@@ -0,0 +1,168 @@
+# _*_ coding: utf-8 _*_
+import math
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Hashable, List, Any, Optional
+
+
+class _IndexerState:
+    """
+    单个索引器的延迟和熔断状态
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, window: int):
+        self.latencies: Deque[float] = deque(maxlen=window)
+        self.state = self.CLOSED
+        self.failures = 0
+        self.successes = 0
+        self.total_failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+        self.last_error = ""
+
+
+class IndexerHealth:
+    """
+    索引器健康状态
+
+    记录每个索引器最近的请求耗时，超时时间取近期 P95 耗时乘以 margin 再加 padding 秒，限制在 [min_timeout, max_timeout]，
+    样本不足时使用 max_timeout。
+    连续失败 failure_threshold 次后熔断，recovery_time 秒内直接跳过该索引器；
+    之后进入半开状态，只放行一个探测请求，成功则恢复，失败则重新熔断。
+    只有未熔断且近期 P95 耗时不超过 slow_latency 秒的索引器参与批量检索，慢索引器和探测请求单独检索。
+    """
+
+    STATE_NAMES = {_IndexerState.CLOSED: "正常", _IndexerState.OPEN: "熔断", _IndexerState.HALF_OPEN: "探测中"}
+
+    def __init__(self, failure_threshold: int = 3, recovery_time: float = 300,
+                 min_timeout: float = 10, max_timeout: float = 60, margin: float = 1.5, padding: float = 2,
+                 window: int = 50, min_samples: int = 5, slow_latency: float = 15):
+        self.failure_threshold = failure_threshold
+        self.recovery_time = recovery_time
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.margin = margin
+        self.padding = padding
+        self.window = window
+        self.min_samples = min_samples
+        self.slow_latency = slow_latency
+        self._lock = threading.Lock()
+        self._states: Dict[Hashable, _IndexerState] = {}
+
+    def _state(self, key: Hashable) -> _IndexerState:
+        state = self._states.get(key)
+        if state is None:
+            state = self._states[key] = _IndexerState(self.window)
+        return state
+
+    @staticmethod
+    def _p95(latencies) -> Optional[float]:
+        if not latencies:
+            return None
+        ordered = sorted(latencies)
+        return ordered[min(len(ordered) - 1, math.ceil(len(ordered) * 0.95) - 1)]
+
+    def timeout(self, key: Hashable) -> float:
+        """
+        该索引器的请求超时时间（秒）
+        """
+        with self._lock:
+            latencies = self._state(key).latencies
+            if len(latencies) < self.min_samples:
+                return self.max_timeout
+            p95 = self._p95(latencies)
+        return min(self.max_timeout, max(self.min_timeout, p95 * self.margin + self.padding))
+
+    def allow(self, key: Hashable) -> bool:
+        """
+        是否允许请求该索引器，熔断到期后只放行一个探测请求
+        """
+        with self._lock:
+            state = self._state(key)
+            if state.state == _IndexerState.CLOSED:
+                return True
+            if state.state == _IndexerState.OPEN:
+                if time.time() - state.opened_at < self.recovery_time:
+                    return False
+                state.state = _IndexerState.HALF_OPEN
+                state.probing = False
+            if state.probing:
+                return False
+            state.probing = True
+            return True
+
+    def batchable(self, key: Hashable) -> bool:
+        """
+        该索引器能否与其它索引器合并为一次请求：熔断、探测中或近期 P95 耗时过高时单独检索，不拖慢整批
+        """
+        with self._lock:
+            state = self._state(key)
+            if state.state != _IndexerState.CLOSED:
+                return False
+            p95 = self._p95(state.latencies)
+        return p95 is None or p95 <= self.slow_latency
+
+    def record(self, key: Hashable, ok: bool, latency: Optional[float] = None, error: str = ""):
+        """
+        记录一次请求结果
+        :param ok: 请求是否成功，无结果不算失败
+        :param latency: 耗时（秒），只记录成功请求的耗时
+        :param error: 失败原因
+        """
+        with self._lock:
+            state = self._state(key)
+            state.probing = False
+            if ok:
+                state.successes += 1
+                state.failures = 0
+                state.state = _IndexerState.CLOSED
+                if latency is not None:
+                    state.latencies.append(latency)
+                return
+            state.failures += 1
+            state.total_failures += 1
+            state.last_error = error
+            if state.state == _IndexerState.HALF_OPEN or state.failures >= self.failure_threshold:
+                state.state = _IndexerState.OPEN
+                state.opened_at = time.time()
+
+    def record_batch(self, keys, results: Optional[Dict[Hashable, list]], latency: float):
+        """
+        记录一次批量请求的结果
+        返回了结果的索引器记为成功，耗时记为整批耗时；没有结果的索引器无法区分是无结果还是在服务端失败，不记录；
+        整批失败时不记录，由各索引器随后的单独检索记录，避免一次故障重复计入熔断
+        :param keys: 参与批量请求的索引器
+        :param results: {索引器: 结果列表}，请求失败为 None
+        :param latency: 整批耗时（秒）
+        """
+        if results is None:
+            return
+        for key in keys:
+            if results.get(key):
+                self.record(key, True, latency)
+
+    def get(self, key: Hashable) -> Dict[str, Any]:
+        """
+        单个索引器的状态，用于页面展示
+        """
+        with self._lock:
+            state = self._state(key)
+            p95 = self._p95(state.latencies)
+            info = {
+                "state": self.STATE_NAMES[state.state],
+                "failures": state.failures,
+                "successes": state.successes,
+                "total_failures": state.total_failures,
+                "p95": round(p95, 2) if p95 is not None else None,
+                "last_error": state.last_error,
+            }
+        info["timeout"] = round(self.timeout(key), 1)
+        return info
+
+    def reset(self):
+        with self._lock:
+            self._states.clear()
@@ -0,0 +1,114 @@
+# _*_ coding: utf-8 _*_
+import codecs
+import json
+import re
+from typing import Iterable, Iterator, Optional, Dict, Any, Sequence
+
+# 每次从响应中读取的字节数
+CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE = re.compile(r"\s*")
+_DECODER = json.JSONDecoder()
+
+
+def iter_json_array(chunks: Iterable[bytes], fields: Optional[Sequence[str]] = None) -> Iterator[Dict[str, Any]]:
+    """
+    流式解析顶层为数组的 JSON，每读完一个元素就用 raw_decode 解码并产出，内存中只保留当前未读完的元素
+    :param chunks: JSON 内容分块，如 response.iter_content()
+    :param fields: 只保留的字段，为空时保留全部字段
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    buf = ""
+    started = False
+    for chunk in chunks:
+        if not chunk:
+            continue
+        buf += decoder.decode(chunk)
+        pos = 0
+        while True:
+            pos = _WHITESPACE.match(buf, pos).end()
+            if pos >= len(buf):
+                break
+            char = buf[pos]
+            if not started:
+                if char != "[":
+                    raise ValueError(f"返回的不是 JSON 数组: {buf[pos:pos + 200]}")
+                started = True
+                pos += 1
+                continue
+            if char == "]":
+                return
+            if char == ",":
+                pos += 1
+                continue
+            try:
+                item, end = _DECODER.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                # 元素未读完，等待下一块
+                break
+            pos = end
+            if isinstance(item, dict):
+                yield {field: item.get(field) for field in fields} if fields else item
+        # 丢弃已处理的内容，只保留未读完的元素
+        buf = buf[pos:]
+    if buf.strip():
+        raise ValueError(f"JSON 数组不完整: {buf[:200]}")
+
+
+def parse_json_response(response, fields: Optional[Sequence[str]] = None,
+                        limit: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """
+    边下载边解析 JSON 数组响应，请求需使用 stream=True，提前结束时关闭连接
+    :param response: requests.Response
+    :param fields: 只保留的字段
+    :param limit: 最多产出的结果数，为空或 0 时不限制
+    """
+    try:
+        for count, item in enumerate(iter_json_array(response.iter_content(chunk_size=CHUNK_SIZE), fields), 1):
+            yield item
+            if limit and count >= limit:
+                return
+    finally:
+        response.close()
+
+
+if __name__ == "__main__":
+    # 与 response.json() 整体解析对比耗时和峰值内存：python json_stream.py [条目数]
+    import sys
+    import time
+    import tracemalloc
+
+    _FIELDS = ("title", "downloadUrl", "magnetUrl", "sortTitle", "size", "seeders", "publishDate", "infoUrl", "guid")
+
+    def _release(i: int) -> dict:
+        return {
+            "guid": f"https://tracker/details/{i}", "age": 10, "ageHours": 240.5, "ageMinutes": 14430.2,
+            "size": 1024 ** 3 + i, "files": 3, "grabs": i % 50, "indexerId": 1, "indexer": "Demo",
+            "title": f"Movie.{i}.2024.1080p.WEB-DL.H264-GRP \"quoted\" \\ [x]", "sortTitle": f"movie {i} 2024",
+            "imdbId": 1000000 + i, "tmdbId": i, "publishDate": "2024-01-01T00:00:00Z",
+            "downloadUrl": f"https://prowlarr/dl/{i}", "infoUrl": f"https://tracker/details/{i}",
+            "indexerFlags": ["freeleech"], "categories": [{"id": 2000, "name": "Movies", "subCategories": []}],
+            "seeders": i % 100, "leechers": i % 7, "protocol": "torrent", "fileName": f"Movie.{i}.torrent",
+        }
+
+    def _measure(func):
+        tracemalloc.start()
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return result, elapsed, peak
+
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    body = json.dumps([_release(i) for i in range(total)], ensure_ascii=False).encode("utf-8")
+    chunks = [body[i:i + CHUNK_SIZE] for i in range(0, len(body), CHUNK_SIZE)]
+    print(f"{total} 条，{len(body) / 1024 / 1024:.1f}MB")
+    old, old_time, old_peak = _measure(
+        lambda: [{k: e.get(k) for k in _FIELDS} for e in json.loads(b"".join(chunks))])
+    new, new_time, new_peak = _measure(lambda: list(iter_json_array(chunks, _FIELDS)))
+    _, first_time, first_peak = _measure(lambda: next(iter_json_array(iter(chunks), _FIELDS)))
+    assert old == new, "解析结果不一致"
+    print(f"json.loads   {old_time * 1000:>8.1f}ms  峰值 {old_peak / 1024 / 1024:>6.1f}MB")
+    print(f"流式解析     {new_time * 1000:>8.1f}ms  峰值 {new_peak / 1024 / 1024:>6.1f}MB")
+    print(f"首条结果     {first_time * 1000:>8.1f}ms  峰值 {first_peak / 1024 / 1024:>6.1f}MB")
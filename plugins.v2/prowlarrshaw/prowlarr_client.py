@@ -0,0 +1,105 @@
+# _*_ coding: utf-8 _*_
+import hashlib
+import json
+import threading
+import time
+from typing import List, Optional, Dict, Any
+
+import requests
+
+from app.log import logger
+from app.plugins.prowlarrshaw.json_stream import parse_json_response
+
+
+class ProwlarrClient:
+    """
+    Prowlarr 接口客户端
+
+    通过 /api/v1/indexer 获取索引器列表，不使用需要统计全部历史记录的 /api/v1/indexerstats。
+    列表只保留检索需要的字段，在 ttl 内直接使用缓存，过期后带 ETag 条件刷新，
+    Prowlarr 未返回 ETag 时以内容摘要判断是否有变化。
+    """
+
+    INDEXERS_PATH = "/api/v1/indexer"
+    # 索引器列表只解析需要的字段，跳过体积较大的 fields 配置项
+    INDEXER_FIELDS = ("id", "name", "enable", "protocol", "privacy", "capabilities")
+
+    def __init__(self, host: str, api_key: str, user_agent: Optional[str] = None,
+                 proxies: Optional[dict] = None, ttl: float = 300, timeout=(10, 30)):
+        """
+        :param host: Prowlarr 地址
+        :param api_key: API Key
+        :param user_agent: User-Agent
+        :param proxies: 代理
+        :param ttl: 索引器列表缓存有效期（秒）
+        :param timeout: 请求超时（连接，读取）
+        """
+        self.host = host.rstrip("/")
+        self.ttl = ttl
+        self.timeout = timeout
+        self._session = requests.Session()
+        self._session.headers.update({
+            "X-Api-Key": api_key or "",
+            "Accept": "application/json, text/javascript, */*; q=0.01"
+        })
+        if user_agent:
+            self._session.headers["User-Agent"] = user_agent
+        if proxies:
+            self._session.proxies.update(proxies)
+        self._lock = threading.Lock()
+        # 索引器列表缓存
+        self._indexers: Optional[List[Dict[str, Any]]] = None
+        self._fetched_at = 0.0
+        self._etag: Optional[str] = None
+        self.fingerprint: Optional[str] = None
+        # 索引器ID -> capabilities
+        self.capabilities: Dict[str, Dict[str, Any]] = {}
+
+    def close(self):
+        self._session.close()
+
+    def get_indexers(self, refresh: bool = False) -> Optional[List[Dict[str, Any]]]:
+        """
+        获取索引器列表
+        :param refresh: 忽略 ttl 立即条件刷新
+        :return: 只含 INDEXER_FIELDS 的索引器列表，请求失败且没有缓存时返回 None
+        """
+        with self._lock:
+            if not refresh and self._indexers is not None and time.time() - self._fetched_at < self.ttl:
+                return self._indexers
+            headers = {"If-None-Match": self._etag} if self._indexers is not None and self._etag else {}
+            try:
+                res = self._session.get(f"{self.host}{self.INDEXERS_PATH}", headers=headers,
+                                        timeout=self.timeout, stream=True)
+            except requests.RequestException as e:
+                logger.warning(f"获取 Prowlarr 索引器失败：{str(e)}")
+                return self._indexers
+            if res.status_code == 304 and self._indexers is not None:
+                res.close()
+                self._fetched_at = time.time()
+                return self._indexers
+            if not res.ok:
+                logger.warning(f"获取 Prowlarr 索引器失败：HTTP {res.status_code}")
+                res.close()
+                return self._indexers
+            try:
+                indexers = list(parse_json_response(res, fields=self.INDEXER_FIELDS))
+            except ValueError as e:
+                logger.warning(f"Prowlarr 索引器列表解析失败：{str(e)}")
+                return self._indexers
+            self._fetched_at = time.time()
+            self._etag = res.headers.get("ETag")
+            fingerprint = self._fingerprint(indexers)
+            if fingerprint != self.fingerprint:
+                self._indexers = indexers
+                self.fingerprint = fingerprint
+                self.capabilities = {str(v.get("id")): v.get("capabilities") or {} for v in indexers}
+            return self._indexers
+
+    @staticmethod
+    def _fingerprint(indexers: List[Dict[str, Any]]) -> str:
+        """
+        索引器列表的内容摘要，与顺序无关
+        """
+        keys = sorted(json.dumps(v, sort_keys=True, ensure_ascii=False) for v in indexers)
+        return hashlib.md5("\n".join(keys).encode("utf-8")).hexdigest()
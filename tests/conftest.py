@@ -0,0 +1,184 @@
+# _*_ coding: utf-8 _*_
+"""
+插件工具模块的单元测试
+
+插件以 app.plugins.<插件名> 导入，在 MoviePilot 环境中运行时使用 MoviePilot 的 app 包；
+否则注册一个最小的宿主环境，只提供被测模块用到的 app.log、app.core.config.settings、
+SingletonClass、SystemUtils、StringUtils、MediaType/SearchContext、SearchFilterHelper、SiteRateLimiter，
+以及不做处理的 retry、rate_limit 装饰器。
+插件包注册为不执行 __init__.py 的空包，只导入被测的工具模块，不需要插件运行时依赖。
+"""
+import abc
+import enum
+import logging
+import sys
+import tempfile
+import types
+from pathlib import Path
+from urllib.parse import urlparse
+
+import pytest
+
+PLUGINS_PATH = Path(__file__).resolve().parent.parent / "plugins.v2"
+PLUGINS = ("extendspider", "jackettshaw", "prowlarrshaw")
+
+
+def _package(name: str, path: Path = None) -> types.ModuleType:
+    module = sys.modules.get(name)
+    if module is None:
+        module = types.ModuleType(name)
+        module.__path__ = []
+        sys.modules[name] = module
+        parent, _, child = name.rpartition(".")
+        if parent:
+            setattr(sys.modules[parent], child, module)
+    if path is not None and str(path) not in module.__path__:
+        module.__path__.append(str(path))
+    return module
+
+
+def _module(name: str, **attrs) -> types.ModuleType:
+    module = types.ModuleType(name)
+    module.__dict__.update(attrs)
+    sys.modules[name] = module
+    parent, _, child = name.rpartition(".")
+    if parent:
+        setattr(sys.modules[parent], child, module)
+    return module
+
+
+def _install_host():
+    """
+    最小的 MoviePilot 宿主环境
+    """
+
+    class SingletonClass(abc.ABCMeta, type):
+        _instances = {}
+
+        def __call__(cls, *args, **kwargs):
+            if cls not in cls._instances:
+                cls._instances[cls] = super().__call__(*args, **kwargs)
+            return cls._instances[cls]
+
+    class SystemUtils:
+        @staticmethod
+        def is_docker() -> bool:
+            return False
+
+    class StringUtils:
+        @staticmethod
+        def get_url_domain(url: str) -> str:
+            return urlparse(url).hostname or ""
+
+        @staticmethod
+        def str_filesize(size) -> str:
+            return f"{size}B"
+
+        @staticmethod
+        def num_filesize(text) -> int:
+            try:
+                return int(text)
+            except (TypeError, ValueError):
+                return 0
+
+        @staticmethod
+        def str_to_timestamp(text) -> int:
+            return 0
+
+    class MediaType(enum.Enum):
+        MOVIE = "电影"
+        TV = "电视剧"
+
+    class SearchContext:
+        def __init__(self, **kwargs):
+            self.area = None
+            self.enable_search_filter = False
+            self.media_info = None
+            self.search_type = None
+            self.search_sub_id = None
+            self.__dict__.update(kwargs)
+
+    class SearchFilterHelper:
+        def do_filter(self, site, keyword, titles, ctx, *args):
+            return {title: title for title in titles}
+
+    class SiteRateLimiter:
+        def __init__(self, **kwargs):
+            pass
+
+        def check_rate_limit(self):
+            return False, ""
+
+    def _passthrough(*args, **kwargs):
+        return lambda func: func
+
+    settings = types.SimpleNamespace(
+        PLUGIN_DATA_PATH=Path(tempfile.mkdtemp(prefix="plugin_data_")),
+        USER_AGENT="Mozilla/5.0 (test)",
+        FLARESOLVERR_URL="http://flaresolverr:8191",
+        PROXY=None, PROXY_HOST=None, PROXY_SERVER=None, TZ="Asia/Shanghai",
+    )
+
+    _package("app")
+    _module("app.log", logger=logging.getLogger("moviepilot"))
+    _package("app.core")
+    _module("app.core.config", settings=settings)
+    _package("app.utils")
+    _module("app.utils.singleton", SingletonClass=SingletonClass)
+    _module("app.utils.system", SystemUtils=SystemUtils)
+    _module("app.utils.string", StringUtils=StringUtils)
+    _module("app.utils.common", retry=_passthrough)
+    _module("app.utils.ratelimit", rate_limit=_passthrough)
+    _module("app.schemas", MediaType=MediaType, SearchContext=SearchContext)
+    _package("app.helper")
+    _module("app.helper.search_filter", SearchFilterHelper=SearchFilterHelper)
+    _package("app.sites")
+    _module("app.sites.site_limiter", SiteRateLimiter=SiteRateLimiter)
+    _package("app.plugins")
+
+
+try:
+    import app.log  # noqa: F401
+    import app.plugins  # noqa: F401
+except ImportError:
+    _install_host()
+
+# pass_verify、browser 按 utils.system 导入
+if "utils.system" not in sys.modules:
+    try:
+        import utils.system  # noqa: F401
+    except ImportError:
+        _package("utils")
+        _module("utils.system", SystemUtils=sys.modules["app.utils.system"].SystemUtils)
+
+_package("app.plugins", PLUGINS_PATH)
+for _plugin in PLUGINS:
+    _package(f"app.plugins.{_plugin}", PLUGINS_PATH / _plugin)
+_package("app.plugins.extendspider.utils", PLUGINS_PATH / "extendspider" / "utils")
+_package("app.plugins.extendspider.plugins", PLUGINS_PATH / "extendspider" / "plugins")
+
+
+@pytest.fixture(autouse=True)
+def _plugin_data_path(tmp_path, monkeypatch):
+    """
+    每个用例使用独立的插件数据目录
+    """
+    from app.core.config import settings
+    monkeypatch.setattr(settings, "PLUGIN_DATA_PATH", tmp_path)
+    return tmp_path
+
+
+@pytest.fixture(autouse=True)
+def _reset_singletons():
+    """
+    每个用例使用新的单例
+    """
+    from app.utils.singleton import SingletonClass
+    instances = getattr(SingletonClass, "_instances", None)
+    saved = dict(instances) if isinstance(instances, dict) else None
+    if saved is not None:
+        instances.clear()
+    yield
+    if saved is not None:
+        instances.clear()
+        instances.update(saved)
@@ -0,0 +1,106 @@
+# _*_ coding: utf-8 _*_
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("cachetools")
+
+from app.plugins.jackettshaw.aggregate import AggregateCache  # noqa: E402
+
+
+def test_loader_called_once_and_cached():
+    cache = AggregateCache()
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return {"a": [{"title": "1"}], "b": []}
+
+    assert cache.get(("kw", "2000"), loader) == {"a": [{"title": "1"}], "b": []}
+    assert cache.get(("kw", "2000"), loader)["a"] == [{"title": "1"}]
+    assert len(calls) == 1
+    cache.get(("kw", "5000"), loader)
+    assert len(calls) == 2
+
+
+def test_concurrent_callers_share_one_load():
+    cache = AggregateCache()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def loader():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return {"a": [1]}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get("kw", loader))) for _ in range(5)]
+    threads[0].start()
+    assert started.wait(5)
+    for t in threads[1:]:
+        t.start()
+    time.sleep(0.05)
+    release.set()
+    for t in threads:
+        t.join(5)
+    assert len(calls) == 1
+    assert results == [{"a": [1]}] * 5
+
+
+def test_failed_load_not_cached():
+    cache = AggregateCache()
+    started = threading.Event()
+    release = threading.Event()
+
+    def failing():
+        started.set()
+        release.wait(5)
+        return None
+
+    follower = []
+    leader = threading.Thread(target=cache.get, args=("kw", failing))
+    leader.start()
+    assert started.wait(5)
+    t = threading.Thread(target=lambda: follower.append(cache.get("kw", lambda: {"a": [2]})))
+    t.start()
+    release.set()
+    leader.join(5)
+    t.join(5)
+    # 发起者失败时等待方返回 None，由调用方单独检索
+    assert follower == [None]
+    assert cache.get("kw", lambda: {"a": [3]}) == {"a": [3]}
+
+
+def test_loader_exception_releases_waiters():
+    cache = AggregateCache()
+
+    def broken():
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        cache.get("kw", broken)
+    assert cache.get("kw", lambda: {"a": []}) == {"a": []}
+
+
+def test_wait_timeout():
+    cache = AggregateCache()
+    started = threading.Event()
+    release = threading.Event()
+    leader = threading.Thread(target=cache.get, args=("kw", lambda: started.set() or release.wait(5) and {}))
+    leader.start()
+    assert started.wait(5)
+    assert cache.get("kw", lambda: {"x": []}, timeout=0.05) is None
+    release.set()
+    leader.join(5)
+
+
+def test_ttl_and_clear():
+    cache = AggregateCache(ttl=0.05)
+    cache.get("kw", lambda: {"a": [1]})
+    time.sleep(0.1)
+    assert cache.get("kw", lambda: {"a": [2]}) == {"a": [2]}
+    cache.clear()
+    assert cache.get("kw", lambda: {"a": [3]}) == {"a": [3]}
@@ -0,0 +1,114 @@
+# _*_ coding: utf-8 _*_
+import threading
+
+from app.plugins.prowlarrshaw.batcher import SearchBatcher
+from app.plugins.prowlarrshaw.indexer_health import IndexerHealth
+
+
+def _search_all(batcher: SearchBatcher, requests, fetch):
+    """
+    并发发起 (key, indexer_id) 检索，返回 {indexer_id: 结果}
+    """
+    results = {}
+
+    def search(key, indexer_id):
+        results[indexer_id] = batcher.search(key, indexer_id, fetch)
+
+    threads = [threading.Thread(target=search, args=request) for request in requests]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    return results
+
+
+def test_same_key_merged_into_one_request():
+    batcher = SearchBatcher(window=0.2)
+    calls = []
+
+    def fetch(ids):
+        calls.append(ids)
+        return {indexer_id: [{"title": f"from {indexer_id}"}] for indexer_id in ids if indexer_id != "3"}
+
+    results = _search_all(batcher, [("avatar", "1"), ("avatar", "2"), ("avatar", 3)], fetch)
+    assert calls == [["1", "2", "3"]]
+    assert results == {"1": [{"title": "from 1"}], "2": [{"title": "from 2"}], 3: []}
+
+
+def test_different_keys_not_merged():
+    batcher = SearchBatcher(window=0.1)
+    calls = []
+
+    def fetch(ids):
+        calls.append(ids)
+        return {indexer_id: [] for indexer_id in ids}
+
+    _search_all(batcher, [("avatar", "1"), ("titanic", "2")], fetch)
+    assert sorted(calls) == [["1"], ["2"]]
+
+
+def test_failed_request_returns_none_for_every_member():
+    batcher = SearchBatcher(window=0.1)
+    results = _search_all(batcher, [("avatar", "1"), ("avatar", "2")], lambda ids: None)
+    assert results == {"1": None, "2": None}
+
+
+def test_follower_times_out():
+    batcher = SearchBatcher(window=0.05, timeout=0.1)
+    release = threading.Event()
+
+    def fetch(ids):
+        release.wait(5)
+        return {indexer_id: [] for indexer_id in ids}
+
+    leader = threading.Thread(target=batcher.search, args=("avatar", "1", fetch))
+    leader.start()
+    try:
+        assert batcher.search("avatar", "2", fetch) is None
+    finally:
+        release.set()
+        leader.join(5)
+
+
+def test_calls_after_window_start_new_batch():
+    batcher = SearchBatcher(window=0.01)
+    calls = []
+
+    def fetch(ids):
+        calls.append(ids)
+        return {indexer_id: [] for indexer_id in ids}
+
+    assert batcher.search("avatar", "1", fetch) == []
+    assert batcher.search("avatar", "2", fetch) == []
+    assert calls == [["1"], ["2"]]
+
+
+def test_only_healthy_fast_indexers_batchable():
+    health = IndexerHealth(failure_threshold=1, recovery_time=0, slow_latency=5)
+    # 没有样本时参与批量检索
+    assert health.batchable("new")
+    for _ in range(5):
+        health.record("fast", True, 1)
+        health.record("slow", True, 10)
+    assert health.batchable("fast")
+    assert not health.batchable("slow")
+    health.record("broken", False, error="timeout")
+    assert not health.batchable("broken")
+    # 熔断到期后的探测请求单独检索
+    assert health.allow("broken")
+    assert not health.batchable("broken")
+    health.record("broken", True, 1)
+    assert health.batchable("broken")
+
+
+def test_record_batch_only_members_with_results():
+    health = IndexerHealth(min_samples=1)
+    health.record_batch(["1", "2", "3"], {"1": [{"title": "a"}], "2": []}, 3.0)
+    assert health.get("1")["successes"] == 1 and health.get("1")["p95"] == 3.0
+    # 没有结果的索引器不计入成功，也不记录耗时
+    for indexer_id in ("2", "3"):
+        assert health.get(indexer_id)["successes"] == 0 and health.get(indexer_id)["p95"] is None
+    # 整批失败不记录，由单独检索记录
+    health.record_batch(["1", "2"], None, 3.0)
+    assert health.get("1")["successes"] == 1
+    assert health.get("2")["failures"] == 0
@@ -0,0 +1,183 @@
+# _*_ coding: utf-8 _*_
+import threading
+
+import pytest
+
+pytest.importorskip("playwright")
+pytest.importorskip("playwright_stealth")
+pytest.importorskip("DrissionPage")
+
+from app.plugins.extendspider.utils import browser_pool  # noqa: E402
+from app.plugins.extendspider.utils.browser_pool import PlaywrightPool  # noqa: E402
+
+
+class FakePage:
+    def __init__(self, context):
+        self.context = context
+
+    def close(self):
+        if self in self.context.pages:
+            self.context.pages.remove(self)
+
+
+class FakeContext:
+    def __init__(self, proxy, ua):
+        self.proxy = proxy
+        self.ua = ua
+        self.pages = []
+        self.cookies = []
+        self.routes = []
+        self.closed = False
+        self._on_page = []
+
+    def on(self, event, callback):
+        if event == "page":
+            self._on_page.append(callback)
+
+    def new_page(self):
+        page = FakePage(self)
+        self.pages.append(page)
+        for callback in self._on_page:
+            callback(page)
+        return page
+
+    def add_cookies(self, cookies):
+        self.cookies.extend(cookies)
+
+    def clear_cookies(self):
+        self.cookies = []
+
+    def route(self, pattern, handler):
+        self.routes.append(handler)
+
+    def unroute(self, pattern, handler):
+        self.routes.remove(handler)
+
+    def close(self):
+        self.closed = True
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.closed = False
+
+    def is_connected(self):
+        return not self.closed
+
+    def close(self):
+        self.closed = True
+
+
+class FakePlaywright:
+    def start(self):
+        return self
+
+    def stop(self):
+        pass
+
+
+class FakePolicy:
+    def playwright_handler(self):
+        return lambda route: None
+
+
+@pytest.fixture
+def fake_playwright(monkeypatch):
+    launched = []
+    saved = []
+    monkeypatch.setattr(browser_pool, "sync_playwright", FakePlaywright)
+    monkeypatch.setattr(browser_pool, "launch_chromium",
+                        lambda playwright, headless=True: launched.append(FakeBrowser()) or launched[-1])
+    monkeypatch.setattr(browser_pool, "new_browser_context",
+                        lambda browser, proxy=False, ua=None: FakeContext(proxy, ua))
+    monkeypatch.setattr(browser_pool, "load_context_clearance", lambda context, proxy=False, ua=None: None)
+    monkeypatch.setattr(browser_pool, "save_context_clearance",
+                        lambda context, proxy=False, ua=None: saved.append((proxy, ua)))
+    return launched, saved
+
+
+@pytest.fixture
+def pool(fake_playwright):
+    pool = PlaywrightPool(max_browsers=2, max_pages_per_browser=3, idle_timeout=60)
+    yield pool
+    pool.shutdown()
+
+
+def test_run_returns_result_with_cookies(pool):
+    cookies = [{"name": "cf_clearance", "value": "x", "domain": ".example.com", "path": "/"}]
+    result = pool.run(lambda context, n: (n, list(context.cookies)), 7, cookies=cookies, timeout=5)
+    assert result == (7, cookies)
+
+
+def test_context_reused_and_cleaned(pool, fake_playwright):
+    _, saved = fake_playwright
+
+    def task(context):
+        context.new_page()
+        return context
+
+    policy = FakePolicy()
+    first = pool.run(task, cookies=[{"name": "a"}], resource_policy=policy, ua="ua", timeout=5)
+    second = pool.run(task, ua="ua", timeout=5)
+    assert first is second
+    # 归还时关闭页面、清空 cookies 并撤销拦截
+    assert first.pages == [] and first.cookies == [] and first.routes == []
+    assert saved == [(False, "ua"), (False, "ua")]
+    stats = pool.stats()
+    assert stats["context_created"] == 1 and stats["context_hits"] == 1
+    # 不同 UA 使用不同的上下文
+    assert pool.run(task, ua="other", timeout=5) is not first
+
+
+def test_browser_recycled_after_max_pages(pool, fake_playwright):
+    launched, _ = fake_playwright
+
+    def task(context):
+        context.new_page()
+
+    for _ in range(4):
+        pool.run(task, timeout=5)
+    assert pool.stats()["recycled"] >= 1
+    assert launched[0].closed
+
+
+def test_exception_propagates(pool):
+    def task(context):
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        pool.run(task, timeout=5)
+    # 工作线程仍可继续处理任务
+    assert pool.run(lambda context: "ok", timeout=5) == "ok"
+
+
+def test_submit_inside_worker_rejected(pool):
+    def task(context):
+        with pytest.raises(RuntimeError):
+            pool.submit(lambda c: None)
+        return True
+
+    assert pool.run(task, timeout=5)
+
+
+def test_workers_capped_by_max_browsers(pool):
+    release = threading.Event()
+    futures = [pool.submit(lambda context: release.wait(5)) for _ in range(5)]
+    assert pool.stats()["workers"] <= 2
+    release.set()
+    assert all(future.result(timeout=5) for future in futures)
+    assert pool.stats()["tasks"] == 5
+
+
+def test_shutdown_cancels_pending(fake_playwright):
+    pool = PlaywrightPool(max_browsers=1, idle_timeout=60)
+    release = threading.Event()
+    started = threading.Event()
+    busy = pool.submit(lambda context: started.set() or release.wait(5))
+    assert started.wait(5)
+    pending = pool.submit(lambda context: "never")
+    threading.Timer(0.2, release.set).start()
+    pool.shutdown()
+    assert busy.result(timeout=5)
+    assert pending.cancelled() or pending.done()
+    assert pool.stats()["workers"] == 0
@@ -0,0 +1,106 @@
+# _*_ coding: utf-8 _*_
+import types
+
+import pytest
+
+pytest.importorskip("cachetools")
+
+from app.plugins.jackettshaw import caps as jackett_caps  # noqa: E402
+from app.plugins.prowlarrshaw import caps as prowlarr_caps  # noqa: E402
+from app.schemas import MediaType, SearchContext  # noqa: E402
+
+CAPS = b"""<?xml version="1.0" encoding="UTF-8"?>
+<caps>
+  <searching>
+    <search available="yes" supportedParams="q" />
+    <tv-search available="yes" supportedParams="q,season,ep,imdbid,TVDBID" />
+    <movie-search available="yes" supportedParams="q,imdbid" />
+    <music-search available="yes" supportedParams="q" />
+    <book-search available="no" supportedParams="q" />
+  </searching>
+</caps>"""
+
+
+def _context(media_type, season=None, episode=None, **ids):
+    media_info = types.SimpleNamespace(type=media_type, imdb_id=ids.get("imdb_id"), tmdb_id=ids.get("tmdb_id"),
+                                       tvdb_id=ids.get("tvdb_id"), season=None, episode=None)
+    context = SearchContext()
+    context.media_info = media_info
+    context.season = season
+    context.episode = episode
+    return context
+
+
+def test_parse_caps():
+    modes = jackett_caps.parse_caps(CAPS)
+    assert set(modes) == {"search", "tv-search", "movie-search"}
+    assert modes["tv-search"] == frozenset({"q", "season", "ep", "imdbid", "tvdbid"})
+    assert jackett_caps.parse_caps(b"<caps></caps>") == {}
+
+
+def test_media_ids_skip_empty_values():
+    context = _context(MediaType.TV, season=2, episode=0, imdb_id="tt1", tmdb_id=None, tvdb_id="None")
+    assert jackett_caps.media_ids(context) == {"imdbid": "tt1", "season": "2"}
+    assert jackett_caps.media_ids(None) == {}
+
+
+def test_jackett_movie_search_by_id():
+    modes = jackett_caps.parse_caps(CAPS)
+    context = _context(MediaType.MOVIE, imdb_id="tt0111161", tmdb_id=278)
+    # 索引器不支持 tmdbid，只带 imdbid
+    assert jackett_caps.build_search_params(modes, "肖申克", [2000], context) == \
+        {"t": "movie", "cat": "2000", "imdbid": "tt0111161"}
+
+
+def test_jackett_tv_search_with_season():
+    modes = jackett_caps.parse_caps(CAPS)
+    context = _context(MediaType.TV, season=1, episode=3, tvdb_id=81189)
+    assert jackett_caps.build_search_params(modes, "绝命毒师", [5000, 5070], context) == \
+        {"t": "tvsearch", "cat": "5000,5070", "tvdbid": "81189", "season": "1", "ep": "3"}
+
+
+def test_jackett_keyword_fallback():
+    modes = jackett_caps.parse_caps(CAPS)
+    expected = {"t": "search", "q": "沙丘", "cat": "2000"}
+    # 没有 caps、没有上下文或只有不支持的 ID 时按关键词检索
+    assert jackett_caps.build_search_params(None, "沙丘", [2000], _context(MediaType.MOVIE, imdb_id="tt1")) == expected
+    assert jackett_caps.build_search_params(modes, "沙丘", [2000]) == expected
+    assert jackett_caps.build_search_params(modes, "沙丘", [2000], _context(MediaType.MOVIE, tmdb_id=1)) == expected
+    # 只有季集没有 ID 不能精确检索
+    assert jackett_caps.build_search_params(modes, "沙丘", [2000], _context(MediaType.TV, season=1))["t"] == "search"
+
+
+def test_caps_cache():
+    cache = jackett_caps.CapsCache(fail_ttl=600)
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return {"search": frozenset({"q"})}
+
+    assert cache.get("a", loader) == {"search": frozenset({"q"})}
+    cache.get("a", loader)
+    assert len(calls) == 1
+    # 失败结果在 fail_ttl 内不再重试
+    assert cache.get("b", lambda: calls.append(2)) is None
+    assert cache.get("b", loader) is None
+    assert calls == [1, 2]
+    cache.clear()
+    assert cache.get("b", loader) is not None
+
+
+def test_prowlarr_build_search():
+    capabilities = {"movieSearchParams": ["q", "ImdbId", "TmdbId"], "tvSearchParams": ["q", "TvdbId", "Season", "Ep"]}
+    movie = _context(MediaType.MOVIE, imdb_id="tt0111161", tmdb_id=278)
+    assert prowlarr_caps.build_search(capabilities, "肖申克", movie) == \
+        ("movie", "{ImdbId:tt0111161}{TmdbId:278}")
+    tv = _context(MediaType.TV, season=1, episode=3, imdb_id="tt0903747", tvdb_id=81189)
+    assert prowlarr_caps.build_search(capabilities, "绝命毒师", tv) == \
+        ("tvsearch", "{TvdbId:81189}{Season:1}{Episode:3}")
+
+
+def test_prowlarr_keyword_fallback():
+    assert prowlarr_caps.build_search(None, "沙丘", _context(MediaType.MOVIE, imdb_id="tt1")) == ("search", "沙丘")
+    assert prowlarr_caps.build_search({"movieSearchParams": ["q"]}, "沙丘",
+                                      _context(MediaType.MOVIE, imdb_id="tt1")) == ("search", "沙丘")
+    assert prowlarr_caps.build_search({"movieSearchParams": ["ImdbId"]}, "沙丘") == ("search", "沙丘")
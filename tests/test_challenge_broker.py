@@ -0,0 +1,130 @@
+# _*_ coding: utf-8 _*_
+import threading
+import time
+
+import pytest
+
+from app.plugins.extendspider.utils.challenge_broker import ChallengeBroker, RefreshSkipped
+
+
+@pytest.fixture
+def broker():
+    broker = ChallengeBroker(refresh_before=120, check_interval=0.05, wait_timeout=5)
+    yield broker
+    broker.shutdown()
+
+
+def test_single_solver_per_domain(broker):
+    calls = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def solver():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "token"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(broker.solve("https://www.example.com/a", solver)))
+    leader.start()
+    assert started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(broker.solve("example.com", solver)))
+                 for _ in range(3)]
+    for t in followers:
+        t.start()
+    time.sleep(0.05)
+    release.set()
+    for t in [leader, *followers]:
+        t.join(5)
+    assert results == ["token"] * 4
+    assert len(calls) == 1
+    stat = broker.stats()["example.com"]
+    assert stat["solves"] == 1 and stat["waits"] == 3 and stat["shared"] == 3
+
+
+def test_recheck_failure_solves_again(broker):
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def solver():
+        calls.append(threading.current_thread().name)
+        if len(calls) == 1:
+            started.set()
+            release.wait(5)
+        return True
+
+    leader = threading.Thread(target=broker.solve, args=("example.com", solver), name="leader")
+    leader.start()
+    assert started.wait(5)
+    result = []
+    follower = threading.Thread(target=lambda: result.append(broker.solve("example.com", solver,
+                                                                          recheck=lambda: False)),
+                                name="follower")
+    follower.start()
+    release.set()
+    leader.join(5)
+    follower.join(5)
+    assert result == [True]
+    assert calls == ["leader", "follower"]
+
+
+def test_failure_recorded(broker):
+    assert not broker.solve("example.com", lambda: None)
+
+    def broken():
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        broker.solve("example.com", broken)
+    stat = broker.stats()["example.com"]
+    assert stat["solves"] == 2 and stat["failures"] == 2 and stat["last_error"] == "boom"
+    assert not stat["inflight"]
+
+
+def test_background_refresh(broker):
+    refreshed = threading.Event()
+    expires = [time.time() + 60]
+
+    def refresh():
+        expires[0] = time.time() + 3600
+        refreshed.set()
+        return True
+
+    broker.register_refresh("https://example.com/", refresh, lambda: expires[0])
+    assert refreshed.wait(5)
+    time.sleep(0.2)
+    stat = broker.stats()["example.com"]
+    # 刷新后过期时间延后，不再重复刷新
+    assert stat["refreshes"] == 1 and stat["solves"] == 1 and stat["refresh"]
+
+
+def test_refresh_skipped_not_counted_as_failure(broker):
+    attempts = []
+
+    def refresh():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise RefreshSkipped("busy")
+        return True
+
+    broker.register_refresh("example.com", refresh, lambda: time.time() + 60 if len(attempts) < 3 else None)
+    deadline = time.time() + 5
+    while len(attempts) < 3 and time.time() < deadline:
+        time.sleep(0.02)
+    time.sleep(0.1)
+    stat = broker.stats()["example.com"]
+    assert stat["refresh_skipped"] == 2
+    assert stat["failures"] == 0 and stat["solves"] == 1
+    assert not stat["inflight"]
+
+
+def test_idle_refresher_dropped():
+    broker = ChallengeBroker(check_interval=0.05, idle_timeout=0)
+    try:
+        broker.register_refresh("example.com", lambda: True, lambda: None)
+        time.sleep(0.2)
+        assert broker._refreshers == {}
+    finally:
+        broker.shutdown()
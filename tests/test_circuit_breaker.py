@@ -0,0 +1,63 @@
+# _*_ coding: utf-8 _*_
+import pytest
+
+from app.plugins.extendspider.utils import circuit_breaker
+from app.plugins.extendspider.utils.circuit_breaker import CircuitBreaker
+
+
+class _Clock:
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(circuit_breaker, "time", clock)
+    return clock
+
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=3, recovery_time=600)
+    assert not breaker.record_failure("timeout")
+    assert not breaker.record_failure("timeout")
+    assert breaker.record_failure("timeout")
+    assert not breaker.allow()
+    info = breaker.info()
+    assert (info["state"], info["failures"], info["last_error"], info["retry_after"]) == \
+           (CircuitBreaker.OPEN, 3, "timeout", 600)
+
+
+def test_success_resets_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=2)
+    breaker.record_failure()
+    breaker.record_success()
+    assert not breaker.record_failure()
+    assert breaker.allow()
+
+
+def test_half_open_allows_single_probe(clock):
+    breaker = CircuitBreaker(failure_threshold=1, recovery_time=60)
+    breaker.record_failure()
+    clock.now += 61
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
+
+
+def test_failed_probe_reopens(clock):
+    breaker = CircuitBreaker(failure_threshold=3, recovery_time=60)
+    for _ in range(3):
+        breaker.record_failure()
+    clock.now += 61
+    assert breaker.allow()
+    assert breaker.record_failure("still down")
+    assert not breaker.allow()
+    assert breaker.retry_after() == 60
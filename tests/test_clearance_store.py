@@ -0,0 +1,122 @@
+# _*_ coding: utf-8 _*_
+import http.cookiejar
+import time
+
+import pytest
+
+from app.core.config import settings
+from app.plugins.extendspider.utils.clearance_store import ClearanceStore, egress_key, normalize_domain
+
+UA = "Mozilla/5.0 (test)"
+
+
+def _clearance(value="token", domain=".example.com", expires=None):
+    return {"name": "cf_clearance", "value": value, "domain": domain,
+            "expires": expires if expires is not None else time.time() + 600}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ClearanceStore(tmp_path / "clearance.json")
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("https://www.Example.com:8443/path", "example.com"),
+    (".example.com", "example.com"),
+    ("sub.example.com", "sub.example.com"),
+    ("", ""),
+])
+def test_normalize_domain(value, expected):
+    assert normalize_domain(value) == expected
+
+
+def test_egress_key(monkeypatch):
+    monkeypatch.setattr(settings, "PROXY_HOST", "http://127.0.0.1:7890", raising=False)
+    assert egress_key(False) == "direct"
+    assert egress_key(True) == "http://127.0.0.1:7890"
+    monkeypatch.setattr(settings, "PROXY_HOST", None, raising=False)
+    assert egress_key(True) == "direct"
+
+
+def test_put_requires_clearance(store):
+    assert not store.put("example.com", UA, "direct", [{"name": "sid", "value": "1"}])
+    assert store.version == 0
+    assert store.put("https://www.example.com/", UA, "direct",
+                     [_clearance(), {"name": "sid", "value": "1"}, {"name": "x", "domain": "other.org"}])
+    assert store.version == 1
+    cookies = store.get_cookies("example.com", UA, "direct")
+    # 其它域名的 cookie 不保存，未指定域名的补上当前域名
+    assert {c["name"] for c in cookies} == {"cf_clearance", "sid"}
+    assert next(c for c in cookies if c["name"] == "sid")["domain"] == ".example.com"
+
+
+def test_bound_to_ua_and_egress(store):
+    store.put("example.com", UA, "direct", [_clearance()])
+    assert store.get("example.com", UA, "direct")
+    assert store.get("example.com", "other-ua", "direct") is None
+    assert store.get("example.com", UA, "http://proxy:7890") is None
+    # find 不限 UA
+    assert store.find("www.example.com", "direct")["ua"] == UA
+    assert store.find("example.com", "http://proxy:7890") is None
+
+
+def test_expiry(store):
+    store.put("example.com", UA, "direct", [_clearance(expires=time.time() + 0.05)])
+    assert store.expires_at("example.com", UA, "direct")
+    time.sleep(0.1)
+    assert store.get("example.com", UA, "direct") is None
+    assert store.cookies_for(UA, "direct") == []
+    # 没有过期时间时使用默认有效期，ttl 优先
+    store.put("a.com", UA, "direct", [_clearance(domain="", expires=-1)])
+    assert store.expires_at("a.com", UA, "direct") == pytest.approx(time.time() + store.DEFAULT_TTL, abs=5)
+    store.put("b.com", UA, "direct", [_clearance(domain="")], ttl=60)
+    assert store.expires_at("b.com", UA, "direct") == pytest.approx(time.time() + 60, abs=5)
+
+
+def test_persisted(tmp_path, store):
+    store.put("example.com", UA, "direct", [_clearance()])
+    store.put("expired.com", UA, "direct", [_clearance(domain="", expires=time.time() + 0.05)])
+    time.sleep(0.1)
+    reloaded = ClearanceStore(tmp_path / "clearance.json")
+    assert reloaded.get_cookies("example.com", UA, "direct")[0]["value"] == "token"
+    assert reloaded.find("expired.com", "direct") is None
+
+
+def test_corrupt_file_ignored(tmp_path):
+    path = tmp_path / "clearance.json"
+    path.write_text("{broken", encoding="utf-8")
+    assert ClearanceStore(path).cookies_for(UA, "direct") == []
+
+
+def test_cookies_for_and_invalidate(store):
+    store.put("example.com", UA, "direct", [_clearance("a")])
+    store.put("example.org", UA, "direct", [_clearance("b", domain=".example.org")])
+    store.put("example.com", "other-ua", "direct", [_clearance("c")])
+    assert sorted(c["value"] for c in store.cookies_for(UA, "direct")) == ["a", "b"]
+    version = store.version
+    store.invalidate("example.com", ua=UA)
+    assert store.version == version + 1
+    assert store.get("example.com", UA, "direct") is None
+    assert store.get("example.com", "other-ua", "direct")
+    store.invalidate("example.com")
+    assert store.find("example.com", "direct") is None
+    # 没有匹配的记录时不变更版本
+    version = store.version
+    store.invalidate("missing.com")
+    assert store.version == version
+
+
+def test_put_cookiejar(store):
+    jar = http.cookiejar.CookieJar()
+    jar.set_cookie(http.cookiejar.Cookie(
+        0, "cf_clearance", "jar", None, False, ".example.com", True, True, "/", True, True,
+        int(time.time()) + 600, False, None, None, {}))
+    assert store.put_cookiejar("example.com", UA, "direct", jar)
+    cookie = store.get_cookies("example.com", UA, "direct")[0]
+    assert cookie["value"] == "jar" and cookie["secure"]
+
+
+def test_normalize_cookie_flaresolverr_expiry():
+    cookie = ClearanceStore.normalize_cookie({"name": "cf_clearance", "value": "v", "expiry": 123})
+    assert cookie == {"name": "cf_clearance", "value": "v", "domain": "", "path": "/", "expires": 123.0,
+                      "httpOnly": False, "secure": False}
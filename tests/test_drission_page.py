@@ -0,0 +1,192 @@
+# _*_ coding: utf-8 _*_
+import threading
+import time
+import types
+
+import pytest
+
+pytest.importorskip("DrissionPage")
+pytest.importorskip("playwright_stealth")
+
+from app.plugins.extendspider.utils.challenge_broker import RefreshSkipped  # noqa: E402
+from app.plugins.extendspider.utils.drission_page import DrissonBrowser  # noqa: E402
+
+
+class FakeLoadMode:
+    def __init__(self, tab):
+        self.tab = tab
+
+    def __getattr__(self, mode):
+        return lambda: setattr(self.tab, "load_mode", mode)
+
+
+class FakeSetter:
+    def __init__(self, tab):
+        self.tab = tab
+        self.load_mode = FakeLoadMode(tab)
+
+    def when_download_file_exists(self, mode):
+        self.tab.file_exists_mode = mode
+
+    def download_path(self, path):
+        self.tab.download_path = path
+
+
+class FakeTab:
+    def __init__(self, tab_id, browser):
+        self.tab_id = tab_id
+        self.states = types.SimpleNamespace(is_alive=True)
+        self.set = FakeSetter(self)
+        self.listen = types.SimpleNamespace(stop=lambda: None)
+        self.load_mode = "normal"
+        self.file_exists_mode = "rename"
+        self.download_path = browser.download_path
+        self.url = "about:blank"
+        self.closed = False
+
+    def get(self, url):
+        self.url = url
+
+    def cookies(self, all_info=False):
+        return []
+
+    def close(self):
+        self.closed = True
+
+
+class FakeChromium:
+    def __init__(self):
+        self.download_path = "/downloads"
+        self.user_agent = "Mozilla/5.0 (test)"
+        self.set = types.SimpleNamespace(cookies=lambda cookies: None)
+        self.tabs = []
+
+    def new_tab(self):
+        tab = FakeTab(f"tab-{len(self.tabs)}", self)
+        self.tabs.append(tab)
+        return tab
+
+    def quit(self):
+        pass
+
+
+class FakePolicy:
+    enabled = []
+    disabled = []
+
+    def enable_cdp(self, tab):
+        FakePolicy.enabled.append(tab.tab_id)
+        return True
+
+    @staticmethod
+    def disable_cdp(tab):
+        FakePolicy.disabled.append(tab.tab_id)
+
+
+@pytest.fixture
+def browser(monkeypatch):
+    from app.plugins.extendspider.utils import drission_page
+    monkeypatch.setattr(DrissonBrowser, "create_drission_chromium", lambda self: FakeChromium())
+    monkeypatch.setattr(drission_page, "ResourceBlockPolicy", FakePolicy)
+    FakePolicy.enabled, FakePolicy.disabled = [], []
+    return DrissonBrowser(max_tabs=2)
+
+
+def test_tab_reused(browser):
+    with browser.tab("https://example.com") as tab:
+        assert tab.url == "https://example.com"
+    with browser.tab() as again:
+        assert again is tab
+        assert again.url == "about:blank"
+    stats = browser.tab_pool_stats()
+    assert stats["created"] == 1 and stats["hits"] == 1 and stats["idle"] == 1
+
+
+def test_checkin_resets_download_settings(browser):
+    tab = browser.checkout_tab(load_mode="eager")
+    assert tab.load_mode == "eager"
+    tab.set.when_download_file_exists("skip")
+    tab.set.download_path("/tmp/torrents")
+    browser.checkin_tab(tab)
+    assert tab.load_mode == "normal"
+    assert tab.file_exists_mode == "rename"
+    assert tab.download_path == "/downloads"
+
+
+def test_checkin_disables_interception(browser):
+    tab = browser.checkout_tab(resource_policy=FakePolicy())
+    assert tab.tab_id in browser._intercepted_tabs
+    browser.checkin_tab(tab)
+    assert FakePolicy.disabled == [tab.tab_id]
+    assert not browser._intercepted_tabs
+    # 再次借出时没有拦截策略，不重复撤销
+    browser.checkin_tab(browser.checkout_tab())
+    assert FakePolicy.disabled == [tab.tab_id]
+
+
+def test_dead_tab_discarded(browser):
+    tab = browser.checkout_tab()
+    browser.checkin_tab(tab)
+    tab.states.is_alive = False
+    assert browser.checkout_tab() is not tab
+    assert browser.tab_pool_stats()["discarded"] == 1
+
+
+def test_failed_reset_closes_tab(browser):
+    tab = browser.checkout_tab()
+
+    def broken(url):
+        raise RuntimeError("context lost")
+
+    tab.get = broken
+    browser.checkin_tab(tab)
+    assert tab.closed
+    stats = browser.tab_pool_stats()
+    assert stats["total"] == 0 and stats["idle"] == 0
+
+
+def test_checkout_waits_when_full(browser):
+    first = browser.checkout_tab()
+    browser.checkout_tab()
+    with pytest.raises(TimeoutError):
+        browser.checkout_tab(timeout=0.1)
+    threading.Timer(0.1, browser.checkin_tab, args=(first,)).start()
+    assert browser.checkout_tab(timeout=5) is first
+    assert browser.tab_pool_stats()["waits"] == 2
+
+
+def test_concurrent_checkout_respects_max_tabs(browser):
+    seen = []
+    lock = threading.Lock()
+    active = [0]
+
+    def work():
+        with browser.tab(resource_policy=FakePolicy()):
+            with lock:
+                active[0] += 1
+                seen.append(active[0])
+            time.sleep(0.02)
+            with lock:
+                active[0] -= 1
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(5)
+    assert max(seen) <= 2
+    assert browser.tab_pool_stats()["total"] <= 2
+    assert not browser._intercepted_tabs
+
+
+def test_refresh_challenge_does_not_wait_for_tab(browser, monkeypatch):
+    monkeypatch.setattr(DrissonBrowser, "getTurnstileToken", staticmethod(lambda tab, timeout=15: "token"))
+    assert browser._refresh_challenge("https://example.com/")
+    tabs = [browser.checkout_tab(), browser.checkout_tab()]
+    start = time.time()
+    with pytest.raises(RefreshSkipped):
+        browser._refresh_challenge("https://example.com/")
+    assert time.time() - start < 1
+    for tab in tabs:
+        browser.checkin_tab(tab)
+    assert browser.tab_pool_stats()["idle"] == 2
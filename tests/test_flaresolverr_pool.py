@@ -0,0 +1,152 @@
+# _*_ coding: utf-8 _*_
+import threading
+import time
+import types
+
+import pytest
+
+pytest.importorskip("requests")
+
+from app.plugins.extendspider.utils.clearance_store import ClearanceStore  # noqa: E402
+from app.plugins.extendspider.utils.flaresolverr_pool import FlareSolverrSessionPool  # noqa: E402
+
+URL = "http://flaresolverr:8191"
+
+
+class FakeFlareSolverr:
+    """
+    模拟 FlareSolverr 接口
+    """
+
+    def __init__(self):
+        self.sessions = set()
+        self.commands = []
+        self.fail_create = False
+        self.lock = threading.Lock()
+
+    def post(self, url, json=None, timeout=None):
+        with self.lock:
+            self.commands.append((json["cmd"], json.get("session")))
+            cmd = json["cmd"]
+            if cmd == "sessions.create":
+                if self.fail_create:
+                    result = {"status": "error", "message": "busy"}
+                else:
+                    self.sessions.add(json["session"])
+                    result = {"status": "ok"}
+            elif cmd == "sessions.destroy":
+                self.sessions.discard(json["session"])
+                result = {"status": "ok"}
+            elif cmd == "sessions.list":
+                result = {"status": "ok", "sessions": sorted(self.sessions)}
+            else:
+                result = {"status": "ok", "solution": {
+                    "status": 200, "response": "<html>ok</html>", "headers": {}, "userAgent": "fs-ua",
+                    "cookies": [{"name": "cf_clearance", "value": "fs", "domain": ".example.com",
+                                 "expiry": time.time() + 600}]}}
+        return types.SimpleNamespace(status_code=200, json=lambda: result, raise_for_status=lambda: None)
+
+    def created(self):
+        return [s for cmd, s in self.commands if cmd == "sessions.create"]
+
+    def destroyed(self):
+        return [s for cmd, s in self.commands if cmd == "sessions.destroy"]
+
+
+@pytest.fixture
+def flaresolverr():
+    return FakeFlareSolverr()
+
+
+@pytest.fixture
+def pool(flaresolverr):
+    pool = FlareSolverrSessionPool(max_failures=2, check_interval=3600)
+    pool._client = flaresolverr
+    return pool
+
+
+def test_idle_session_reused(pool, flaresolverr):
+    with pool.session(URL, "https://www.example.com/a") as first:
+        pass
+    with pool.session(URL, "example.com") as second:
+        assert second is first
+    assert len(flaresolverr.created()) == 1
+    assert first.session_id.startswith("moviepilot_example.com_")
+
+
+def test_busy_sessions_grow_to_size(pool, flaresolverr):
+    sessions = [pool.acquire(URL, "example.com", size=2) for _ in range(3)]
+    assert len({s.session_id for s in sessions}) == 2
+    assert sorted(s.busy for s in set(sessions)) == [1, 2]
+    for s in sessions:
+        pool.release(URL, "example.com", s)
+    # 不同域名使用各自的会话
+    other = pool.acquire(URL, "example.org")
+    assert other not in sessions
+    assert len(flaresolverr.created()) == 3
+
+
+def test_create_failure_not_kept(pool, flaresolverr):
+    flaresolverr.fail_create = True
+    with pytest.raises(RuntimeError):
+        pool.acquire(URL, "example.com")
+    assert pool.stats()[f"{URL}|example.com"] == []
+
+
+def test_failing_session_recycled(pool, flaresolverr):
+    with pool.session(URL, "example.com") as session:
+        pool.report(session, False)
+        pool.report(session, True)
+        pool.report(session, False)
+        assert session.healthy
+        pool.report(session, False)
+        assert not session.healthy
+    assert flaresolverr.destroyed() == [session.session_id]
+    with pool.session(URL, "example.com") as replacement:
+        assert replacement is not session
+
+
+def test_expired_session_recycled(pool, flaresolverr):
+    pool.max_age = 0.05
+    with pool.session(URL, "example.com") as session:
+        pass
+    time.sleep(0.1)
+    with pool.session(URL, "example.com") as replacement:
+        assert replacement is not session
+    assert session.session_id in flaresolverr.destroyed()
+
+
+def test_health_check_drops_lost_sessions(pool, flaresolverr):
+    with pool.session(URL, "example.com") as session:
+        pass
+    # FlareSolverr 重启后会话丢失
+    flaresolverr.sessions.clear()
+    pool.check_interval = 0
+    with pool.session(URL, "example.com") as replacement:
+        assert replacement is not session
+    assert not session.healthy
+    # 已不存在的会话不再调用销毁
+    assert session.session_id not in flaresolverr.destroyed()
+
+
+def test_stats_and_shutdown(pool, flaresolverr):
+    with pool.session(URL, "example.com") as session:
+        pool.report(session, True)
+    stats = pool.stats()[f"{URL}|example.com"]
+    assert stats[0]["requests"] == 1 and stats[0]["healthy"] and stats[0]["busy"] == 0
+    pool.shutdown()
+    assert flaresolverr.destroyed() == [session.session_id]
+    assert pool.stats() == {}
+
+
+def test_proxy_request_saves_clearance(pool, flaresolverr):
+    from app.plugins.extendspider.utils.proxy import FlareSolverrProxy
+
+    proxy = FlareSolverrProxy(URL, session_id="spider")
+    proxy._client = flaresolverr
+    response = proxy._make_request("GET", "https://example.com/a")
+    assert response.text == "<html>ok</html>"
+    assert {c.name: c.value for c in response.cookies}["cf_clearance"] == "fs"
+    assert ClearanceStore().get_cookies("example.com", "fs-ua", "direct")[0]["value"] == "fs"
+    request_session = next(s for cmd, s in flaresolverr.commands if cmd == "request.get")
+    assert request_session.startswith("spider_example.com_")
@@ -0,0 +1,123 @@
+# _*_ coding: utf-8 _*_
+import pytest
+
+pytest.importorskip("bs4")
+
+from app.plugins.extendspider.utils import html_parser  # noqa: E402
+from app.plugins.extendspider.utils.html_parser import HtmlParser  # noqa: E402
+
+PAGE = """
+<html><head><title>搜索结果</title></head><body>
+<div class="sidebar"><a href="/ad">广告</a></div>
+<ul class="list">
+  <li class="item"><a class="title" href="/detail/1">沙丘2 Dune <b>2024</b></a><span>10.5 GB</span></li>
+  <li class="item"><a class="title" href="/detail/2">沙丘 Dune</a><span>下载</span></li>
+</ul>
+</body></html>
+"""
+
+
+def _backends():
+    backends = ["html.parser"]
+    if html_parser._HAS_LXML:
+        backends.append("lxml")
+    if html_parser.LexborHTMLParser is not None:
+        backends.append("selectolax")
+    return backends
+
+
+@pytest.fixture(params=_backends())
+def parser(request):
+    return HtmlParser(request.param)
+
+
+def test_common_interface(parser):
+    soup = parser.parse(PAGE)
+    items = soup.select("ul.list li.item")
+    assert len(items) == 2
+    link = items[0].select_one("a.title")
+    assert link["href"] == "/detail/1"
+    assert link.get("href") == "/detail/1"
+    assert link.get("missing", "x") == "x"
+    assert link.get_text(strip=True) == "沙丘2 Dune2024"
+    assert " ".join(link.get_text(" ", strip=True).split()) == "沙丘2 Dune 2024"
+    assert "Dune" in link.text
+    assert items[1].select_one("b") is None
+    with pytest.raises(KeyError):
+        _ = items[1].select_one("a")["title"]
+
+
+def test_soup_contains(parser):
+    soup = parser.parse(PAGE)
+    spans = soup.select('li span:-soup-contains("下载")')
+    assert [s.get_text() for s in spans] == ["下载"]
+
+
+def test_bytes_and_empty_content(parser):
+    assert parser.parse(PAGE.encode("utf-8")).select_one("a.title")["href"] == "/detail/1"
+    assert parser.parse(None).select("a") == []
+
+
+def test_stats(parser):
+    snapshot = parser.snapshot()
+    parser.parse(PAGE)
+    parser.parse(PAGE)
+    parsed = parser.since(snapshot)
+    assert parsed["documents"] == 2
+    assert parsed["bytes"] == 2 * len(PAGE)
+    assert parsed["cpu_time"] >= 0
+
+
+def test_backend_fallback(monkeypatch):
+    expected = HtmlParser.DEFAULT_BACKEND if html_parser._HAS_LXML else "html.parser"
+    assert HtmlParser("unknown").backend == expected
+    monkeypatch.setattr(html_parser, "LexborHTMLParser", None)
+    monkeypatch.setattr(html_parser, "_HAS_LXML", False)
+    assert HtmlParser("selectolax").backend == "html.parser"
+    assert HtmlParser.from_config({}).backend == "html.parser"
+
+
+def test_from_config():
+    assert HtmlParser.from_config({"html_parser": "html.parser"}).backend == "html.parser"
+
+
+def test_parse_spec_compile_and_match():
+    spec = html_parser.ParseSpec("li.media.thread", "div#downlist", ".box")
+    assert spec.match("li", {"class": "media thread tap"})
+    assert spec.match("li", {"class": ["thread", "media"]})
+    assert not spec.match("li", {"class": "media"})
+    assert spec.match("div", [("id", "downlist")])
+    assert not spec.match("div", {"id": "other"})
+    # 只有 class 的选择器匹配任意标签
+    assert spec.match("section", {"class": "box wide"})
+    assert not spec.match("section", {})
+
+
+def test_parse_spec_tag_prefilter():
+    spec = html_parser.ParseSpec("ul.list")
+    assert not spec.match("div", {"class": "list"})
+    assert spec.match("ul", {"class": "list"})
+
+
+@pytest.mark.parametrize("backend", [b for b in _backends() if b != "selectolax"])
+def test_parse_spec_limits_tree(backend):
+    parser = HtmlParser(backend)
+    spec = html_parser.ParseSpec("ul.list")
+    soup = parser.parse(PAGE, spec)
+    # 范围外的节点不建立
+    assert soup.select("div.sidebar") == []
+    assert soup.select("title") == []
+    # 范围内的子树完整保留，匹配的元素成为顶层节点
+    links = soup.select("li.item a.title")
+    assert [a["href"] for a in links] == ["/detail/1", "/detail/2"]
+    assert links[0].get_text(" ", strip=True).split() == ["沙丘2", "Dune", "2024"]
+    assert soup.select_one("ul.list > li > span").get_text() == "10.5 GB"
+
+
+@pytest.mark.parametrize("backend", _backends())
+def test_parse_spec_same_result_as_full_parse(backend):
+    parser = HtmlParser(backend)
+    spec = html_parser.ParseSpec("li.item")
+    full = [a["href"] for a in parser.parse(PAGE).select("li.item a")]
+    scoped = [a["href"] for a in parser.parse(PAGE, spec).select("li.item a")]
+    assert scoped == full
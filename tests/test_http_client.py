@@ -0,0 +1,145 @@
+# _*_ coding: utf-8 _*_
+import asyncio
+import io
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("requests")
+
+from app.plugins.extendspider.utils import http_client  # noqa: E402
+from app.plugins.extendspider.utils.http_client import HttpClient  # noqa: E402
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status=200, body=b"ok", headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path == "/redirect":
+            self._reply(302, b"", {"Location": "/ok"})
+        elif path == "/clearance":
+            self._reply(headers={"Set-Cookie": "cf_clearance=abc; Path=/"})
+        elif path == "/cookie":
+            self._reply(body=(self.headers.get("Cookie") or "").encode())
+        else:
+            self._reply()
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        self._reply(body=self.headers.get("Content-Type", "").encode() + b"\n" + body)
+
+
+@pytest.fixture(scope="module")
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+
+
+@pytest.fixture(params=["httpx", "aiohttp"])
+def backend(request, monkeypatch):
+    if request.param == "httpx":
+        pytest.importorskip("httpx")
+    else:
+        pytest.importorskip("aiohttp")
+        monkeypatch.setattr(http_client, "httpx", None)
+    return request.param
+
+
+def _run(coro_func):
+    async def _main():
+        client = HttpClient()
+        try:
+            return await coro_func(client)
+        finally:
+            for session in client._async_clients.get(asyncio.get_running_loop(), {}).values():
+                await (session.aclose() if hasattr(session, "aclose") else session.close())
+
+    return asyncio.run(_main())
+
+
+def test_sync_request_does_not_keep_cookies(server):
+    client = HttpClient()
+    assert client.get(f"{server}/clearance").cookies.get("cf_clearance") == "abc"
+    # 会话不保存 cookies，不同爬虫之间不会串用
+    assert client.get(f"{server}/cookie").text == ""
+    assert client.get(f"{server}/cookie", cookies={"sid": "1"}).text == "sid=1"
+
+
+def test_async_request(server, backend):
+    response = _run(lambda c: c.aget(f"{server}/redirect", params={"q": "1"}))
+    assert response.status_code == 200 and response.text == "ok"
+    assert response.url.startswith(f"{server}/ok")
+    assert response.headers["content-length"] == "2"
+
+
+def test_async_allow_redirects(server, backend):
+    response = _run(lambda c: c.aget(f"{server}/redirect", allow_redirects=False))
+    assert response.status_code == 302
+    assert response.headers["Location"] == "/ok"
+
+
+def test_async_response_cookies(server, backend):
+    response = _run(lambda c: c.aget(f"{server}/clearance"))
+    assert response.cookies.get("cf_clearance") == "abc"
+
+
+def test_async_does_not_keep_cookies(server, backend):
+    async def _requests(client):
+        await client.aget(f"{server}/clearance")
+        return (await client.aget(f"{server}/cookie")).text, \
+            (await client.aget(f"{server}/cookie", cookies={"sid": "1"})).text
+
+    assert _run(_requests) == ("", "sid=1")
+
+
+def test_async_files(server, backend):
+    response = _run(lambda c: c.apost(f"{server}/upload", data={"name": "x"},
+                                      files={"file": ("a.torrent", io.BytesIO(b"d8:announce"),
+                                                      "application/x-bittorrent")}))
+    assert response.text.startswith("multipart/form-data")
+    assert 'filename="a.torrent"' in response.text and "d8:announce" in response.text
+    assert 'name="name"' in response.text
+
+
+def test_async_verify_false(server, backend):
+    assert _run(lambda c: c.aget(f"{server}/ok", verify=False)).text == "ok"
+
+
+def test_async_unsupported_argument(server, backend):
+    with pytest.raises(TypeError):
+        _run(lambda c: c.aget(f"{server}/ok", stream=True))
+
+
+def test_direct_proxy_async(server, backend):
+    from app.plugins.extendspider.utils.clearance_store import ClearanceStore
+    from app.plugins.extendspider.utils.proxy import DirectProxy
+
+    proxy = DirectProxy(headers={"User-Agent": "ua"})
+    proxy._client = HttpClient()
+
+    async def _request(client):
+        redirect = await proxy.arequest("GET", f"{server}/redirect", allow_redirects=False)
+        clearance = await proxy.arequest("GET", f"{server}/clearance")
+        echoed = await proxy.arequest("GET", f"{server}/cookie")
+        return redirect, clearance, echoed
+
+    redirect, clearance, echoed = _run(_request)
+    assert redirect.status_code == 302
+    # 异步响应带回的 clearance 同样会保存，之后的请求自动带上
+    assert ClearanceStore().get_cookies(server, "ua", "direct")[0]["value"] == "abc"
+    assert echoed.text == "cf_clearance=abc"
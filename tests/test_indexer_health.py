@@ -0,0 +1,93 @@
+# _*_ coding: utf-8 _*_
+import filecmp
+import time
+from pathlib import Path
+
+import pytest
+
+from app.plugins.jackettshaw import indexer_health as jackett_health
+from app.plugins.prowlarrshaw import indexer_health as prowlarr_health
+
+PLUGINS = Path(__file__).resolve().parent.parent / "plugins.v2"
+
+
+def test_copies_are_identical():
+    # 插件独立打包，各自带一份副本，两份必须保持一致
+    assert filecmp.cmp(PLUGINS / "jackettshaw" / "indexer_health.py",
+                       PLUGINS / "prowlarrshaw" / "indexer_health.py", shallow=False)
+
+
+@pytest.fixture(params=[jackett_health, prowlarr_health], ids=["jackettshaw", "prowlarrshaw"])
+def module(request):
+    return request.param
+
+
+def test_timeout_from_p95(module):
+    health = module.IndexerHealth(min_timeout=5, max_timeout=60, margin=1.5, padding=2, min_samples=5)
+    # 样本不足时使用最长超时
+    for _ in range(4):
+        health.record("a", True, 4)
+    assert health.timeout("a") == 60
+    health.record("a", True, 4)
+    assert health.timeout("a") == 4 * 1.5 + 2
+    for _ in range(5):
+        health.record("fast", True, 0.1)
+        health.record("slow", True, 100)
+    assert health.timeout("fast") == 5
+    assert health.timeout("slow") == 60
+
+
+def test_p95_ignores_outliers(module):
+    health = module.IndexerHealth(min_samples=1, window=100)
+    for _ in range(99):
+        health.record("a", True, 1)
+    health.record("a", True, 50)
+    assert health.get("a")["p95"] == 1
+
+
+def test_circuit_opens_after_failures(module):
+    health = module.IndexerHealth(failure_threshold=3, recovery_time=300)
+    for _ in range(2):
+        health.record("a", False, error="timeout")
+    assert health.allow("a")
+    # 成功后重新计数
+    health.record("a", True, 1)
+    for _ in range(3):
+        health.record("a", False, error="timeout")
+    assert not health.allow("a")
+    info = health.get("a")
+    assert info["state"] == "熔断" and info["total_failures"] == 5 and info["last_error"] == "timeout"
+
+
+def test_half_open_allows_single_probe(module):
+    health = module.IndexerHealth(failure_threshold=1, recovery_time=0.05)
+    health.record("a", False)
+    assert not health.allow("a")
+    time.sleep(0.1)
+    assert health.allow("a")
+    assert health.get("a")["state"] == "探测中"
+    # 探测期间不放行其它请求
+    assert not health.allow("a")
+    health.record("a", True, 1)
+    assert health.get("a")["state"] == "正常"
+    assert health.allow("a") and health.allow("a")
+
+
+def test_failed_probe_reopens(module):
+    health = module.IndexerHealth(failure_threshold=3, recovery_time=0.05)
+    for _ in range(3):
+        health.record("a", False)
+    time.sleep(0.1)
+    assert health.allow("a")
+    health.record("a", False)
+    assert not health.allow("a")
+    assert health.get("a")["state"] == "熔断"
+
+
+def test_get_and_reset(module):
+    health = module.IndexerHealth(min_samples=1)
+    health.record("a", True, 2)
+    info = health.get("a")
+    assert info["p95"] == 2 and info["successes"] == 1 and info["timeout"] == 10
+    health.reset()
+    assert health.get("a")["successes"] == 0
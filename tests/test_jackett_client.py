@@ -0,0 +1,130 @@
+# _*_ coding: utf-8 _*_
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("requests")
+
+from app.plugins.jackettshaw.jackett_client import JackettClient  # noqa: E402
+
+
+class FakeJackett:
+    """
+    模拟 Jackett 登录和索引器列表接口
+    """
+
+    def __init__(self):
+        self.logins = 0
+        self.requests = []
+        self.session = "s1"
+        self.etag = '"v1"'
+        self.indexers = [{"id": "a", "name": "A"}, {"id": "b", "name": "B"}]
+
+
+def _handler(jackett: FakeJackett):
+
+    class _Handler(BaseHTTPRequestHandler):
+
+        def log_message(self, *args):
+            pass
+
+        def _reply(self, status=200, body=b"", headers=None):
+            self.send_response(status)
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            if self.path.startswith(JackettClient.LOGIN_PATH) and "password=secret" in self.path:
+                jackett.logins += 1
+                self._reply(302, headers={"Location": "/UI/Dashboard",
+                                          "Set-Cookie": f"Jackett={jackett.session}; Path=/"})
+            else:
+                self._reply(302, headers={"Location": "/UI/Login"})
+
+        def do_GET(self):
+            jackett.requests.append(self.headers.get("If-None-Match"))
+            if f"Jackett={jackett.session}" not in (self.headers.get("Cookie") or ""):
+                self._reply(302, headers={"Location": "/UI/Login?ReturnUrl=%2FUI%2FDashboard"})
+            elif self.headers.get("If-None-Match") == jackett.etag:
+                self._reply(304)
+            else:
+                self._reply(body=json.dumps(jackett.indexers).encode(), headers={"ETag": jackett.etag})
+
+    return _Handler
+
+
+@pytest.fixture
+def jackett():
+    return FakeJackett()
+
+
+@pytest.fixture
+def host(jackett):
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _handler(jackett))
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}/"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_login_once_and_reuse_cookie(host, jackett):
+    client = JackettClient(host, "key", password="secret", ttl=0)
+    assert client.get_indexers() == jackett.indexers
+    assert client.get_indexers(refresh=True) == jackett.indexers
+    assert client.get_indexers(refresh=True) == jackett.indexers
+    assert jackett.logins == 1
+    client.close()
+
+
+def test_relogin_after_cookie_expired(host, jackett):
+    client = JackettClient(host, "key", password="secret", ttl=0)
+    client.get_indexers()
+    # Jackett 重启后原 cookie 失效
+    jackett.session = "s2"
+    assert client.get_indexers(refresh=True) == jackett.indexers
+    assert jackett.logins == 2
+
+
+def test_login_failure_returns_cached(host, jackett):
+    client = JackettClient(host, "key", password="wrong")
+    assert client.get_indexers() is None
+    assert jackett.logins == 0
+
+
+def test_ttl_cache(host, jackett):
+    client = JackettClient(host, "key", password="secret", ttl=300)
+    client.get_indexers()
+    client.get_indexers()
+    assert len(jackett.requests) == 1
+
+
+def test_conditional_refresh_and_fingerprint(host, jackett):
+    client = JackettClient(host, "key", password="secret", ttl=0)
+    first = client.get_indexers()
+    fingerprint = client.fingerprint
+    # 未变化时返回 304，沿用缓存
+    assert client.get_indexers() is first
+    assert jackett.requests == [None, '"v1"']
+    assert client.fingerprint == fingerprint
+    # 只调整顺序不算变化
+    jackett.indexers = list(reversed(jackett.indexers))
+    jackett.etag = '"v2"'
+    client.get_indexers()
+    assert client.fingerprint == fingerprint
+    jackett.indexers = jackett.indexers + [{"id": "c", "name": "C"}]
+    jackett.etag = '"v3"'
+    assert len(client.get_indexers()) == 3
+    assert client.fingerprint != fingerprint
+
+
+def test_unreachable_keeps_cache():
+    client = JackettClient("http://127.0.0.1:9", "key", ttl=0, timeout=(0.5, 0.5))
+    client._indexers = [{"id": "a", "name": "A"}]
+    assert client.get_indexers() == [{"id": "a", "name": "A"}]
@@ -0,0 +1,65 @@
+# _*_ coding: utf-8 _*_
+import json
+
+import pytest
+
+from app.plugins.prowlarrshaw.json_stream import iter_json_array, parse_json_response
+
+RELEASES = [
+    {"title": "电影.2024.1080p \"quoted\" \\ [x]", "indexerId": 1, "size": 1024, "categories": [{"id": 2000}]},
+    {"title": "Movie.2024.2160p", "indexerId": 2, "size": 2048, "categories": []},
+    {"title": "Show.S01E01", "indexerId": 1, "size": None, "nested": {"a": [1, 2, {"b": "]"}]}},
+]
+
+
+def _chunks(data: bytes, size: int):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize("size", [1, 3, 17, 1024])
+def test_parses_across_chunk_boundaries(size):
+    # 分块会切断多字节 UTF-8 字符和字符串中的转义
+    body = json.dumps(RELEASES, ensure_ascii=False, indent=2).encode("utf-8")
+    assert list(iter_json_array(_chunks(body, size))) == RELEASES
+
+
+def test_fields_projection():
+    body = json.dumps(RELEASES).encode("utf-8")
+    assert list(iter_json_array([body], fields=("title", "indexerId", "missing"))) == [
+        {"title": r["title"], "indexerId": r["indexerId"], "missing": None} for r in RELEASES
+    ]
+
+
+def test_empty_array_and_non_dict_items():
+    assert list(iter_json_array([b" [ ] "])) == []
+    assert list(iter_json_array([b'[1, "a", {"title": "x"}]'])) == [{"title": "x"}]
+
+
+def test_rejects_non_array():
+    with pytest.raises(ValueError):
+        list(iter_json_array([b'{"message": "Unauthorized"}']))
+
+
+def test_rejects_truncated_array():
+    with pytest.raises(ValueError):
+        list(iter_json_array([b'[{"title": "a"}, {"title": ']))
+
+
+class _Response:
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.closed = False
+
+    def iter_content(self, chunk_size):
+        return iter(_chunks(self.data, 8))
+
+    def close(self):
+        self.closed = True
+
+
+def test_response_limit_and_close():
+    response = _Response(json.dumps(RELEASES).encode("utf-8"))
+    assert [r["title"] for r in parse_json_response(response, fields=("title",), limit=2)] == \
+           [RELEASES[0]["title"], RELEASES[1]["title"]]
+    assert response.closed
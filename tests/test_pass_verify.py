@@ -0,0 +1,52 @@
+# _*_ coding: utf-8 _*_
+import pytest
+
+pytest.importorskip("DrissionPage")
+
+from app.plugins.extendspider.utils.pass_verify import _PageSignature, is_cloud_flare_verification_page, \
+    is_slider_verification_page  # noqa: E402
+
+CF_TITLE = "<html><head><title>Just a moment...</title></head><body></body></html>"
+CF_IFRAME = '<html><body><iframe src="https://challenges.cloudflare.com/cdn-cgi/x"></iframe></body></html>'
+CF_WIDGET = '<html><body><div data-testid="challenge-widget-container"></div></body></html>'
+NORMAL = "<html><head><title>电影下载</title></head><body><a href='/a'>just a moment</a></body></html>"
+
+
+@pytest.mark.parametrize("html", [CF_TITLE, CF_IFRAME, CF_WIDGET,
+                                  "<html><head><title>请稍候…</title></head></html>",
+                                  "<HTML><HEAD><TITLE lang=en>Checking your browser</TITLE></HEAD></HTML>"])
+def test_cloudflare_pages(html):
+    assert is_cloud_flare_verification_page(html)
+    assert is_cloud_flare_verification_page(html.encode("utf-8"))
+
+
+@pytest.mark.parametrize("html", [
+    NORMAL,
+    # 只出现域名、不是 iframe 地址时不判定
+    '<html><body><script src="https://challenges.cloudflare.com/turnstile/v0/api.js"></script></body></html>',
+    # 标题关键字只在 <head> 内查找
+    "<html><head><title>首页</title></head><body><title>Just a moment</title></body></html>",
+    "", None, b"",
+])
+def test_normal_pages(html):
+    assert not is_cloud_flare_verification_page(html)
+
+
+def test_slider_pages():
+    assert is_slider_verification_page("<div>滑动上面方块到右侧解锁</div>")
+    assert is_slider_verification_page(b"GOEDGE_WAF_CAPTCHA_ID ... <div id='ui-handler'></div>")
+    assert not is_slider_verification_page("GOEDGE_WAF_CAPTCHA_ID only")
+    assert not is_slider_verification_page(NORMAL)
+
+
+def test_signature_rules():
+    signature = _PageSignature(title_keywords=("blocked",), markers=("deny",), marker_groups=(("a1", "b2"),),
+                               patterns=(("token", r"token=\d+"),))
+    assert signature.match("<title>You are BLOCKED</title>")
+    assert signature.match(b"... deny ...")
+    assert signature.match("b2 then a1")
+    assert not signature.match("a1 only")
+    assert signature.match("token=123")
+    assert not signature.match("token=abc")
+    # 没有 </head> 时在整页中查找标题
+    assert signature.match(b"<title>blocked")
@@ -0,0 +1,119 @@
+# _*_ coding: utf-8 _*_
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("requests")
+
+from app.plugins.prowlarrshaw.prowlarr_client import ProwlarrClient  # noqa: E402
+
+
+def _indexer(indexer_id, name, enable=True):
+    return {
+        "id": indexer_id, "name": name, "enable": enable, "protocol": "torrent", "privacy": "private",
+        "capabilities": {"movieSearchParams": ["q", "imdbId"], "categories": [{"id": 2000}]},
+        "fields": [{"name": "baseUrl", "value": "https://example.com"}] * 20,
+    }
+
+
+class FakeProwlarr:
+    """
+    模拟 Prowlarr 索引器列表接口
+    """
+
+    def __init__(self):
+        self.requests = []
+        self.etag = '"v1"'
+        self.indexers = [_indexer(1, "A"), _indexer(2, "B", enable=False)]
+
+
+def _handler(prowlarr: FakeProwlarr):
+
+    class _Handler(BaseHTTPRequestHandler):
+
+        def log_message(self, *args):
+            pass
+
+        def _reply(self, status=200, body=b"", headers=None):
+            self.send_response(status)
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            prowlarr.requests.append((self.path, self.headers.get("X-Api-Key"), self.headers.get("If-None-Match")))
+            if self.headers.get("X-Api-Key") != "key":
+                self._reply(401)
+            elif prowlarr.etag and self.headers.get("If-None-Match") == prowlarr.etag:
+                self._reply(304)
+            else:
+                self._reply(body=json.dumps(prowlarr.indexers).encode(),
+                            headers={"ETag": prowlarr.etag} if prowlarr.etag else None)
+
+    return _Handler
+
+
+@pytest.fixture
+def prowlarr():
+    return FakeProwlarr()
+
+
+@pytest.fixture
+def host(prowlarr):
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _handler(prowlarr))
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}/"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_uses_indexer_list_with_needed_fields(host, prowlarr):
+    client = ProwlarrClient(host, "key")
+    indexers = client.get_indexers()
+    assert prowlarr.requests[0][0] == ProwlarrClient.INDEXERS_PATH
+    assert [v["name"] for v in indexers] == ["A", "B"]
+    assert set(indexers[0]) == set(ProwlarrClient.INDEXER_FIELDS)
+    assert indexers[1]["enable"] is False
+    assert client.capabilities["1"]["movieSearchParams"] == ["q", "imdbId"]
+    client.close()
+
+
+def test_ttl_cache(host, prowlarr):
+    client = ProwlarrClient(host, "key", ttl=300)
+    client.get_indexers()
+    client.get_indexers()
+    assert len(prowlarr.requests) == 1
+
+
+def test_etag_conditional_refresh(host, prowlarr):
+    client = ProwlarrClient(host, "key", ttl=0)
+    first = client.get_indexers()
+    assert client.get_indexers() is first
+    assert [r[2] for r in prowlarr.requests] == [None, '"v1"']
+
+
+def test_content_hash_without_etag(host, prowlarr):
+    prowlarr.etag = None
+    client = ProwlarrClient(host, "key", ttl=0)
+    first = client.get_indexers()
+    fingerprint = client.fingerprint
+    # 内容不变时沿用原列表
+    assert client.get_indexers() is first
+    assert client.fingerprint == fingerprint
+    prowlarr.indexers = prowlarr.indexers + [_indexer(3, "C")]
+    assert len(client.get_indexers()) == 3
+    assert client.fingerprint != fingerprint
+    assert "3" in client.capabilities
+
+
+def test_failure_keeps_cache(host, prowlarr):
+    client = ProwlarrClient(host, "key", ttl=0)
+    first = client.get_indexers()
+    client._session.headers["X-Api-Key"] = "wrong"
+    assert client.get_indexers() is first
+    assert ProwlarrClient(host, "wrong").get_indexers() is None
@@ -0,0 +1,115 @@
+# _*_ coding: utf-8 _*_
+import threading
+import types
+
+from app.plugins.extendspider.utils.resource_policy import ResourceBlockPolicy
+
+
+def test_should_block():
+    policy = ResourceBlockPolicy()
+    assert policy.should_block("https://example.com/a.png", "image")
+    assert policy.should_block("https://example.com/a.css", "stylesheet")
+    assert policy.should_block("https://www.googletagmanager.com/gtm.js", "script")
+    assert not policy.should_block("https://example.com/app.js", "script")
+    # 页面本身、data URI 和 Cloudflare 验证始终放行
+    assert not policy.should_block("https://hm.baidu.com/index.html", "document")
+    assert not policy.should_block("data:image/png;base64,xx", "image")
+    assert not policy.should_block("https://challenges.cloudflare.com/turnstile/v0/a.png", "image")
+    # 接口请求只按关键字拦截
+    assert not policy.should_block("https://example.com/api/search", "xhr")
+    assert policy.should_block("https://hm.baidu.com/hm.gif", "xhr")
+
+
+def test_from_config():
+    assert ResourceBlockPolicy.from_config({"block_resources": False}) is None
+    policy = ResourceBlockPolicy.from_config({"block_resource_types": ["Image"], "block_url_patterns": []})
+    assert policy.block_types == {"image"}
+    assert not policy.should_block("https://hm.baidu.com/hm.js", "script")
+
+
+def test_content_length():
+    assert ResourceBlockPolicy.content_length({"Content-Length": "1234"}) == 1234
+    assert ResourceBlockPolicy.content_length([{"name": "content-length", "value": "42"}]) == 42
+    assert ResourceBlockPolicy.content_length({"content-type": "image/png"}) is None
+    assert ResourceBlockPolicy.content_length({"content-length": "bad"}) is None
+    assert ResourceBlockPolicy.content_length(None) is None
+
+
+def test_measured_and_estimated_bytes():
+    policy = ResourceBlockPolicy()
+    policy.record("image", 1000)
+    policy.record("image")
+    policy.record("font")
+    stats = policy.stats()
+    assert stats["requests"] == 3
+    assert stats["bytes"] == 1000
+    assert stats["estimated_requests"] == 2
+    assert stats["estimated_bytes"] == ResourceBlockPolicy.ESTIMATED_SIZES["image"] + \
+        ResourceBlockPolicy.ESTIMATED_SIZES["font"]
+    assert stats["types"] == {"image": 2, "font": 1}
+
+
+def test_scopes_are_isolated():
+    policy = ResourceBlockPolicy()
+    first, second = policy.scope(), policy.scope()
+    barrier = threading.Barrier(2)
+
+    def work(scope, count):
+        barrier.wait()
+        for _ in range(count):
+            scope.record("image", 10)
+
+    threads = [threading.Thread(target=work, args=(first, 100)), threading.Thread(target=work, args=(second, 30))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert first.stats()["requests"] == 100 and first.stats()["bytes"] == 1000
+    assert second.stats()["requests"] == 30
+    # 上级策略记录累计值
+    assert policy.stats()["requests"] == 130
+    # scope 共享规则
+    assert first.should_block("https://example.com/a.png", "image")
+
+
+def test_playwright_handler():
+    policy = ResourceBlockPolicy()
+    handler = policy.playwright_handler()
+    calls = []
+
+    def route(url, resource_type, headers=None):
+        return types.SimpleNamespace(
+            request=types.SimpleNamespace(url=url, resource_type=resource_type, headers=headers or {}),
+            abort=lambda reason: calls.append(("abort", url)),
+            continue_=lambda: calls.append(("continue", url)))
+
+    handler(route("https://example.com/a.png", "image", {"content-length": "500"}))
+    handler(route("https://example.com/", "document"))
+    assert calls == [("abort", "https://example.com/a.png"), ("continue", "https://example.com/")]
+    assert policy.stats()["bytes"] == 500 and policy.stats()["estimated_requests"] == 0
+
+
+def test_cdp_interception():
+    policy = ResourceBlockPolicy(block_types=["image"], block_patterns=["hm.baidu.com"])
+    patterns = policy.cdp_patterns()
+    assert {"urlPattern": "*", "resourceType": "Image", "requestStage": "Request"} in patterns
+    assert {"urlPattern": "*hm.baidu.com*", "requestStage": "Request"} in patterns
+
+    commands = []
+    callbacks = {}
+    tab = types.SimpleNamespace(
+        run_cdp=lambda cmd, **kwargs: commands.append((cmd, kwargs.get("requestId"))),
+        driver=types.SimpleNamespace(set_callback=lambda event, cb: callbacks.__setitem__(event, cb)))
+    assert policy.enable_cdp(tab)
+    on_paused = callbacks["Fetch.requestPaused"]
+    on_paused(requestId="1", resourceType="Image", request={"url": "https://example.com/a.png", "headers": {}})
+    on_paused(requestId="2", resourceType="Script", request={"url": "https://example.com/app.js", "headers": {}})
+    on_paused(requestId="3", resourceType="Image", request={"url": "https://example.com/b.png", "headers": {}},
+              responseHeaders=[{"name": "Content-Length", "value": "2048"}])
+    assert ("Fetch.failRequest", "1") in commands
+    assert ("Fetch.continueRequest", "2") in commands
+    stats = policy.stats()
+    assert stats["requests"] == 2 and stats["bytes"] == 2048 and stats["estimated_requests"] == 1
+    ResourceBlockPolicy.disable_cdp(tab)
+    assert commands[-1] == ("Fetch.disable", None)
+    assert callbacks["Fetch.requestPaused"] is None
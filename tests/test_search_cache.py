@@ -0,0 +1,224 @@
+# _*_ coding: utf-8 _*_
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app.plugins.extendspider.utils import search_cache as extendspider_cache
+from app.plugins.jackettshaw import search_cache as jackett_cache
+from app.plugins.prowlarrshaw import search_cache as prowlarr_cache
+from conftest import PLUGINS_PATH
+
+# 三个插件独立打包，各自带一份 search_cache.py，所有测试对每份副本都执行一遍
+COPIES = {
+    "extendspider": (extendspider_cache, "extendspider/utils/search_cache.py"),
+    "jackettshaw": (jackett_cache, "jackettshaw/search_cache.py"),
+    "prowlarrshaw": (prowlarr_cache, "prowlarrshaw/search_cache.py"),
+}
+
+
+class _Clock:
+    """
+    替换 search_cache.time，手动推进时间
+    """
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture(params=list(COPIES), ids=list(COPIES))
+def module(request):
+    return COPIES[request.param][0]
+
+
+@pytest.fixture
+def clock(module, monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(module, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return tmp_path / "search_cache.db"
+
+
+def test_copies_are_identical():
+    sources = {(PLUGINS_PATH / path).read_text(encoding="utf-8") for _, path in COPIES.values()}
+    assert len(sources) == 1
+
+
+class TestPersistentTLRUCache:
+
+    def test_persists_across_instances(self, module, cache_path):
+        cache = module.PersistentTLRUCache(cache_path, ttl=60)
+        cache[("indexer", "keyword", 1)] = [{"title": "a"}]
+        cache.close()
+        reopened = module.PersistentTLRUCache(cache_path, ttl=60)
+        assert reopened[("indexer", "keyword", 1)] == [{"title": "a"}]
+        assert reopened.warm_up() == 1
+        assert len(reopened) == 1
+
+    def test_expires(self, module, cache_path, clock):
+        cache = module.PersistentTLRUCache(cache_path, ttl=60)
+        cache[("indexer", "keyword")] = [1]
+        clock.now += 59
+        assert ("indexer", "keyword") in cache
+        clock.now += 2
+        assert ("indexer", "keyword") not in cache
+        assert module.PersistentTLRUCache(cache_path, ttl=60).warm_up() == 0
+
+    def test_ttl_per_indexer(self, module, cache_path, clock):
+        cache = module.PersistentTLRUCache(cache_path, ttl=60)
+        cache.ttls["slow"] = 600
+        cache[("slow", "keyword")] = [1]
+        cache[("fast", "keyword")] = [1]
+        clock.now += 120
+        assert ("slow", "keyword") in cache
+        assert ("fast", "keyword") not in cache
+
+    def test_empty_results_stay_in_memory(self, module, cache_path):
+        cache = module.PersistentTLRUCache(cache_path, ttl=60)
+        cache[("indexer", "nothing")] = []
+        assert cache[("indexer", "nothing")] == []
+        cache.close()
+        assert ("indexer", "nothing") not in module.PersistentTLRUCache(cache_path, ttl=60)
+
+    def test_evicted_entries_served_from_disk(self, module, cache_path):
+        cache = module.PersistentTLRUCache(cache_path, ttl=60, maxsize=2)
+        for i in range(3):
+            cache[("indexer", i)] = [i]
+        assert len(cache) == 2
+        assert cache[("indexer", 0)] == [0]
+
+    def test_delete_and_clear(self, module, cache_path):
+        cache = module.PersistentTLRUCache(cache_path, ttl=60)
+        cache[("indexer", 1)] = [1]
+        cache[("indexer", 2)] = [2]
+        del cache[("indexer", 1)]
+        assert ("indexer", 1) not in cache
+        with pytest.raises(KeyError):
+            del cache[("indexer", 1)]
+        cache.clear()
+        assert ("indexer", 2) not in cache
+
+    def test_stats(self, module, cache_path):
+        cache = module.PersistentTLRUCache(cache_path, ttl=60)
+        cache[("indexer", 1)] = [1]
+        assert cache.get(("indexer", 1)) == [1]
+        assert cache.get(("indexer", 2)) is None
+        # in 不计入命中统计
+        assert ("indexer", 1) in cache
+        stats = cache.stats()
+        assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+
+
+class TestSingleFlight:
+
+    def test_concurrent_calls_merged(self, module):
+        group = module.SingleFlight()
+        started, release = threading.Event(), threading.Event()
+        calls = []
+
+        def work():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return "result"
+
+        results = []
+        leader = threading.Thread(target=lambda: results.append(group.do("key", work)))
+        leader.start()
+        started.wait(5)
+        followers = [threading.Thread(target=lambda: results.append(group.do("key", work))) for _ in range(5)]
+        for follower in followers:
+            follower.start()
+        deadline = time.time() + 5
+        while group.stats()["merged"] < 5 and time.time() < deadline:
+            time.sleep(0.01)
+        release.set()
+        for thread in [leader, *followers]:
+            thread.join(5)
+        assert results == ["result"] * 6
+        assert len(calls) == 1
+        stats = group.stats()
+        assert (stats["calls"], stats["executed"], stats["merged"], stats["inflight"]) == (6, 1, 5, 0)
+
+    def test_error_shared_and_not_cached(self, module):
+        group = module.SingleFlight()
+
+        def fail():
+            raise RuntimeError("boom")
+
+        with pytest.raises(RuntimeError):
+            group.do("key", fail)
+        assert group.do("key", lambda: "ok") == "ok"
+
+    def test_decorator_uses_key(self, module):
+        group = module.SingleFlight()
+
+        @module.single_flight(group, key=lambda value, ignored=None: value)
+        def echo(value, ignored=None):
+            return value
+
+        assert echo("a", ignored=1) == "a"
+        assert group.stats()["executed"] == 1
+
+
+def _context(title="阿凡达", year="2009", enable_search_filter=False, imdb_id=None, season=None,
+             search_type=None, area="title"):
+    media_info = SimpleNamespace(type=SimpleNamespace(value="电影"), title=title, year=year, imdb_id=imdb_id,
+                                 tmdb_id=None, tvdb_id=None, douban_id=None, season=season, episode=None)
+    return SimpleNamespace(media_info=media_info, enable_search_filter=enable_search_filter, season=None,
+                           episode=None, search_type=search_type, search_sub_id=None, area=area)
+
+
+class TestSearchKeyNormalizer:
+
+    @pytest.mark.parametrize("keyword", ["Avatar: The Way of Water", "avatar the  way of water",
+                                         "ＡＶＡＴＡＲ-The.Way.Of.Water ", "avatar_the_way_of_water"])
+    def test_keyword_variants(self, module, keyword):
+        assert module.SearchKeyNormalizer.keyword(keyword) == "avatar the way of water"
+
+    def test_punctuation_only_keyword_kept(self, module):
+        assert module.SearchKeyNormalizer.keyword(" !!! ") == "!!!"
+
+    def test_variants_share_key_and_are_counted(self, module):
+        normalizer = module.SearchKeyNormalizer()
+        first = normalizer.key("indexer", "Avatar 2", 1, _context())
+        assert normalizer.key("indexer", "avatar.2", 1, _context()) == first
+        assert normalizer.key("indexer", "Avatar 2", 1, _context()) == first
+        assert normalizer.stats() == {"keys": 3, "normalized": 1}
+
+    @pytest.mark.parametrize("changes", [
+        {"enable_search_filter": True},
+        {"title": "泰坦尼克号"},
+        {"year": "2022"},
+        {"imdb_id": "tt1630029"},
+        {"season": 2},
+        {"search_type": "subscribe"},
+        {"area": "imdbid"},
+    ])
+    def test_result_affecting_context_changes_key(self, module, changes):
+        normalizer = module.SearchKeyNormalizer()
+        assert normalizer.key("indexer", "avatar", 1, _context()) \
+               != normalizer.key("indexer", "avatar", 1, _context(**changes))
+
+    def test_indexer_page_and_missing_context(self, module):
+        normalizer = module.SearchKeyNormalizer()
+        key = normalizer.key("indexer", "avatar", 1)
+        assert key[3] is None
+        assert key != normalizer.key("other", "avatar", 1)
+        assert key != normalizer.key("indexer", "avatar", 2)
+
+    def test_empty_id_values_ignored(self, module):
+        context = _context(imdb_id="None")
+        assert module.SearchKeyNormalizer.context(context) == module.SearchKeyNormalizer.context(_context())
+
+    def test_traditional_chinese(self, module):
+        pytest.importorskip("zhconv")
+        assert module.SearchKeyNormalizer.keyword("阿凡達：水之道") == module.SearchKeyNormalizer.keyword("阿凡达 水之道")
@@ -0,0 +1,260 @@
+# _*_ coding: utf-8 _*_
+import threading
+import time
+import types
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import requests
+
+pytest.importorskip("cachetools")
+pytest.importorskip("DrissionPage")
+pytest.importorskip("playwright_stealth")
+
+from app.plugins.extendspider.plugins import base  # noqa: E402
+from app.plugins.extendspider.plugins.base import _ExtendSpiderBase  # noqa: E402
+from app.plugins.extendspider.utils.clearance_store import ClearanceStore, egress_key  # noqa: E402
+
+
+class FakeSpider(_ExtendSpiderBase):
+
+    def init_spider(self, config: dict = None):
+        self.do_search = config.get("do_search")
+
+    def _do_search(self, keyword: str, page: int, ctx):
+        return self.do_search(self, keyword, page, ctx)
+
+
+@pytest.fixture
+def make_spider(tmp_path):
+    def _make(do_search, **config):
+        return FakeSpider({"spider_name": "FakeSpider", "spider_enable": True, "spider_url": "https://example.com",
+                           "tmp_folder": str(tmp_path / "tmp"), "do_search": do_search, **config})
+
+    return _make
+
+
+def test_resource_stats_scoped_per_search(make_spider):
+    barrier = threading.Barrier(2)
+    scopes = {}
+
+    def do_search(spider, keyword, page, ctx):
+        scope = spider.resource_policy
+        barrier.wait()
+        for _ in range(int(keyword)):
+            scope.record("image")
+        # 线程池中执行的函数经 _bind_search 绑定后使用同一个统计范围
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            bound = executor.submit(spider._bind_search(lambda: spider.resource_policy)).result()
+            unbound = executor.submit(lambda: spider.resource_policy).result()
+        assert bound is scope
+        assert unbound is spider._resource_policy
+        scopes[keyword] = scope.stats()
+        return [{"title": keyword}]
+
+    spider = make_spider(do_search)
+    threads = [threading.Thread(target=spider.search, args=(n, 1)) for n in ("3", "5")]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(5)
+    assert scopes["3"]["requests"] == 3
+    assert scopes["5"]["requests"] == 5
+    assert spider._resource_policy.stats()["requests"] == 8
+    # 搜索结束后恢复为共享策略
+    assert spider.resource_policy is spider._resource_policy
+
+
+def test_resource_policy_disabled(make_spider):
+    spider = make_spider(lambda spider, *args: [spider.resource_policy], block_resources=False)
+    assert spider.search("kw", 1) == [None]
+
+
+class FakeHttpClient:
+    responses = []
+    calls = []
+
+    def get(self, url, headers=None, cookies=None, proxy=False, timeout=None):
+        FakeHttpClient.calls.append({"url": url, "headers": headers, "cookies": cookies})
+        response = FakeHttpClient.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+def _response(status_code=200, text="<html><body>ok</body></html>"):
+    return types.SimpleNamespace(status_code=status_code, text=text, ok=status_code < 400)
+
+
+@pytest.fixture
+def fetcher(make_spider, monkeypatch):
+    monkeypatch.setattr(_ExtendSpiderBase, "_fetch_modes", {})
+    monkeypatch.setattr(base, "HttpClient", FakeHttpClient)
+    FakeHttpClient.responses, FakeHttpClient.calls = [], []
+    spider = make_spider(lambda *args: [])
+    spider.browser_calls = []
+
+    def by_browser(url, wait_until="domcontentloaded"):
+        spider.browser_calls.append(url)
+        return "<html>browser</html>"
+
+    monkeypatch.setattr(spider, "_fetch_html_by_browser", by_browser)
+    return spider
+
+
+def test_fetch_html_direct(fetcher):
+    FakeHttpClient.responses = [_response()]
+    assert fetcher._fetch_html("https://example.com/a") == "<html><body>ok</body></html>"
+    assert fetcher.browser_calls == []
+    assert fetcher.get_fetch_mode("https://example.com/b") == "http"
+
+
+@pytest.mark.parametrize("response", [
+    _response(503),
+    _response(200, "<html><head><title>Just a moment...</title></head></html>"),
+    requests.exceptions.ConnectionError("reset"),
+])
+def test_fetch_html_falls_back_to_browser(fetcher, response):
+    FakeHttpClient.responses = [response]
+    assert fetcher._fetch_html("https://example.com/a") == "<html>browser</html>"
+    assert fetcher.get_fetch_mode("https://example.com/a") == "browser"
+    # 之后同一域名直接使用浏览器
+    assert fetcher._fetch_html("https://example.com/b") == "<html>browser</html>"
+    assert len(FakeHttpClient.calls) == 1
+    assert fetcher.browser_calls == ["https://example.com/a", "https://example.com/b"]
+
+
+def test_fetch_html_browser_mode_expires(fetcher):
+    fetcher._set_fetch_mode("https://example.com/", "browser")
+    domain = "example.com"
+    mode, _ = fetcher._fetch_modes[domain]
+    fetcher._fetch_modes[domain] = (mode, time.time() - fetcher._fetch_mode_ttl - 1)
+    FakeHttpClient.responses = [_response()]
+    assert fetcher._fetch_html("https://example.com/a") == "<html><body>ok</body></html>"
+    assert fetcher.browser_calls == []
+    assert fetcher.get_fetch_mode("https://example.com/a") == "http"
+
+
+def test_fetch_html_http_error_not_retried_in_browser(fetcher):
+    failures = fetcher._search_state.failures = []
+    FakeHttpClient.responses = [_response(404)]
+    assert fetcher._fetch_html("https://example.com/a") is None
+    assert fetcher.browser_calls == []
+    assert failures == ["页面获取失败: https://example.com/a"]
+
+
+def test_fetch_html_sends_stored_clearance(fetcher):
+    ua = fetcher.spider_ua
+    ClearanceStore().put("https://example.com/", ua, egress_key(fetcher.spider_proxy),
+                         [{"name": "cf_clearance", "value": "token", "domain": ".example.com",
+                           "expires": time.time() + 600}])
+    fetcher.spider_cookie = [{"name": "sid", "value": "1"}, {"name": "other", "value": "x", "domain": "other.org"}]
+    FakeHttpClient.responses = [_response()]
+    fetcher._fetch_html("https://www.example.com/a")
+    call = FakeHttpClient.calls[0]
+    assert call["cookies"] == {"cf_clearance": "token", "sid": "1"}
+    assert call["headers"]["User-Agent"] == ua
+
+
+def test_negative_cache_skips_empty_keyword(make_spider):
+    calls = []
+    spider = make_spider(lambda spider, keyword, *args: calls.append(keyword) or [])
+    assert spider.search("nothing", 1) == []
+    assert spider.search("nothing", 1) == []
+    assert calls == ["nothing"]
+    # 不同页码、不同关键词分别检索
+    spider.search("nothing", 2)
+    spider.search("other", 1)
+    assert calls == ["nothing", "nothing", "other"]
+
+
+def test_site_failures_open_circuit(make_spider):
+    calls = []
+
+    def do_search(spider, keyword, *args):
+        calls.append(keyword)
+        spider._report_failure("页面获取失败")
+        return []
+
+    spider = make_spider(do_search, circuit_failures=2, circuit_recovery=600)
+    spider.search("a", 1)
+    spider.search("a", 1)
+    assert spider.circuit_breaker.state == spider.circuit_breaker.OPEN
+    # 熔断后不再访问站点；失败的检索不进入无结果缓存
+    assert spider.search("b", 1) == []
+    assert calls == ["a", "a"]
+    assert spider.circuit_breaker.info()["last_error"] == "页面获取失败"
+
+
+def test_results_despite_failures_reset_circuit(make_spider):
+    def do_search(spider, keyword, *args):
+        spider._report_failure("详情页获取失败")
+        return [{"title": keyword}] if keyword == "ok" else []
+
+    spider = make_spider(do_search, circuit_failures=2)
+    spider.search("bad", 1)
+    assert spider.search("ok", 1) == [{"title": "ok"}]
+    spider.search("bad", 1)
+    assert spider.circuit_breaker.allow()
+
+
+def test_exception_counts_as_failure(make_spider):
+    def do_search(*args):
+        raise RuntimeError("boom")
+
+    spider = make_spider(do_search, circuit_failures=1)
+    with pytest.raises(RuntimeError):
+        spider.search("a", 1)
+    assert not spider.circuit_breaker.allow()
+
+
+@pytest.fixture
+def detail_cache(tmp_path, monkeypatch):
+    from app.plugins.extendspider.utils.search_cache import PersistentTLRUCache
+
+    cache = PersistentTLRUCache(tmp_path / "detail_cache.db", ttl=3600)
+    monkeypatch.setattr(_ExtendSpiderBase, "_detail_cache", cache)
+    yield cache
+    cache.close()
+
+
+@pytest.mark.parametrize("url", [
+    "https://Example.com/detail//1/?b=2&a=1#top",
+    "http://example.com:80/detail/1?a=1&b=2",
+    "https://example.com:443/detail/1/?a=1&b=2",
+])
+def test_normalize_detail_url(url):
+    assert _ExtendSpiderBase.normalize_detail_url(url) == "//example.com/detail/1?a=1&b=2"
+
+
+def test_normalize_detail_url_keeps_distinct_pages():
+    normalize = _ExtendSpiderBase.normalize_detail_url
+    assert normalize("https://example.com:8080/detail/1") != normalize("https://example.com/detail/1")
+    assert normalize("https://example.com/detail/1?id=1") != normalize("https://example.com/detail/1?id=2")
+
+
+def test_split_cached_details(make_spider, detail_cache):
+    spider = make_spider(None)
+    torrent = {"title": "沙丘2", "enclosure": "magnet:?xt=urn:btih:1", "size": "10 GB", "pubdate": "2024-03-01"}
+    spider._set_detail_cache("https://example.com/detail/1", [torrent])
+    # 没有种子的详情页不缓存
+    spider._set_detail_cache("https://example.com/detail/2", [])
+    results, uncached = spider._split_cached_details(
+        ["http://EXAMPLE.com/detail/1/", "https://example.com/detail/2", "https://example.com/detail/3"])
+    assert results == [torrent]
+    assert uncached == ["https://example.com/detail/2", "https://example.com/detail/3"]
+    # 返回副本，修改结果不影响缓存
+    results[0]["title"] = "changed"
+    assert spider._get_detail_cache("https://example.com/detail/1")[0]["title"] == "沙丘2"
+
+
+def test_detail_cache_per_spider_and_disabled(make_spider, detail_cache):
+    spider = make_spider(None, detail_cache_ttl=600)
+    assert detail_cache.ttls["FakeSpider"] == 600
+    spider._set_detail_cache("https://example.com/detail/1", [{"title": "a"}])
+    other = make_spider(None, spider_name="OtherSpider")
+    assert other._get_detail_cache("https://example.com/detail/1") is None
+    disabled = make_spider(None, detail_cache_ttl=0)
+    assert disabled._get_detail_cache("https://example.com/detail/1") is None
+    disabled._set_detail_cache("https://example.com/detail/2", [{"title": "b"}])
+    assert spider._get_detail_cache("https://example.com/detail/2") is None
@@ -0,0 +1,89 @@
+# _*_ coding: utf-8 _*_
+from app.plugins.jackettshaw.torznab import INDEXER_KEY, iter_torznab_items, parse_torznab_response, \
+    split_by_indexer
+
+
+def _item(i: int, indexer: str = "demo", title: str = None) -> str:
+    title = f"Movie.{i}.2024.1080p" if title is None else title
+    return (f'<item><title>{title}</title><jackettindexer id="{indexer}">{indexer}</jackettindexer>'
+            f'<comments>https://tracker/details/{i}</comments><size>{1024 + i}</size>'
+            f'<description>release {i}</description>'
+            f'<enclosure url="https://jackett/dl/{i}.torrent" length="1" type="application/x-bittorrent" />'
+            f'<torznab:attr name="seeders" value="{i}" /><torznab:attr name="peers" value="{i + 1}" />'
+            f'<torznab:attr name="imdbid" value="tt{1000000 + i}" /></item>')
+
+
+def _feed(*items: str) -> bytes:
+    return ('<?xml version="1.0" encoding="UTF-8"?><rss version="2.0" '
+            'xmlns:torznab="http://torznab.com/schemas/2015/feed"><channel><title>Demo</title>'
+            f'{"".join(items)}</channel></rss>').encode("utf-8")
+
+
+def _chunks(data: bytes, size: int):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def test_parses_items_across_chunk_boundaries():
+    feed = _feed(*(_item(i) for i in range(3)))
+    for size in (7, 64, len(feed)):
+        results = list(iter_torznab_items(_chunks(feed, size)))
+        assert [r["title"] for r in results] == [f"Movie.{i}.2024.1080p" for i in range(3)]
+    assert results[1] == {
+        'title': "Movie.1.2024.1080p",
+        'enclosure': "https://jackett/dl/1.torrent",
+        'description': "release 1",
+        'size': "1025",
+        'seeders': "1",
+        'peers': "2",
+        'page_url': "https://tracker/details/1",
+        'imdbid': "tt1000001",
+    }
+
+
+def test_skips_items_without_title():
+    results = list(iter_torznab_items([_feed(_item(0, title=""), _item(1))]))
+    assert [r["title"] for r in results] == ["Movie.1.2024.1080p"]
+
+
+def test_limit_stops_reading():
+    consumed = []
+
+    def chunks():
+        for chunk in _chunks(_feed(*(_item(i) for i in range(50))), 256):
+            consumed.append(chunk)
+            yield chunk
+
+    assert len(list(iter_torznab_items(chunks(), limit=2))) == 2
+    assert len(consumed) < 10
+
+
+def test_split_by_indexer():
+    feed = _feed(_item(0, "a"), _item(1, "b"), _item(2, "a"))
+    results = list(iter_torznab_items([feed], with_indexer=True))
+    assert [r[INDEXER_KEY] for r in results] == ["a", "b", "a"]
+    grouped = split_by_indexer(results)
+    assert {key: len(value) for key, value in grouped.items()} == {"a": 2, "b": 1}
+    assert all(INDEXER_KEY not in r for value in grouped.values() for r in value)
+
+
+def test_indexer_ignored_by_default():
+    assert INDEXER_KEY not in next(iter_torznab_items([_feed(_item(0))]))
+
+
+class _Response:
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.closed = False
+
+    def iter_content(self, chunk_size):
+        return iter(_chunks(self.data, 16))
+
+    def close(self):
+        self.closed = True
+
+
+def test_response_closed_after_early_stop():
+    response = _Response(_feed(*(_item(i) for i in range(5))))
+    assert len(list(parse_torznab_response(response, limit=1))) == 1
+    assert response.closed